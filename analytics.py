@@ -1,137 +1,347 @@
 import datetime 
+import calendar
+import itertools
+import threading
+import time
 from collections import Counter
+from ids import order_ids
+from analytics_store import OrderColumns, OrderAggregates, Rollup, CustomerActivity, to_micros, from_micros
+from instrumentation import instrumentation
 import matplotlib.pyplot as plt
 import io 
 import os 
 
+def retention_stats(unique_customers, returning_customers):
+    """Monta o dicionário de retenção a partir do número de clientes únicos e recorrentes."""
+    # Taxa de retenção
+    retention_rate = (returning_customers / unique_customers) * 100 if unique_customers > 0 else 0
+    
+    return {
+        "unique_customers": unique_customers,
+        "returning_customers": returning_customers,
+        "retention_rate": retention_rate
+    }
+
+
+def delivery_stats(stats):
+    """Monta o dicionário de desempenho de entrega a partir de um DeliveryStats."""
+    if not stats.deliveries:
+        return {
+            "total_deliveries": 0,
+            "on_time_deliveries": 0,
+            "late_deliveries": 0,
+            "on_time_percentage": 0,
+            "average_delay_minutes": 0
+        }
+    
+    # Pedidos entregues no prazo vs. atrasados
+    on_time = stats.on_time_deliveries
+    late = stats.deliveries - on_time
+    
+    # Atraso médio em minutos
+    average_delay = stats.total_delay_minutes / late if late > 0 else 0
+    
+    return {
+        "total_deliveries": stats.deliveries,
+        "on_time_deliveries": on_time,
+        "late_deliveries": late,
+        "on_time_percentage": (on_time / stats.deliveries) * 100,
+        "average_delay_minutes": average_delay
+    }
+
+
+def delivery_percentiles(stats, percentiles=(50, 90, 99)):
+    """Monta o dicionário de percentis de atraso e de duração das entregas, em minutos."""
+    return {
+        "delay_minutes": stats.delay_sketch.percentiles(percentiles),
+        "duration_minutes": stats.duration_sketch.percentiles(percentiles),
+    }
+
+
+def _in_range(moment, start, end):
+    return (start is None or moment >= start) and (end is None or moment < end)
+
+
 class RestaurantAnalytics:
     """Classe para análise de dados de um restaurante."""
     
-    def __init__(self, restaurant):
-        """Inicializa o analytics para um restaurante específico."""
+    RAW_WINDOW = datetime.timedelta(days=7)  # Período mantido com um registro por pedido
+    HOURLY_WINDOW = datetime.timedelta(days=30)  # Período mantido em resumos por hora
+    COMPACTION_INTERVAL = datetime.timedelta(hours=1)  # Atraso tolerado antes de compactar
+    MAX_LATENESS = datetime.timedelta(days=1)  # Atraso máximo entre a criação e o registro de um pedido
+    
+    def __init__(self, restaurant, popular_items_capacity=None, raw_window=None, hourly_window=None,
+                 max_lateness=None):
+        """
+        Inicializa o analytics para um restaurante específico.
+
+        popular_items_capacity limita a memória do ranking de itens mais vendidos
+        (modo aproximado); quando None, o ranking é exato.
+
+        O histórico é mantido em camadas: os pedidos dos últimos raw_window ficam
+        com um registro cada; os mais antigos são compactados em resumos por hora
+        e, depois de hourly_window, em resumos por dia.
+
+        Um pedido registrado pela primeira vez mais de max_lateness depois do
+        limite da última compactação (pela data de criação no id) é ignorado:
+        não é possível saber se ele já está nos resumos.
+        """
         self.restaurant = restaurant
-        self.orders_data = []  # Lista de pedidos para análise
+        self.raw_window = raw_window or self.RAW_WINDOW
+        self.hourly_window = hourly_window or self.HOURLY_WINDOW
+        self.max_lateness = max_lateness or self.MAX_LATENESS
+        self._columns = OrderColumns()  # Armazenamento colunar dos pedidos recentes
+        self._aggregates = OrderAggregates(popular_items_capacity)  # Métricas mantidas a cada pedido registrado
+        self._customer_activity = CustomerActivity()  # Clientes ativos e novos por semana/mês
+        self._hourly = {}  # início da hora -> Rollup
+        self._daily = {}  # data -> Rollup
+        # A compactação segue o horário de registro, não a ordem dos ids: um pedido antigo pode
+        # chegar depois de pedidos mais novos terem sido compactados. Pedidos com id menor que
+        # _late_bound (criados antes do limite da compactação menos max_lateness) são ignorados;
+        # _compacted_ids guarda só os compactados a partir desse limite, então o conjunto fica
+        # limitado aos pedidos de uma janela de max_lateness.
+        self._late_bound = 0
+        self._compacted_ids = set()
+        # Serializa as escritas: com um AsyncDispatcher, o AnalyticsTracker registra pedidos na
+        # thread do dispatcher enquanto Order.end_order pode registrar o mesmo pedido na thread do chamador
+        self._lock = threading.Lock()
+
+    @property
+    def orders_data(self):
+        """Lista dos pedidos recentes (ainda não compactados), ordenada pelo id do pedido."""
+        columns = self._columns
+        return [columns.row(row) for row in columns.rows_between_ids(0, 1 << 63)]
         
     def add_order_data(self, order, delivery=None):
-        """Adiciona dados de um pedido ao analytics."""
-        order_data = {
-            "order_id": id(order),  # Usando o ID do objeto como identificador único
-            "customer_id": order.customer.id,
-            "items": order.items.copy(),
-            "total_value": order.calculate_total(),
-            "datetime": datetime.datetime.now(),
-            "status": order.status,
-        }
-        
+        """
+        Registra (ou atualiza) os dados de um pedido no analytics.
+
+        Cada pedido ocupa uma única linha, identificada pelo id do pedido. Chamadas
+        posteriores para o mesmo pedido (por exemplo, a cada mudança de status da
+        entrega) atualizam essa linha e corrigem os agregados pela diferença, sem
+        contabilizar o pedido novamente.
+        """
+        metrics = instrumentation.metrics_enabled
+        if metrics:
+            start = time.perf_counter()
+        with self._lock:
+            self._ingest_order(order, delivery)
+        if metrics:
+            instrumentation.observe("analytics.add_order_data", time.perf_counter() - start)
+            instrumentation.increment("analytics.add_order_data")
+        instrumentation.info("Dados do pedido registrados no analytics com sucesso!")
+
+    def _ingest_order(self, order, delivery):
+        delivery_status = None
+        estimated_time = None
+        actual_time = None
         if delivery:
-            order_data["delivery_status"] = delivery.status
-            if delivery.estimated_delivery_time:
-                order_data["estimated_delivery_time"] = delivery.estimated_delivery_time
-            if hasattr(delivery, "delivery_time"):
-                order_data["actual_delivery_time"] = delivery.delivery_time
-                
-        self.orders_data.append(order_data)
-        print("Dados do pedido registrados no analytics com sucesso!")
+            delivery_status = delivery.status
+            # O atraso é medido contra o horário prometido, não contra a estimativa mais recente
+            estimated_time = delivery.promised_delivery_time or delivery.estimated_delivery_time
+            actual_time = getattr(delivery, "delivery_time", None)
+
+        total = order.calculate_total()
+        items = order.items  # Montado uma única vez a partir das linhas do pedido
+        was_delivered = False
+        row = self._columns.find(order.id)
+        if row is None and (order.id < self._late_bound or order.id in self._compacted_ids):
+            # Pedido já compactado nos resumos, ou registrado tarde demais: não é contabilizado
+            if instrumentation.metrics_enabled:
+                instrumentation.increment("analytics.ignored_orders")
+            return
+        if row is None:
+            moment = datetime.datetime.now()
+            row = self._columns.append(
+                order.id,
+                order.customer.id,
+                items,
+                total,
+                moment,
+                order.status,
+                delivery_status,
+                estimated_time,
+                actual_time,
+            )
+            self._aggregates.add(order.customer.id, items, total, moment)
+            is_new = self._aggregates.customer_orders[order.customer.id] == 1
+            self._customer_activity.add(order.customer.id, moment, is_new)
+            self._aggregates.delivery.add_row(self._columns, row)
+            self._maybe_compact(moment)
+        else:
+            old_items = self._columns.items_of(row)
+            old_total = self._columns.totals[row]
+            was_delivered = self._columns.is_delivered(row)
+            if old_items != items or old_total != total:
+                self._aggregates.adjust(old_items, old_total, items, total)
+                self._columns.patch_items(row, items)
+            self._columns.patch(row, total, order.status, delivery_status, estimated_time, actual_time)
+            if not was_delivered:
+                # A entrega acabou de ser concluída: entra nas estatísticas uma única vez
+                self._aggregates.delivery.add_row(self._columns, row)
+        if delivery and not was_delivered and self._columns.is_delivered(row):
+            # O histórico compacto responde o tempo em cada status sem montar dicionários
+            self._aggregates.delivery.add_status_times(delivery.status_history.time_in_status())
         
+    def _maybe_compact(self, now):
+        columns = self._columns
+        if columns.timestamps and columns.timestamps[0] < to_micros(now - self.raw_window - self.COMPACTION_INTERVAL):
+            self._compact(now)
+
+    def compact(self, now=None):
+        """
+        Move para os resumos por hora os pedidos registrados antes da janela de
+        dados brutos, e para os resumos por dia os resumos por hora mais antigos
+        que a janela horária.
+        """
+        with self._lock:
+            self._compact(now or datetime.datetime.now())
+
+    def _compact(self, now):
+        columns = self._columns
+        count = columns.rows_before(to_micros(now - self.raw_window))
+        if count:
+            for row in range(count):
+                hour = from_micros(columns.timestamps[row]).replace(minute=0, second=0, microsecond=0)
+                self._hourly.setdefault(hour, Rollup()).add_row(columns, row)
+                self._compacted_ids.add(columns.order_ids[row])
+            self._columns = columns.without_oldest(count)
+            late_bound = order_ids.lower_bound(now - self.raw_window - self.max_lateness)
+            if late_bound > self._late_bound:
+                self._late_bound = late_bound
+                self._compacted_ids = {order_id for order_id in self._compacted_ids if order_id >= late_bound}
+
+        hourly_cutoff = now - self.hourly_window
+        for hour in [hour for hour in self._hourly if hour < hourly_cutoff]:
+            self._daily.setdefault(hour.date(), Rollup()).merge(self._hourly.pop(hour))
+
+    def _summarize(self, start=None, end=None):
+        """
+        Junta em um único Rollup as três camadas do histórico no intervalo [start, end).
+
+        Resumos por hora e por dia entram inteiros quando o seu início está no intervalo.
+        """
+        summary = Rollup()
+        for day, rollup in self._daily.items():
+            if _in_range(datetime.datetime.combine(day, datetime.time()), start, end):
+                summary.merge(rollup)
+        for hour, rollup in self._hourly.items():
+            if _in_range(hour, start, end):
+                summary.merge(rollup)
+        columns = self._columns
+        rows = columns.rows_between_times(
+            to_micros(start) if start else -(1 << 63),
+            to_micros(end) if end else (1 << 63) - 1,
+        )
+        for row in rows:
+            summary.add_row(columns, row)
+        return summary
+
+    def get_orders_between(self, start, end):
+        """Retorna os pedidos recentes criados no intervalo [start, end), por busca binária nos ids."""
+        columns = self._columns
+        rows = columns.rows_between_ids(order_ids.lower_bound(start), order_ids.lower_bound(end))
+        return [columns.row(row) for row in rows]
+
     def get_total_orders(self):
         """Retorna o número total de pedidos."""
-        return len(self.orders_data)
+        return self._aggregates.order_count
     
     def get_total_revenue(self):
         """Retorna a receita total gerada pelos pedidos."""
-        return sum(order["total_value"] for order in self.orders_data)
+        return self._aggregates.revenue
     
     def get_average_order_value(self):
         """Retorna o valor médio dos pedidos."""
-        if not self.orders_data:
+        if not self.get_total_orders():
             return 0
         return self.get_total_revenue() / self.get_total_orders()
     
     def get_most_popular_items(self, limit=5):
         """Retorna os itens mais populares, limitado a 'limit' itens."""
-        all_items = []
-        for order in self.orders_data:
-            for item, quantity in order["items"].items():
-                all_items.extend([item] * quantity)
-                
-        counter = Counter(all_items)
-        return counter.most_common(limit)
+        return self._aggregates.item_quantities.top(limit)
     
-    def get_peak_hours(self):
-        """Retorna as horas com mais pedidos."""
-        hours = [order["datetime"].hour for order in self.orders_data]
-        return Counter(hours)
+    def get_peak_hours(self, start=None, end=None):
+        """Retorna as horas com mais pedidos, opcionalmente apenas no intervalo [start, end)."""
+        if start is None and end is None:
+            return Counter(self._aggregates.hour_counts)
+        return Counter(self._summarize(start, end).hour_counts)
     
-    def get_orders_by_day(self):
-        """Retorna o número de pedidos por dia da semana."""
-        days = [order["datetime"].strftime("%A") for order in self.orders_data]
-        return Counter(days)
+    def get_orders_by_day(self, start=None, end=None):
+        """Retorna o número de pedidos por dia da semana, opcionalmente apenas no intervalo [start, end)."""
+        if start is None and end is None:
+            weekdays = self._aggregates.weekday_counts
+        else:
+            weekdays = self._summarize(start, end).weekday_counts
+        return Counter({calendar.day_name[weekday]: count for weekday, count in weekdays.items()})
     
     def get_customer_retention(self):
         """Retorna estatísticas sobre retenção de clientes."""
-        customers = [order["customer_id"] for order in self.orders_data]
-        counter = Counter(customers)
-        
-        # Número de clientes que fizeram pelo menos um pedido
-        unique_customers = len(counter)
-        
-        # Número de clientes que fizeram mais de um pedido
-        returning_customers = sum(1 for count in counter.values() if count > 1)
-        
-        # Taxa de retenção
-        retention_rate = (returning_customers / unique_customers) * 100 if unique_customers > 0 else 0
-        
-        return {
-            "unique_customers": unique_customers,
-            "returning_customers": returning_customers,
-            "retention_rate": retention_rate
-        }
+        # Clientes que fizeram pelo menos um pedido e clientes que fizeram mais de um
+        unique_customers = len(self._aggregates.customer_orders)
+        returning_customers = self._aggregates.returning_customers
+        return retention_stats(unique_customers, returning_customers)
     
+    def get_unique_customers(self, start=None, end=None):
+        """
+        Retorna o número de clientes distintos, opcionalmente apenas no intervalo
+        [start, end) (estimado pelos sketches dos resumos quando o intervalo é grande).
+        """
+        if start is None and end is None:
+            return len(self._aggregates.customer_orders)
+        return self._summarize(start, end).customers.estimate()
+
+    def get_weekly_unique_customers(self, day=None):
+        """Retorna o número de clientes distintos na semana do dia informado (padrão: esta semana)."""
+        return self._customer_activity.unique_in_week(day or datetime.date.today())
+
+    def get_returning_customers_vs_previous_month(self, year=None, month=None):
+        """Retorna quantos clientes do mês (padrão: o atual) também pediram no mês anterior."""
+        today = datetime.date.today()
+        return self._customer_activity.returning_vs_previous_month(year or today.year, month or today.month)
+
+    def get_cohort_retention(self, cohort_week, weeks=8):
+        """Retorna a curva de retenção (em %) dos clientes novos da semana informada."""
+        return self._customer_activity.cohort_retention(cohort_week, weeks)
+
+    def get_customer_activity(self):
+        """Retorna a atividade de clientes por semana e por mês (mesclável entre restaurantes)."""
+        return self._customer_activity
+
     def get_delivery_performance(self):
         """Retorna estatísticas sobre o desempenho de entrega."""
-        # Filtrando apenas pedidos entregues
-        delivered_orders = [
-            order for order in self.orders_data 
-            if "actual_delivery_time" in order and "estimated_delivery_time" in order
-        ]
-        
-        if not delivered_orders:
-            return {
-                "total_deliveries": 0,
-                "on_time_deliveries": 0,
-                "late_deliveries": 0,
-                "on_time_percentage": 0,
-                "average_delay_minutes": 0
-            }
-        
-        # Pedidos entregues no prazo vs. atrasados
-        on_time = sum(
-            1 for order in delivered_orders 
-            if order["actual_delivery_time"] <= order["estimated_delivery_time"]
-        )
-        
-        late = len(delivered_orders) - on_time
-        
-        # Calculando atraso médio em minutos
-        total_delay = sum(
-            (order["actual_delivery_time"] - order["estimated_delivery_time"]).total_seconds() / 60
-            for order in delivered_orders
-            if order["actual_delivery_time"] > order["estimated_delivery_time"]
-        )
-        
-        average_delay = total_delay / late if late > 0 else 0
-        
+        return delivery_stats(self._aggregates.delivery)
+
+    def get_delivery_percentiles(self, percentiles=(50, 90, 99)):
+        """Retorna os percentis de atraso e de duração das entregas, em minutos."""
+        return delivery_percentiles(self._aggregates.delivery, percentiles)
+
+    def get_average_time_in_status(self):
+        """Retorna o tempo médio, em minutos, que as entregas concluídas passaram em cada status."""
+        stats = self._aggregates.delivery
         return {
-            "total_deliveries": len(delivered_orders),
-            "on_time_deliveries": on_time,
-            "late_deliveries": late,
-            "on_time_percentage": (on_time / len(delivered_orders)) * 100,
-            "average_delay_minutes": average_delay
+            status: seconds / stats.status_counts[status] / 60
+            for status, seconds in stats.status_seconds.items()
         }
+
+    def get_delivery_stats(self):
+        """Retorna as estatísticas de entrega (com os sketches mescláveis) do restaurante."""
+        return self._aggregates.delivery
+
+    def get_rollups(self):
+        """Retorna os resumos compactados (por dia e por hora) do histórico."""
+        return list(itertools.chain(self._daily.values(), self._hourly.values()))
+
+    def export_state(self):
+        """
+        Retorna o estado bruto do analytics (colunas recentes, resumos compactados e
+        pedidos por cliente), em uma forma que pode ser enviada a outro processo.
+        """
+        return self._columns, self.get_rollups(), self._aggregates.customer_orders
     
     def get_dashboard_summary(self):
         """Retorna um resumo do dashboard para exibição no terminal."""
-        if not self.orders_data:
+        if not self.get_total_orders():
             return "Não há dados suficientes para gerar o resumo."
             
         total_orders = self.get_total_orders()
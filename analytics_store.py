@@ -0,0 +1,450 @@
+import datetime
+from array import array
+from bisect import bisect_left
+from collections import Counter
+from popular_items import make_popular_items
+from sketches import CardinalitySketch, QuantileSketch
+
+MISSING = -(1 << 63)  # Marcador para horários ausentes nas colunas de inteiros
+_LOCAL_EPOCH = datetime.datetime(1970, 1, 1)
+
+
+def to_micros(moment):
+    """Converte um datetime (horário local) em microssegundos desde a época."""
+    delta = moment - _LOCAL_EPOCH
+    return (delta.days * 86400 + delta.seconds) * 1_000_000 + delta.microseconds
+
+
+def from_micros(micros):
+    """Converte microssegundos desde a época de volta em datetime (horário local)."""
+    return _LOCAL_EPOCH + datetime.timedelta(microseconds=micros)
+
+
+class Interner:
+    """Tabela que associa cada valor distinto (cliente, item, status) a um código inteiro."""
+
+    def __init__(self):
+        self._values = []
+        self._codes = {}
+
+    def code(self, value):
+        """Retorna o código do valor, criando um novo se ele ainda não existe."""
+        code = self._codes.get(value)
+        if code is None:
+            code = len(self._values)
+            self._codes[value] = code
+            self._values.append(value)
+        return code
+
+    def lookup(self, value):
+        """Retorna o código de um valor já conhecido, ou None."""
+        return self._codes.get(value)
+
+    def value(self, code):
+        """Retorna o valor associado a um código."""
+        return self._values[code]
+
+    def __len__(self):
+        return len(self._values)
+
+
+class OrderColumns:
+    """
+    Armazenamento colunar dos pedidos registrados no analytics.
+
+    Cada campo do pedido é uma coluna de tipo fixo (array), e valores repetidos
+    (clientes, itens e status) são armazenados como códigos inteiros. Os itens
+    de cada pedido ficam em colunas contíguas (item_ids/item_quantities), e
+    item_starts/item_counts indicam onde estão os itens de cada linha.
+
+    Há uma linha por pedido: registrar novamente o mesmo pedido atualiza a
+    linha existente em vez de criar outra.
+    """
+
+    def __init__(self):
+        self.order_ids = array("q")
+        self.timestamps = array("q")  # Microssegundos desde a época (horário local)
+        self.hours = array("B")
+        self.weekdays = array("B")
+        self.totals = array("d")
+        self.customers = array("l")
+        self.statuses = array("b")
+        self.delivery_statuses = array("b")  # -1 quando o pedido não tem entrega
+        self.estimated_times = array("q")  # MISSING quando não há estimativa
+        self.actual_times = array("q")  # MISSING quando ainda não foi entregue
+        self.item_starts = array("l")
+        self.item_counts = array("l")
+        self.item_ids = array("l")
+        self.item_quantities = array("l")
+
+        self.customer_table = Interner()
+        self.item_table = Interner()
+        self.status_table = Interner()
+
+        self._rows_by_id = {}  # id do pedido -> índice da linha
+        # Permutação das linhas ordenada pelo id do pedido, para buscas por intervalo
+        self._sorted_ids = array("q")
+        self._sorted_rows = array("l")
+
+    def append(self, order_id, customer_id, items, total, moment, status,
+               delivery_status=None, estimated_time=None, actual_time=None):
+        """Adiciona uma linha e retorna o seu índice."""
+        if order_id in self._rows_by_id:
+            raise ValueError(f"O pedido {order_id} já está registrado.")
+        row = len(self.order_ids)
+        self._rows_by_id[order_id] = row
+        self.order_ids.append(order_id)
+        self.timestamps.append(to_micros(moment))
+        self.hours.append(moment.hour)
+        self.weekdays.append(moment.weekday())
+        self.totals.append(total)
+        self.customers.append(self.customer_table.code(customer_id))
+        self.statuses.append(self.status_table.code(status))
+        self.delivery_statuses.append(
+            -1 if delivery_status is None else self.status_table.code(delivery_status)
+        )
+        self.estimated_times.append(MISSING if estimated_time is None else to_micros(estimated_time))
+        self.actual_times.append(MISSING if actual_time is None else to_micros(actual_time))
+        self.item_starts.append(0)
+        self.item_counts.append(0)
+        self._write_items(row, items)
+
+        self._index_id(order_id, row)
+        return row
+
+    def _index_id(self, order_id, row):
+        position = bisect_left(self._sorted_ids, order_id)
+        self._sorted_ids.insert(position, order_id)
+        self._sorted_rows.insert(position, row)
+
+    def without_oldest(self, count):
+        """
+        Retorna novas colunas sem as 'count' primeiras linhas (as mais antigas).
+
+        As tabelas de códigos também são reconstruídas, de modo que clientes e
+        itens que só apareciam nas linhas removidas deixam de ocupar memória.
+        """
+        remaining = OrderColumns()
+        for row in range(count, len(self)):
+            remaining._copy_row(self, row)
+        return remaining
+
+    def _copy_row(self, source, row):
+        order_id = source.order_ids[row]
+        new_row = len(self.order_ids)
+        self._rows_by_id[order_id] = new_row
+        self.order_ids.append(order_id)
+        self.timestamps.append(source.timestamps[row])
+        self.hours.append(source.hours[row])
+        self.weekdays.append(source.weekdays[row])
+        self.totals.append(source.totals[row])
+        self.customers.append(self.customer_table.code(source.customer_table.value(source.customers[row])))
+        self.statuses.append(self.status_table.code(source.status_table.value(source.statuses[row])))
+        delivery_status = source.delivery_statuses[row]
+        self.delivery_statuses.append(
+            -1 if delivery_status < 0 else self.status_table.code(source.status_table.value(delivery_status))
+        )
+        self.estimated_times.append(source.estimated_times[row])
+        self.actual_times.append(source.actual_times[row])
+        self.item_starts.append(0)
+        self.item_counts.append(0)
+        self._write_items(new_row, source.items_of(row))
+        self._index_id(order_id, new_row)
+
+    def rows_before(self, micros):
+        """Retorna quantas linhas, a partir da primeira, foram registradas antes do instante informado."""
+        return bisect_left(self.timestamps, micros)
+
+    def rows_between_times(self, start_micros, end_micros):
+        """Retorna o intervalo de linhas registradas em [start, end), como range."""
+        return range(bisect_left(self.timestamps, start_micros), bisect_left(self.timestamps, end_micros))
+
+    def find(self, order_id):
+        """Retorna o índice da linha do pedido, ou None se ele não foi registrado."""
+        return self._rows_by_id.get(order_id)
+
+    def patch(self, row, total, status, delivery_status=None, estimated_time=None, actual_time=None):
+        """Atualiza no lugar os campos de uma linha que mudam ao longo da entrega."""
+        self.totals[row] = total
+        self.statuses[row] = self.status_table.code(status)
+        if delivery_status is not None:
+            self.delivery_statuses[row] = self.status_table.code(delivery_status)
+        if estimated_time is not None:
+            self.estimated_times[row] = to_micros(estimated_time)
+        if actual_time is not None:
+            self.actual_times[row] = to_micros(actual_time)
+
+    def patch_items(self, row, items):
+        """Substitui os itens de uma linha."""
+        if len(items) == self.item_counts[row]:
+            # Mesmo número de itens: reaproveita o espaço da linha
+            start = self.item_starts[row]
+            for offset, (item, quantity) in enumerate(items.items()):
+                self.item_ids[start + offset] = self.item_table.code(item)
+                self.item_quantities[start + offset] = quantity
+        else:
+            self._write_items(row, items)
+
+    def _write_items(self, row, items):
+        self.item_starts[row] = len(self.item_ids)
+        self.item_counts[row] = len(items)
+        for item, quantity in items.items():
+            self.item_ids.append(self.item_table.code(item))
+            self.item_quantities.append(quantity)
+
+    def delivery_delay(self, row):
+        """Retorna o atraso da entrega em minutos (negativo se adiantada), ou None se não foi entregue."""
+        actual, estimated = self.actual_times[row], self.estimated_times[row]
+        if actual == MISSING or estimated == MISSING:
+            return None
+        return (actual - estimated) / 60_000_000
+
+    def delivery_duration(self, row):
+        """Retorna quantos minutos a entrega levou desde o registro do pedido, ou None se não foi entregue."""
+        actual = self.actual_times[row]
+        if actual == MISSING:
+            return None
+        return (actual - self.timestamps[row]) / 60_000_000
+
+    def is_delivered(self, row):
+        """Indica se a linha já tem o horário real de entrega."""
+        return self.actual_times[row] != MISSING
+
+    def rows_between_ids(self, first_id, last_id):
+        """Retorna os índices das linhas com id no intervalo [first_id, last_id), ordenados pelo id."""
+        first = bisect_left(self._sorted_ids, first_id)
+        last = bisect_left(self._sorted_ids, last_id)
+        return self._sorted_rows[first:last]
+
+    def items_of(self, row):
+        """Retorna os itens de uma linha no formato {nome: quantidade}."""
+        start = self.item_starts[row]
+        end = start + self.item_counts[row]
+        return {
+            self.item_table.value(item_id): quantity
+            for item_id, quantity in zip(self.item_ids[start:end], self.item_quantities[start:end])
+        }
+
+    def row(self, row):
+        """Materializa uma linha no formato de dicionário usado originalmente pelo analytics."""
+        order_data = {
+            "order_id": self.order_ids[row],
+            "customer_id": self.customer_table.value(self.customers[row]),
+            "items": self.items_of(row),
+            "total_value": self.totals[row],
+            "datetime": from_micros(self.timestamps[row]),
+            "status": self.status_table.value(self.statuses[row]),
+        }
+        if self.delivery_statuses[row] >= 0:
+            order_data["delivery_status"] = self.status_table.value(self.delivery_statuses[row])
+            if self.estimated_times[row] != MISSING:
+                order_data["estimated_delivery_time"] = from_micros(self.estimated_times[row])
+            if self.actual_times[row] != MISSING:
+                order_data["actual_delivery_time"] = from_micros(self.actual_times[row])
+        return order_data
+
+    def __len__(self):
+        return len(self.order_ids)
+
+
+class DeliveryStats:
+    """
+    Estatísticas de entrega: contagens de entregas no prazo e atrasadas, as
+    distribuições (sketches de quantis) de atraso e de duração, em minutos, e o
+    tempo total passado em cada status pelas entregas concluídas.
+    """
+
+    def __init__(self):
+        self.deliveries = 0  # Entregas com horário estimado e real
+        self.on_time_deliveries = 0
+        self.total_delay_minutes = 0.0  # Soma dos atrasos das entregas atrasadas
+        self.delay_sketch = QuantileSketch()
+        self.duration_sketch = QuantileSketch()
+        self.status_seconds = Counter()  # status -> segundos somados
+        self.status_counts = Counter()  # status -> entregas que passaram por ele
+
+    def add(self, delay, duration):
+        """Contabiliza uma entrega concluída (delay é None quando não havia estimativa)."""
+        if duration is not None:
+            self.duration_sketch.add(duration)
+        if delay is None:
+            return
+        self.deliveries += 1
+        self.delay_sketch.add(delay)
+        if delay <= 0:
+            self.on_time_deliveries += 1
+        else:
+            self.total_delay_minutes += delay
+
+    def add_row(self, columns, row):
+        """Contabiliza a entrega de uma linha das colunas, se ela já foi concluída."""
+        if columns.is_delivered(row):
+            self.add(columns.delivery_delay(row), columns.delivery_duration(row))
+
+    def add_status_times(self, times):
+        """Soma o tempo em cada status ({status: segundos}) de uma entrega concluída."""
+        self.status_seconds.update(times)
+        self.status_counts.update(times.keys())
+
+    def merge(self, other):
+        """Soma outras estatísticas de entrega a estas."""
+        self.deliveries += other.deliveries
+        self.on_time_deliveries += other.on_time_deliveries
+        self.total_delay_minutes += other.total_delay_minutes
+        self.delay_sketch.merge(other.delay_sketch)
+        self.duration_sketch.merge(other.duration_sketch)
+        self.status_seconds.update(other.status_seconds)
+        self.status_counts.update(other.status_counts)
+
+
+class OrderAggregates:
+    """
+    Agregados mantidos incrementalmente à medida que os pedidos chegam.
+
+    Permite responder às métricas do dashboard (receita, ticket médio, itens
+    mais vendidos, horários de pico e retenção) sem percorrer o histórico.
+    Os pedidos por cliente (customer_orders) são exatos e não são compactados:
+    ocupam uma entrada por cliente distinto, mesmo depois que os pedidos
+    antigos viram resumos.
+    """
+
+    def __init__(self, popular_items_capacity=None):
+        self.order_count = 0
+        self.revenue = 0.0
+        self.item_quantities = make_popular_items(popular_items_capacity)  # item -> unidades vendidas
+        self.hour_counts = Counter()  # hora do dia -> pedidos
+        self.weekday_counts = Counter()  # dia da semana (0 = segunda) -> pedidos
+        self.customer_orders = Counter()  # id do cliente -> pedidos
+        self.returning_customers = 0  # clientes com mais de um pedido
+        self.delivery = DeliveryStats()
+
+    def add(self, customer_id, items, total, moment):
+        """Contabiliza um pedido nos agregados."""
+        self.order_count += 1
+        self.revenue += total
+        self.item_quantities.update(items)
+        self.hour_counts[moment.hour] += 1
+        self.weekday_counts[moment.weekday()] += 1
+        self.customer_orders[customer_id] += 1
+        if self.customer_orders[customer_id] == 2:
+            self.returning_customers += 1
+
+    def adjust(self, old_items, old_total, new_items, new_total):
+        """Corrige os agregados de um pedido já contabilizado cujos itens ou total mudaram."""
+        self.revenue += new_total - old_total
+        for item in old_items.keys() | new_items.keys():
+            delta = new_items.get(item, 0) - old_items.get(item, 0)
+            if delta:
+                self.item_quantities.add(item, delta)
+
+
+class Rollup:
+    """
+    Resumo compactado dos pedidos de um intervalo de tempo (uma hora ou um dia).
+
+    Guarda apenas contagens e somas, de modo que o histórico antigo ocupa
+    memória proporcional ao número de intervalos, e não ao número de pedidos.
+    """
+
+    def __init__(self):
+        self.order_count = 0
+        self.revenue = 0.0
+        self.item_quantities = Counter()
+        self.hour_counts = Counter()
+        self.weekday_counts = Counter()
+        self.customers = CardinalitySketch()  # clientes distintos que pediram no intervalo
+        self.delivery = DeliveryStats()
+
+    def add_row(self, columns, row):
+        """Contabiliza uma linha das colunas brutas no resumo."""
+        self.order_count += 1
+        self.revenue += columns.totals[row]
+        self.item_quantities.update(columns.items_of(row))
+        self.hour_counts[columns.hours[row]] += 1
+        self.weekday_counts[columns.weekdays[row]] += 1
+        self.customers.add(columns.customer_table.value(columns.customers[row]))
+        self.delivery.add_row(columns, row)
+
+    def merge(self, other):
+        """Soma outro resumo a este."""
+        self.order_count += other.order_count
+        self.revenue += other.revenue
+        self.item_quantities.update(other.item_quantities)
+        self.hour_counts.update(other.hour_counts)
+        self.weekday_counts.update(other.weekday_counts)
+        self.customers.merge(other.customers)
+        self.delivery.merge(other.delivery)
+
+
+def week_start(moment):
+    """Retorna a data da segunda-feira da semana do instante (ou data) informado."""
+    day = moment.date() if isinstance(moment, datetime.datetime) else moment
+    return day - datetime.timedelta(days=day.weekday())
+
+
+def previous_month(year, month):
+    """Retorna o (ano, mês) anterior ao informado."""
+    return (year - 1, 12) if month == 1 else (year, month - 1)
+
+
+class CustomerActivity:
+    """
+    Clientes ativos por semana e por mês, e clientes novos por semana (coortes),
+    guardados em CardinalitySketch: a memória por intervalo é constante e os
+    intervalos podem ser mesclados entre restaurantes.
+    """
+
+    def __init__(self):
+        self.weekly = {}  # segunda-feira da semana -> clientes que pediram
+        self.monthly = {}  # (ano, mês) -> clientes que pediram
+        self.weekly_new = {}  # segunda-feira da semana -> clientes com o primeiro pedido na semana
+
+    def add(self, customer_id, moment, is_new):
+        """Registra um pedido do cliente no instante informado."""
+        week = week_start(moment)
+        self.weekly.setdefault(week, CardinalitySketch()).add(customer_id)
+        self.monthly.setdefault((moment.year, moment.month), CardinalitySketch()).add(customer_id)
+        if is_new:
+            self.weekly_new.setdefault(week, CardinalitySketch()).add(customer_id)
+
+    def merge(self, other):
+        """Soma a atividade de outro restaurante a esta."""
+        for mine, theirs in ((self.weekly, other.weekly), (self.monthly, other.monthly),
+                             (self.weekly_new, other.weekly_new)):
+            for key, sketch in theirs.items():
+                mine.setdefault(key, CardinalitySketch()).merge(sketch)
+
+    def unique_in_week(self, day):
+        """Clientes distintos que pediram na semana do dia informado."""
+        sketch = self.weekly.get(week_start(day))
+        return sketch.estimate() if sketch else 0
+
+    def returning_vs_previous_month(self, year, month):
+        """Clientes do mês que também pediram no mês anterior."""
+        current = self.monthly.get((year, month))
+        previous = self.monthly.get(previous_month(year, month))
+        customers = current.estimate() if current else 0
+        returning = current.intersection_estimate(previous) if current and previous else 0
+        return {
+            "customers": customers,
+            "returning_customers": returning,
+            "retention_rate": (returning / customers) * 100 if customers else 0,
+        }
+
+    def cohort_retention(self, cohort_week, weeks=8):
+        """
+        Curva de retenção da coorte de clientes novos da semana informada: para
+        cada semana seguinte (começando pela própria), o percentual da coorte
+        que voltou a pedir.
+        """
+        cohort_week = week_start(cohort_week)
+        cohort = self.weekly_new.get(cohort_week)
+        if not cohort or not cohort.estimate():
+            return []
+        size = cohort.estimate()
+        curve = []
+        for offset in range(weeks + 1):
+            active = self.weekly.get(cohort_week + datetime.timedelta(weeks=offset))
+            retained = cohort.intersection_estimate(active) if active else 0
+            curve.append((retained / size) * 100)
+        return curve
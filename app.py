@@ -9,7 +9,16 @@ from order import Order
 from menu import Menu
 from delivery import Delivery
 from observer import CustomerNotifier, RestaurantNotifier, AnalyticsTracker
+from event_bus import event_bus, DELIVERY_STATUS_CHANGED
+from instrumentation import instrumentation, INFO
 from dish_decorator import BasicDish, ExtraCheese, ExtraBacon, SpecialSauce, WithoutIngredient
+from registry import EntityRegistry
+from order_index import OrderIndex, DeliveryIndex
+from geo import DEFAULT_LATITUDE, DEFAULT_LONGITUDE
+from geo_index import DeliveryLocationIndex
+from dispatch import Courier, CourierPool, DispatchEngine
+from eta import EtaEngine
+from ids import format_id
 
 def main_menu():
     print("\n--- Menu Principal ---")
@@ -27,6 +36,22 @@ def main_menu():
     choice = input("Escolha uma opção: ")
     return choice
 
+def find_active_order(customers, orders, customer_name):
+    """Retorna o pedido em aberto mais antigo do cliente com o nome informado."""
+    for customer in customers.find_all_by("name", customer_name):
+        order = orders.get_active_order(customer.id)
+        if order:
+            return order
+    return None
+
+def find_delivery(customers, deliveries, customer_name):
+    """Retorna a entrega do cliente com o nome informado."""
+    for customer in customers.find_all_by("name", customer_name):
+        delivery = deliveries.get_customer_delivery(customer.id)
+        if delivery:
+            return delivery
+    return None
+
 def register_and_login(customers, owners):
     print("\n--- Cadastro e Login ---")
     print("1. Cadastrar")
@@ -50,11 +75,11 @@ def register_and_login(customers, owners):
 
         if user_type == "1":
             customer = Customer(id, name, email, phone, password1)
-            customers.append(customer)
+            customers.add(customer)
             print("Cliente cadastrado com sucesso!")
         elif user_type == "2":
             owner = Owner(id, name, email, phone, password1)
-            owners.append(owner)
+            owners.add(owner)
             print("Dono de Restaurante cadastrado com sucesso!")
         else:
             print("Tipo de usuário inválido.")
@@ -64,13 +89,13 @@ def register_and_login(customers, owners):
         password = input("Senha: ")
 
         # Verifica se é um cliente
-        customer = next((c for c in customers if c.email == email and c.get_password() == password), None)
+        customer = next((c for c in customers.find_all_by("email", email) if c.get_password() == password), None)
         if customer:
             print(f"Login bem-sucedido como Cliente: {customer.name}")
             return customer
 
         # Verifica se é um dono de restaurante
-        owner = next((o for o in owners if o.email == email and o.get_password() == password), None)
+        owner = next((o for o in owners.find_all_by("email", email) if o.get_password() == password), None)
         if owner:
             print(f"Login bem-sucedido como Dono de Restaurante: {owner.name}")
             return owner
@@ -95,16 +120,23 @@ def manage_restaurants(owners, restaurants):
         name = input("Nome do Restaurante: ")
         address = input("Endereço do Restaurante: ")
         owner_name = input("Nome do Proprietário: ")  
-        owner = next((o for o in owners if o.name == owner_name), None)  
+        owner = owners.get_by_name(owner_name)  
         if owner:
-            restaurant = Restaurant(name, address, owner)
-            restaurants.append(restaurant)
+            latitude, longitude = DEFAULT_LATITUDE, DEFAULT_LONGITUDE
+            coordinates = input("Latitude e longitude do Restaurante (opcional, ex.: -9.6498, -35.7089): ")
+            if coordinates.strip():
+                try:
+                    latitude, longitude = (float(value) for value in coordinates.split(","))
+                except ValueError:
+                    print("Coordenadas inválidas. Usando o centro da cidade.")
+            restaurant = Restaurant(name, address, owner, latitude, longitude)
+            restaurants.add(restaurant)
             print("Restaurante criado com sucesso!")
         else:
             print("Proprietário não encontrado.")
     elif choice == "2":
         restaurant_name = input("Nome do Restaurante: ")
-        restaurant = next((r for r in restaurants if r.name == restaurant_name), None)
+        restaurant = restaurants.get_by_name(restaurant_name)
         if restaurant:
             dish_name = input("Nome do Prato: ")
             price = float(input("Preço do Prato: "))
@@ -114,7 +146,7 @@ def manage_restaurants(owners, restaurants):
             print("Restaurante não encontrado.")
     elif choice == "3":
         restaurant_name = input("Nome do Restaurante: ")
-        restaurant = next((r for r in restaurants if r.name == restaurant_name), None)
+        restaurant = restaurants.get_by_name(restaurant_name)
         if restaurant:
             print(restaurant.display_menu())
         else:
@@ -140,13 +172,13 @@ def manage_orders(customers, restaurants, orders, deliveries):
 
     if choice == "1":
         customer_name = input("Nome do Cliente: ") 
-        customer = next((c for c in customers if c.name == customer_name), None)
+        customer = customers.get_by_name(customer_name)
         if customer:
             restaurant_name = input("Nome do Restaurante: ")
-            restaurant = next((r for r in restaurants if r.name == restaurant_name), None)
+            restaurant = restaurants.get_by_name(restaurant_name)
             if restaurant:
                 order = Order(customer, restaurant)
-                orders.append(order)
+                orders.add(order)
                 print("Pedido criado com sucesso!")
             else:
                 print("Restaurante não encontrado.")
@@ -157,10 +189,10 @@ def manage_orders(customers, restaurants, orders, deliveries):
         from order_builder import OrderBuilder
 
         customer_name = input("Nome do Cliente: ")
-        customer = next((c for c in customers if c.name == customer_name), None)
+        customer = customers.get_by_name(customer_name)
         if customer:
             restaurant_name = input("Nome do Restaurante: ")
-            restaurant = next((r for r in restaurants if r.name == restaurant_name), None)
+            restaurant = restaurants.get_by_name(restaurant_name)
             if restaurant:
                 builder = OrderBuilder(customer, restaurant)
 
@@ -191,7 +223,7 @@ def manage_orders(customers, restaurants, orders, deliveries):
                     builder.with_promo_code(promo_code)
 
                 order = builder.build()
-                orders.append(order)
+                orders.add(order)
                 print("Pedido criado com sucesso usando Builder!")
                 print(order.display_order())
             else:
@@ -201,7 +233,7 @@ def manage_orders(customers, restaurants, orders, deliveries):
             
     elif choice == "3":
         customer_name = input("Nome do Cliente: ")
-        order = next((o for o in orders if o.customer.name == customer_name), None)
+        order = find_active_order(customers, orders, customer_name)
         if order:
             dish_name = input("Nome do Prato: ")
             quantity = int(input("Quantidade: "))
@@ -215,7 +247,7 @@ def manage_orders(customers, restaurants, orders, deliveries):
             
     elif choice == "4":
         customer_name = input("Nome do Cliente: ")
-        order = next((o for o in orders if o.customer.name == customer_name), None)
+        order = find_active_order(customers, orders, customer_name)
         if order:
             # Chama a função de personalização de prato
             customized_dish = customize_dish(restaurants)
@@ -224,15 +256,8 @@ def manage_orders(customers, restaurants, orders, deliveries):
                 # Como os pedidos trabalham com strings como chaves
                 dish_key = f"Personalizado: {customized_dish.get_description()}"
                 
-                # Adaptar a classe Order para lidar com pratos personalizados
-                if not hasattr(order, 'custom_dishes'):
-                    order.custom_dishes = {}
-                
-                order.custom_dishes[dish_key] = customized_dish
-                
-                # Adicionar ao dict de itens também para manter compatibilidade
                 quantity = int(input("Quantidade: "))
-                order.items[dish_key] = quantity
+                order.add_custom_item(dish_key, customized_dish, quantity)
                 
                 print("Item personalizado adicionado ao pedido com sucesso!")
             else:
@@ -242,7 +267,7 @@ def manage_orders(customers, restaurants, orders, deliveries):
             
     elif choice == "5":
         customer_name = input("Nome do Cliente: ")
-        order = next((o for o in orders if o.customer.name == customer_name), None)
+        order = find_active_order(customers, orders, customer_name)
         if order:
             instructions = input("Instruções de entrega: ")
             order.set_delivery_instructions(instructions)
@@ -252,7 +277,7 @@ def manage_orders(customers, restaurants, orders, deliveries):
             
     elif choice == "6":
         customer_name = input("Nome do Cliente: ")
-        order = next((o for o in orders if o.customer.name == customer_name), None)
+        order = find_active_order(customers, orders, customer_name)
         if order:
             time_preference = input("Horário preferido para entrega (ex: 19:30): ")
             order.set_delivery_time_preference(time_preference)
@@ -262,7 +287,7 @@ def manage_orders(customers, restaurants, orders, deliveries):
     
     elif choice == "7":
         customer_name = input("Nome do Cliente: ")
-        order = next((o for o in orders if o.customer.name == customer_name), None)
+        order = find_active_order(customers, orders, customer_name)
         if order:
             promo_code = input("Código promocional: ")
             if order.apply_promo_code(promo_code):
@@ -274,7 +299,7 @@ def manage_orders(customers, restaurants, orders, deliveries):
             
     elif choice == "8":
         customer_name = input("Nome do Cliente: ")
-        order = next((o for o in orders if o.customer.name == customer_name), None)
+        order = find_active_order(customers, orders, customer_name)
         if order:
             print(order.display_order())
         else:
@@ -282,29 +307,30 @@ def manage_orders(customers, restaurants, orders, deliveries):
             
     elif choice == "9":
         customer_name = input("Nome do Cliente: ")
-        order = next((o for o in orders if o.customer.name == customer_name), None)
+        order = find_active_order(customers, orders, customer_name)
         if order:
             # Verifica se já existe uma entrega para este pedido
-            existing_delivery = next((d for d in deliveries if d.order == order), None)
+            existing_delivery = deliveries.get(order.id)
             if not existing_delivery:
                 from delivery import Delivery
+                # Os observadores estão inscritos no barramento de eventos (ver main)
                 delivery = Delivery(order)
-
-                customer_notifier = CustomerNotifier(order.customer)
-                restaurant_notifier = RestaurantNotifier(order.restaurant)
-                analytics_tracker = AnalyticsTracker()
-
-                delivery.attach(customer_notifier)
-                delivery.attach(restaurant_notifier)
-                delivery.attach(analytics_tracker)
-
-                deliveries.append(delivery)
+                coordinates = input("Latitude e longitude do endereço de entrega (opcional): ")
+                if coordinates.strip():
+                    try:
+                        latitude, longitude = (float(value) for value in coordinates.split(","))
+                        delivery.set_destination(latitude, longitude)
+                    except ValueError:
+                        print("Coordenadas inválidas. A estimativa de entrega usará a média da região.")
+                deliveries.add(delivery)
                 # Utiliza o método finalize_order
                 print(order.end_order(delivery))
                 print("Entrega iniciada!")
                 print(delivery.display_status())
             else:
                 print("Este pedido já possui uma entrega em andamento.")
+        elif find_delivery(customers, deliveries, customer_name):
+            print("Este pedido já possui uma entrega em andamento.")
         else:
             print("Pedido não encontrado.")
             
@@ -323,10 +349,10 @@ def manage_reviews(customers, restaurants):
 
     if choice == "1":
         customer_name = input("Nome do Cliente: ")  
-        customer = next((c for c in customers if c.name == customer_name), None) 
+        customer = customers.get_by_name(customer_name) 
         if customer:
             restaurant_name = input("Nome do Restaurante: ")
-            restaurant = next((r for r in restaurants if r.name == restaurant_name), None)
+            restaurant = restaurants.get_by_name(restaurant_name)
             if restaurant:
                 review_text = input("Texto da Avaliação: ")
                 rating = float(input("Nota (0-5): "))
@@ -338,7 +364,7 @@ def manage_reviews(customers, restaurants):
             print("Cliente não encontrado.")
     elif choice == "2":
         restaurant_name = input("Nome do Restaurante: ")
-        restaurant = next((r for r in restaurants if r.name == restaurant_name), None)
+        restaurant = restaurants.get_by_name(restaurant_name)
         if restaurant:
             print(restaurant.display_reviews())
         else:
@@ -357,10 +383,10 @@ def manage_promotions(owners, restaurants):
 
     if choice == "1":
         owner_name = input("Nome do Proprietário: ")
-        owner = next((o for o in owners if o.name == owner_name), None)
+        owner = owners.get_by_name(owner_name)
         if owner:
             restaurant_name = input("Nome do Restaurante: ")
-            restaurant = next((r for r in restaurants if r.name == restaurant_name), None)
+            restaurant = restaurants.get_by_name(restaurant_name)
             if restaurant:
                 code = input("Código da Promoção: ")
                 value = float(input("Valor da Promoção (0-1): "))
@@ -372,7 +398,7 @@ def manage_promotions(owners, restaurants):
             print("Proprietário não encontrado.")
     elif choice == "2":
         restaurant_name = input("Nome do Restaurante: ")
-        restaurant = next((r for r in restaurants if r.name == restaurant_name), None)
+        restaurant = restaurants.get_by_name(restaurant_name)
         if restaurant:
             print(restaurant.display_promotions())
         else:
@@ -428,7 +454,7 @@ def manage_support(support, customers):
 
     if choice == "1":
         customer_name = input("Nome do Cliente: ") 
-        customer = next((c for c in customers if c.name == customer_name), None)  
+        customer = customers.get_by_name(customer_name)  
         if customer:
             issue = input("Descreva o problema: ")
             print(support.open_ticket(customer.name, issue))  
@@ -445,7 +471,7 @@ def manage_support(support, customers):
     else:
         print("Opção inválida. Tente novamente.")
 
-def manage_deliveries(orders, deliveries):
+def manage_deliveries(customers, deliveries, delivery_locations, dispatch_engine):
     print("\n--- Gerenciar Entregas ---")
     print("1. Rastrear entrega")
     print("2. Atualizar status da entrega")
@@ -453,20 +479,25 @@ def manage_deliveries(orders, deliveries):
     print("4. Atribuir entregador")
     print("5. Atualizar localização")
     print("6. Adicionar nota de entrega")
-    print("7. Voltar")
+    print("7. Buscar entregas próximas")
+    print("8. Cadastrar entregador")
+    print("9. Despachar entregas prontas")
+    print("10. Voltar")
     choice = input("Escolha uma opção: ")
 
     if choice == "1":
         customer_name = input("Nome do Cliente: ")
-        delivery = next((d for d in deliveries if d.order.customer.name == customer_name), None)
+        delivery = find_delivery(customers, deliveries, customer_name)
         if delivery:
+            if Delivery.eta_engine is not None:
+                Delivery.eta_engine.recompute([delivery])  # Atualiza a estimativa com a posição atual
             print(delivery.display_status())
         else:
             print("Entrega não encontrada.")
             
     elif choice == "2":
         customer_name = input("Nome do Cliente: ")
-        delivery = next((d for d in deliveries if d.order.customer.name == customer_name), None)
+        delivery = find_delivery(customers, deliveries, customer_name)
         if delivery:
             print("Status disponíveis:")
             print("1. Em preparo")
@@ -494,8 +525,11 @@ def manage_deliveries(orders, deliveries):
             
             if status_choice in status_map:
                 notes = input("Notas adicionais (opcional): ")
-                delivery.update_status(status_map[status_choice], notes)
-                print("Status da entrega atualizado com sucesso!")
+                try:
+                    delivery.update_status(status_map[status_choice], notes)
+                    print("Status da entrega atualizado com sucesso!")
+                except ValueError as e:
+                    print(f"Erro: {e}")
             else:
                 print("Opção inválida.")
         else:
@@ -503,7 +537,7 @@ def manage_deliveries(orders, deliveries):
             
     elif choice == "3":
         customer_name = input("Nome do Cliente: ")
-        delivery = next((d for d in deliveries if d.order.customer.name == customer_name), None)
+        delivery = find_delivery(customers, deliveries, customer_name)
         if delivery:
             delivery.simulate_delivery_progress()
             print("Progresso da entrega simulado com sucesso!")
@@ -513,17 +547,20 @@ def manage_deliveries(orders, deliveries):
             
     elif choice == "4":
         customer_name = input("Nome do Cliente: ")
-        delivery = next((d for d in deliveries if d.order.customer.name == customer_name), None)
+        delivery = find_delivery(customers, deliveries, customer_name)
         if delivery:
             delivery_person = input("Nome do entregador: ")
-            delivery.assign_delivery_person(delivery_person)
-            print(f"Entregador {delivery_person} designado com sucesso!")
+            try:
+                delivery.assign_delivery_person(delivery_person)
+                print(f"Entregador {delivery_person} designado com sucesso!")
+            except ValueError as e:
+                print(f"Erro: {e}")
         else:
             print("Entrega não encontrada.")
             
     elif choice == "5":
         customer_name = input("Nome do Cliente: ")
-        delivery = next((d for d in deliveries if d.order.customer.name == customer_name), None)
+        delivery = find_delivery(customers, deliveries, customer_name)
         if delivery:
             try:
                 latitude = float(input("Latitude: "))
@@ -537,7 +574,7 @@ def manage_deliveries(orders, deliveries):
             
     elif choice == "6":
         customer_name = input("Nome do Cliente: ")
-        delivery = next((d for d in deliveries if d.order.customer.name == customer_name), None)
+        delivery = find_delivery(customers, deliveries, customer_name)
         if delivery:
             note = input("Nota de entrega: ")
             delivery.add_delivery_note(note)
@@ -546,6 +583,38 @@ def manage_deliveries(orders, deliveries):
             print("Entrega não encontrada.")
             
     elif choice == "7":
+        try:
+            latitude = float(input("Latitude: "))
+            longitude = float(input("Longitude: "))
+            radius = float(input("Raio (km): "))
+        except ValueError:
+            print("Valores inválidos. Use valores numéricos.")
+            return
+        nearby = delivery_locations.within_radius(latitude, longitude, radius)
+        if not nearby:
+            print("Nenhuma entrega em andamento nesse raio.")
+        for delivery, distance in nearby:
+            print(f"Pedido #{format_id(delivery.order.id)} - {delivery.order.customer.name} - "
+                  f"{delivery.status} - {distance:.2f} km")
+
+    elif choice == "8":
+        name = input("Nome do entregador: ")
+        try:
+            latitude = float(input("Latitude: "))
+            longitude = float(input("Longitude: "))
+        except ValueError:
+            print("Coordenadas inválidas. Use valores numéricos.")
+            return
+        dispatch_engine.couriers.add(Courier(name, latitude, longitude))
+        print(f"Entregador {name} cadastrado com sucesso!")
+
+    elif choice == "9":
+        result = dispatch_engine.tick(deliveries)
+        for delivery, courier, distance in result.assignments:
+            print(f"Pedido #{format_id(delivery.order.id)} - {courier.name} ({distance:.2f} km do restaurante)")
+        print(f"{len(result.assignments)} entregas designadas, {len(result.pending)} aguardando entregador.")
+
+    elif choice == "10":
         pass  # Voltar ao menu principal
         
     else:
@@ -554,26 +623,32 @@ def manage_deliveries(orders, deliveries):
 def view_customer_notifications(customers):
     print("\n--- Visualizar Notificações ---")
     customer_name = input("Nome do Cliente: ")
-    customer = next((c for c in customers if c.name == customer_name), None)
+    customer = customers.get_by_name(customer_name)
 
     if not customer:
         print("Cliente não encontrado.")
         return
     
-    if not hasattr(customer, 'notifications') or not customer.notifications:
+    inbox = customer.notifications
+    if not inbox:
         print(f"{customer.name} não possui notificações.")
         return
     
-    print(f"\nNotificações para {customer.name}:")
-    for i, notification in enumerate(customer.notifications, 1):
-        timestamp = notification['timestamp'].strftime("%d/%m/%Y %H:%M:%S")
-        print(f"{i}. ['timestamp'] {notification['message']}")
+    print(f"\nNotificações para {customer.name} ({inbox.unread_count()} não lidas):")
+    page = inbox.last(10)  # Só a página mais recente
+    for notification in page:
+        timestamp = notification.timestamp.strftime("%d/%m/%Y %H:%M:%S")
+        marker = "" if notification.read else " (nova)"
+        print(f"{notification.id}. [{timestamp}] {notification.message}{marker}")
+    if len(inbox) > len(page):
+        print(f"Exibindo as {len(page)} notificações mais recentes de {len(inbox)}.")
+    inbox.mark_read(page)
 
 def customize_dish(restaurants):
     print("\n--- Personalizar Prato ---")
     
     restaurant_name = input("Nome do Restaurante: ")
-    restaurant = next((r for r in restaurants if r.name == restaurant_name), None)
+    restaurant = restaurants.get_by_name(restaurant_name)
     if not restaurant:
         print("Restaurante não encontrado.")
         return None
@@ -627,12 +702,34 @@ def customize_dish(restaurants):
 
 
 def main():
-    customers = []
-    owners = []
-    restaurants = []
-    orders = []
+    customers = EntityRegistry()
+    owners = EntityRegistry()
+    restaurants = EntityRegistry(fields=("name",))
+    orders = OrderIndex()
     support = Support()
-    deliveries = []
+    deliveries = DeliveryIndex()
+
+    # Exibe as mensagens informativas (como o registro no analytics), mas não as de depuração
+    instrumentation.set_level(INFO)
+
+    # Observadores de entrega: uma única inscrição por tópico, válida para todas as entregas
+    event_bus.subscribe(DELIVERY_STATUS_CHANGED, CustomerNotifier())
+    event_bus.subscribe(DELIVERY_STATUS_CHANGED, RestaurantNotifier())
+    event_bus.subscribe(DELIVERY_STATUS_CHANGED, AnalyticsTracker())
+
+    # Índice espacial das entregas em andamento, mantido pelos eventos de localização
+    delivery_locations = DeliveryLocationIndex()
+    delivery_locations.subscribe(event_bus)
+
+    # Entregadores disponíveis e o despacho automático das entregas prontas
+    couriers = CourierPool()
+    couriers.subscribe(event_bus)
+    dispatch_engine = DispatchEngine(couriers)
+
+    # Estimativas de entrega pela distância e pelas velocidades aprendidas com as entregas concluídas
+    eta_engine = EtaEngine()
+    eta_engine.subscribe(event_bus)
+    Delivery.eta_engine = eta_engine
 
     while True:
         choice = main_menu()
@@ -662,7 +759,7 @@ def main():
             manage_support(support, customers)
 
         elif choice == "8":
-            manage_deliveries(orders, deliveries)
+            manage_deliveries(customers, deliveries, delivery_locations, dispatch_engine)
 
         elif choice == "9":
             view_customer_notifications(customers)
@@ -0,0 +1,694 @@
+"""
+Benchmarks de desempenho do sistema.
+
+Uso:
+    python benchmarks.py [nome]
+
+Sem argumentos, executa todos os benchmarks.
+"""
+import contextlib
+import datetime
+import io
+import os
+import random
+import sys
+import time
+import tracemalloc
+import types
+
+
+@contextlib.contextmanager
+def _quiet():
+    """
+    Mantém a instrumentação no nível WARNING durante o bloco: as mensagens
+    info/debug (por exemplo, de add_order_data e update_status) não são
+    formatadas nem impressas, qualquer que seja o nível configurado.
+    """
+    from instrumentation import instrumentation, WARNING
+
+    previous_level = instrumentation.level
+    instrumentation.set_level(max(previous_level, WARNING))
+    try:
+        yield
+    finally:
+        instrumentation.set_level(previous_level)
+
+
+def _build_restaurants(restaurant_count, orders_per_restaurant, seed=42):
+    """Cria restaurantes com cardápio e histórico de pedidos sintéticos."""
+    from users import Customer, Owner
+    from restaurant import Restaurant
+    from order import Order
+
+    rng = random.Random(seed)
+    owner = Owner("owner", "Proprietário", "owner@example.com", "0", "senha")
+    customers = [Customer(f"c{i}", f"Cliente {i}", f"c{i}@example.com", "0", "senha") for i in range(2000)]
+    dishes = [f"Prato {i}" for i in range(40)]
+    restaurants = []
+    # add_order_data só registra uma mensagem por pedido com o nível INFO ou abaixo
+    with _quiet():
+        for r in range(restaurant_count):
+            restaurant = Restaurant(f"Restaurante {r}", "Endereço", owner)
+            for dish in dishes:
+                restaurant.menu.add_dish(owner, dish, rng.uniform(10, 80))
+            for _ in range(orders_per_restaurant):
+                order = Order(rng.choice(customers), restaurant)
+                for dish in rng.sample(dishes, rng.randint(1, 4)):
+                    order.add_item(dish, rng.randint(1, 3))
+                order.end_order()
+            restaurants.append(restaurant)
+    return restaurants
+
+
+def _check_platform_analytics(restaurants, platform):
+    """
+    Confere o map-reduce contra as métricas de cada restaurante: o parcial de
+    cada restaurante reproduz a sua retenção, e a plataforma é a soma dos
+    parciais (pedidos, receita e pedidos por cliente).
+    """
+    from collections import Counter
+    from platform_analytics import compute_partial
+
+    customer_orders = Counter()
+    total_orders = 0
+    total_revenue = 0.0
+    for restaurant in restaurants:
+        analytics = restaurant.analytics
+        partial = compute_partial(analytics.export_state())
+        returning = sum(1 for count in partial.customer_orders.values() if count > 1)
+        expected = analytics.get_customer_retention()
+        if (len(partial.customer_orders), returning) != (expected["unique_customers"], expected["returning_customers"]):
+            raise RuntimeError(f"Retenção divergente em {restaurant.name}.")
+        if partial.order_count != analytics.get_total_orders():
+            raise RuntimeError(f"Número de pedidos divergente em {restaurant.name}.")
+        customer_orders.update(partial.customer_orders)
+        total_orders += partial.order_count
+        total_revenue += partial.revenue
+
+    retention = platform.get_customer_retention()
+    returning = sum(1 for count in customer_orders.values() if count > 1)
+    if (retention["unique_customers"], retention["returning_customers"]) != (len(customer_orders), returning):
+        raise RuntimeError("A retenção da plataforma difere da soma dos restaurantes.")
+    if platform.get_total_orders() != total_orders or abs(platform.get_total_revenue() - total_revenue) > 1e-6:
+        raise RuntimeError("Os totais da plataforma diferem da soma dos restaurantes.")
+
+
+def benchmark_platform_analytics(restaurant_count=64, orders_per_restaurant=2000):
+    """Mede o tempo do map-reduce de PlatformAnalytics com diferentes números de processos."""
+    from platform_analytics import PlatformAnalytics
+
+    restaurants = _build_restaurants(restaurant_count, orders_per_restaurant)
+    # Compacta metade dos restaurantes, para que o map-reduce combine resumos e linhas brutas
+    for restaurant in restaurants[::2]:
+        analytics = restaurant.analytics
+        analytics.compact(datetime.datetime.now() + analytics.raw_window + datetime.timedelta(minutes=1))
+    total_orders = restaurant_count * orders_per_restaurant
+    print(f"PlatformAnalytics: {restaurant_count} restaurantes, {total_orders} pedidos, "
+          f"{os.cpu_count()} núcleos disponíveis")
+
+    baseline = None
+    workers = 1
+    while workers <= max(1, os.cpu_count() or 1):
+        platform = PlatformAnalytics(restaurants, max_workers=workers)
+        start = time.perf_counter()
+        platform.compute()
+        elapsed = time.perf_counter() - start
+        baseline = baseline or elapsed
+        print(f"  {workers:>2} processo(s): {elapsed * 1000:8.1f} ms  (speedup {baseline / elapsed:.2f}x)")
+        workers *= 2
+    _check_platform_analytics(restaurants, platform)
+    print("  Métricas conferidas com a soma dos restaurantes (metade compactada)")
+
+
+def _bytes_per_object(factory, count):
+    """Memória alocada (medida com tracemalloc) por objeto criado por factory."""
+    keep = []
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    for i in range(count):
+        keep.append(factory(i))
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    # Desconta a própria lista que mantém os objetos vivos
+    return (after - before - sys.getsizeof(keep)) / count
+
+
+def _unslotted(cls, copies):
+    """
+    Cópia de cls sem __slots__, com um __dict__ por instância, como as classes
+    eram antes dos slots. As bases do projeto também são copiadas; copies guarda
+    as cópias já feitas (classe original -> cópia).
+    """
+    if cls in copies:
+        return copies[cls]
+    if cls.__module__ in ("builtins", "abc"):
+        return cls
+    bases = tuple(_unslotted(base, copies) for base in cls.__bases__)
+    slots = cls.__dict__.get("__slots__", ())
+    slots = (slots,) if isinstance(slots, str) else slots
+    skip = set(slots) | {"__slots__", "__dict__", "__weakref__", "__abstractmethods__", "_abc_impl"}
+    namespace = {name: value for name, value in cls.__dict__.items() if name not in skip}
+    copy = type(cls)(cls.__name__, bases, namespace)
+    for name, value in namespace.items():
+        # super() sem argumentos usa a célula __class__, que aponta para a classe original
+        if isinstance(value, types.FunctionType) and "__class__" in value.__code__.co_freevars:
+            closure = tuple(types.CellType(copy) if var == "__class__" else cell
+                            for var, cell in zip(value.__code__.co_freevars, value.__closure__))
+            setattr(copy, name, types.FunctionType(value.__code__, value.__globals__, name,
+                                                   value.__defaults__, closure))
+    copies[cls] = copy
+    return copy
+
+
+@contextlib.contextmanager
+def _without_slots(*names):
+    """
+    Substitui, durante o bloco, as classes informadas ("módulo.Classe") por
+    cópias sem __slots__ nos seus módulos, para que os objetos criados
+    internamente (linhas do pedido, localização da entrega) também usem __dict__.
+    Retorna um dicionário nome -> cópia.
+    """
+    import importlib
+
+    copies = {}
+    replaced = {}
+    for name in names:
+        module_name, class_name = name.rsplit(".", 1)
+        module = importlib.import_module(module_name)
+        original = getattr(module, class_name)
+        replaced[name] = (module, class_name, original)
+    # Uma única cópia por classe, mesmo quando ela é importada em vários módulos
+    shared = {}
+    for name, (module, class_name, original) in replaced.items():
+        copies[class_name] = _unslotted(original, shared)
+        setattr(module, class_name, copies[class_name])
+    try:
+        yield copies
+    finally:
+        for module, class_name, original in replaced.values():
+            setattr(module, class_name, original)
+
+
+def benchmark_memory(count=20000):
+    """Mede os bytes alocados por pedido, por entrega e por prato, sem e com __slots__."""
+    from users import Customer, Owner
+    from restaurant import Restaurant
+    import order
+    import delivery
+    import dish_decorator
+
+    owner = Owner("owner", "Proprietário", "owner@example.com", "0", "senha")
+    customer = Customer("c0", "Cliente", "c0@example.com", "0", "senha")
+    restaurant = Restaurant("Restaurante", "Endereço", owner)
+    dishes = [f"Prato {i}" for i in range(3)]
+    for dish in dishes:
+        restaurant.menu.add_dish(owner, dish, 25.0)
+
+    def measure():
+        Order, Delivery = order.Order, delivery.Delivery
+        BasicDish, ExtraCheese, ExtraBacon = dish_decorator.BasicDish, dish_decorator.ExtraCheese, dish_decorator.ExtraBacon
+
+        def make_order(i):
+            new_order = Order(customer, restaurant)
+            for dish in dishes:
+                new_order.add_item(dish, 2)
+            return new_order
+
+        orders = [make_order(i) for i in range(count)]
+
+        def make_delivery(i):
+            new_delivery = Delivery(orders[i])
+            new_delivery.update_status(Delivery.STATUS_READY, "Pronto")
+            new_delivery.assign_delivery_person("Entregador")
+            return new_delivery
+
+        per_order = _bytes_per_object(make_order, count)
+        # update_status só registra mensagens de depuração com o nível DEBUG
+        with _quiet():
+            per_delivery = _bytes_per_object(make_delivery, count)
+        per_dish = _bytes_per_object(lambda i: BasicDish(f"Prato {i}", 10.0, "Descrição"), count)
+        per_custom = _bytes_per_object(lambda i: ExtraBacon(ExtraCheese(BasicDish("Prato", 10.0))), count)
+        return per_order, per_delivery, per_dish, per_custom
+
+    # Linha de base: as mesmas classes, copiadas sem __slots__
+    with _without_slots("order.Order", "order.OrderLine", "order_line.OrderLine", "delivery.Delivery",
+                        "delivery.DeliveryLocation", "delivery.StatusHistory", "dish_decorator.BasicDish",
+                        "dish_decorator.ExtraCheese", "dish_decorator.ExtraBacon"):
+        before = measure()
+    after = measure()
+
+    labels = ("Pedido (3 itens)", "Entrega (3 status)", "Prato", "Prato com 2 adicionais")
+    print(f"Memória por objeto ({count} objetos de cada tipo), em bytes:")
+    print(f"  {'':26s}{'sem slots':>10s}{'com slots':>11s}")
+    for label, without, with_slots in zip(labels, before, after):
+        print(f"  {label + ':':26s}{without:10.1f}{with_slots:11.1f}")
+
+
+def benchmark_delivery_transitions(count=20000):
+    """Compara o avanço de entregas uma a uma (simulate_delivery_progress) com Delivery.advance_all."""
+    from users import Customer, Owner
+    from restaurant import Restaurant
+    from order import Order
+    from delivery import Delivery
+
+    owner = Owner("owner", "Proprietário", "owner@example.com", "0", "senha")
+    customer = Customer("c0", "Cliente", "c0@example.com", "0", "senha")
+    restaurant = Restaurant("Restaurante", "Endereço", owner)
+    print(f"Transições de entrega: {count} entregas, 3 passos cada")
+
+    # update_status só registra mensagens de depuração com o nível DEBUG
+    with _quiet():
+        deliveries = [Delivery(Order(customer, restaurant)) for _ in range(count)]
+        start = time.perf_counter()
+        for delivery in deliveries:
+            for _ in range(3):
+                delivery.simulate_delivery_progress()
+        one_by_one = time.perf_counter() - start
+
+        deliveries = [Delivery(Order(customer, restaurant)) for _ in range(count)]
+        for delivery in deliveries:
+            # advance_all só designa entregas que já têm entregador
+            delivery.delivery_person = f"Entregador #{random.randint(1000, 9999)}"
+        start = time.perf_counter()
+        Delivery.advance_all(deliveries, steps=3)
+        bulk = time.perf_counter() - start
+    print(f"  Uma a uma:   {one_by_one * 1000:8.1f} ms")
+    print(f"  advance_all: {bulk * 1000:8.1f} ms  ({one_by_one / bulk:.1f}x)")
+
+
+def _check_event_bus():
+    """Confere que has_subscribers volta a ser False quando a última inscrição de cada tipo é cancelada."""
+    from event_bus import EventBus, DELIVERY_STATUS_CHANGED
+    from observer import CustomerNotifier
+
+    bus = EventBus()
+    for filters in ({}, {"restaurant_id": 1}, {"customer_id": 1}):
+        subscriptions = [bus.subscribe(DELIVERY_STATUS_CHANGED, CustomerNotifier(), **filters) for _ in range(2)]
+        for subscription in subscriptions:
+            if not bus.has_subscribers(DELIVERY_STATUS_CHANGED):
+                raise RuntimeError(f"has_subscribers é False com inscrições ativas ({filters}).")
+            bus.unsubscribe(subscription)
+        if bus.has_subscribers(DELIVERY_STATUS_CHANGED):
+            raise RuntimeError(f"has_subscribers continua True sem inscrições ({filters}).")
+
+
+def benchmark_async_dispatch(count=2000, observer_delay=0.0005):
+    """Mede o tempo gasto em update_status com um observador lento, com e sem AsyncDispatcher."""
+    from users import Customer, Owner
+    from restaurant import Restaurant
+    from order import Order
+    from delivery import Delivery
+    from observer import AsyncDispatcher, DeliveryObserver, DeliverySubject
+
+    class SlowObserver(DeliveryObserver):
+        def update(self, delivery):
+            time.sleep(observer_delay)  # Simula o envio de um SMS ou email
+
+    owner = Owner("owner", "Proprietário", "owner@example.com", "0", "senha")
+    customer = Customer("c0", "Cliente", "c0@example.com", "0", "senha")
+    restaurant = Restaurant("Restaurante", "Endereço", owner)
+    observer = SlowObserver()
+    print(f"Notificações: {count} mudanças de status, observador de {observer_delay * 1000:.1f} ms")
+
+    def run():
+        deliveries = [Delivery(Order(customer, restaurant)) for _ in range(count)]
+        for delivery in deliveries:
+            delivery.attach(observer)
+        start = time.perf_counter()
+        for delivery in deliveries:
+            delivery.update_status(Delivery.STATUS_READY)
+        return time.perf_counter() - start
+
+    # update_status só registra mensagens de depuração com o nível DEBUG
+    with _quiet():
+        synchronous = run()
+        DeliverySubject.dispatcher = AsyncDispatcher(max_queue_size=count)
+        try:
+            asynchronous = run()
+            start = time.perf_counter()
+            DeliverySubject.dispatcher.flush()
+            drain = time.perf_counter() - start
+        finally:
+            DeliverySubject.dispatcher.close()
+            DeliverySubject.dispatcher = None
+    print(f"  Síncrono:    {synchronous * 1000:8.1f} ms em update_status")
+    print(f"  Assíncrono:  {asynchronous * 1000:8.1f} ms em update_status (+{drain * 1000:.1f} ms para esvaziar a fila)")
+    _check_event_bus()
+    print("  Inscrições do barramento conferidas após subscribe/unsubscribe")
+
+
+def benchmark_instrumentation(count=20000):
+    """Mede o custo de update_status com a instrumentação desligada, com métricas e com mensagens de depuração."""
+    from users import Customer, Owner
+    from restaurant import Restaurant
+    from order import Order
+    from delivery import Delivery
+    from observer import AnalyticsTracker
+    from instrumentation import instrumentation, DEBUG, OFF
+
+    owner = Owner("owner", "Proprietário", "owner@example.com", "0", "senha")
+    customer = Customer("c0", "Cliente", "c0@example.com", "0", "senha")
+    restaurant = Restaurant("Restaurante", "Endereço", owner)
+    restaurant.menu.add_dish(owner, "Prato", 25.0)
+    tracker = AnalyticsTracker()
+    print(f"Instrumentação: {count} mudanças de status com AnalyticsTracker")
+
+    def run():
+        deliveries = []
+        for _ in range(count):
+            order = Order(customer, restaurant)
+            order.add_item("Prato", 1)
+            delivery = Delivery(order)
+            delivery.attach(tracker)
+            deliveries.append(delivery)
+        start = time.perf_counter()
+        for delivery in deliveries:
+            delivery.update_status(Delivery.STATUS_READY)
+        return time.perf_counter() - start
+
+    saved_level, saved_metrics = instrumentation.level, instrumentation.metrics_enabled
+    try:
+        instrumentation.set_level(OFF)
+        instrumentation.enable_metrics(False)
+        disabled = run()
+        instrumentation.enable_metrics(True)
+        instrumentation.reset()
+        with_metrics = run()
+        report = instrumentation.report()
+        instrumentation.enable_metrics(False)
+        instrumentation.set_level(DEBUG)
+        # As mensagens vão para um buffer, para medir só o custo de formatá-las
+        with contextlib.redirect_stdout(io.StringIO()):
+            with_debug = run()
+    finally:
+        instrumentation.set_level(saved_level)
+        instrumentation.enable_metrics(saved_metrics)
+    print(f"  Desligada:          {disabled * 1000:8.1f} ms")
+    print(f"  Com métricas:       {with_metrics * 1000:8.1f} ms")
+    print(f"  Com nível DEBUG:    {with_debug * 1000:8.1f} ms")
+    print(report)
+
+
+def benchmark_geo_index(count=100000, queries=200, seed=42):
+    """Mede atualizações e consultas do GridIndex com pontos em movimento, comparando com a varredura linear."""
+    from geo import haversine_km
+    from geo_index import GridIndex
+
+    rng = random.Random(seed)
+    center_lat, center_lon = -9.6498, -35.7089  # Maceió
+    points = {i: (center_lat + rng.uniform(-0.15, 0.15), center_lon + rng.uniform(-0.15, 0.15)) for i in range(count)}
+    index = GridIndex(cell_size_km=0.5)
+    print(f"Índice espacial: {count} pontos em movimento, {queries} consultas de cada tipo")
+
+    start = time.perf_counter()
+    for key, (latitude, longitude) in points.items():
+        index.update(key, latitude, longitude)
+    inserted = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for key, (latitude, longitude) in points.items():
+        moved = (latitude + rng.uniform(-0.001, 0.001), longitude + rng.uniform(-0.001, 0.001))
+        points[key] = moved
+        index.update(key, *moved)
+    moved_time = time.perf_counter() - start
+    print(f"  Inserção:            {inserted / count * 1e6:8.2f} µs/ponto")
+    print(f"  Movimentação:        {moved_time / count * 1e6:8.2f} µs/ponto")
+
+    targets = [(center_lat + rng.uniform(-0.1, 0.1), center_lon + rng.uniform(-0.1, 0.1)) for _ in range(queries)]
+    start = time.perf_counter()
+    found = sum(len(index.within_radius(latitude, longitude, 2.0)) for latitude, longitude in targets)
+    radius_time = time.perf_counter() - start
+    start = time.perf_counter()
+    for latitude, longitude in targets:
+        index.within_bbox(latitude - 0.01, longitude - 0.01, latitude + 0.01, longitude + 0.01)
+    bbox_time = time.perf_counter() - start
+    start = time.perf_counter()
+    for latitude, longitude in targets:
+        index.nearest(latitude, longitude, k=10)
+    nearest_time = time.perf_counter() - start
+    linear_queries = max(1, queries // 20)
+    start = time.perf_counter()
+    for latitude, longitude in targets[:linear_queries]:
+        [key for key, point in points.items() if haversine_km(latitude, longitude, *point) <= 2.0]
+    linear_time = (time.perf_counter() - start) / linear_queries * queries
+    print(f"  Raio de 2 km:        {radius_time / queries * 1000:8.2f} ms/consulta "
+          f"({found / queries:.0f} pontos em média)")
+    print(f"  Retângulo:           {bbox_time / queries * 1000:8.2f} ms/consulta")
+    print(f"  10 mais próximos:    {nearest_time / queries * 1000:8.2f} ms/consulta")
+    print(f"  Raio, varredura:     {linear_time / queries * 1000:8.2f} ms/consulta")
+
+
+def benchmark_courier_dispatch(delivery_count=5000, courier_count=4000, restaurant_count=300, seed=42):
+    """Mede um ciclo do DispatchEngine com milhares de entregas prontas, com e sem limite de tempo."""
+    from users import Customer, Owner
+    from restaurant import Restaurant
+    from order import Order
+    from delivery import Delivery
+    from dispatch import Courier, CourierPool, DispatchEngine
+
+    rng = random.Random(seed)
+    center_lat, center_lon = -9.6498, -35.7089  # Maceió
+    owner = Owner("owner", "Proprietário", "owner@example.com", "0", "senha")
+    customer = Customer("c0", "Cliente", "c0@example.com", "0", "senha")
+    restaurants = [Restaurant(f"Restaurante {i}", "Endereço", owner,
+                              center_lat + rng.uniform(-0.1, 0.1), center_lon + rng.uniform(-0.1, 0.1))
+                   for i in range(restaurant_count)]
+    courier_positions = [(center_lat + rng.uniform(-0.12, 0.12), center_lon + rng.uniform(-0.12, 0.12))
+                         for _ in range(courier_count)]
+    print(f"Despacho de entregadores: {delivery_count} entregas prontas, {courier_count} entregadores")
+    def prepare(count, **options):
+        pool = CourierPool()
+        for i, (latitude, longitude) in enumerate(courier_positions):
+            pool.add(Courier(f"Entregador {i}", latitude, longitude))
+        deliveries = [Delivery(Order(customer, rng.choice(restaurants))) for _ in range(count)]
+        Delivery.advance_all(deliveries, event=Delivery.EVENT_READY)
+        return DispatchEngine(pool, **options), deliveries
+
+    def report(name, results):
+        assignments = [item for result in results for item in result.assignments]
+        distance = sum(item[2] for item in assignments) / max(1, len(assignments))
+        slowest = max(result.elapsed for result in results)
+        print(f"  {name + ':':22s}{len(results):3d} ciclo(s), o mais lento com {slowest * 1000:7.1f} ms; "
+              f"{len(assignments)} designadas, {distance:.2f} km em média até o restaurante")
+
+    # update_status só registra mensagens de depuração com o nível DEBUG
+    with _quiet():
+        engine, deliveries = prepare(delivery_count, time_budget=float("inf"))
+        unlimited = [engine.dispatch(deliveries)]
+        engine, deliveries = prepare(delivery_count, time_budget=0.05)
+        limited = [engine.dispatch(deliveries)]
+        while limited[-1].assignments:
+            limited.append(engine.dispatch(limited[-1].pending))
+        state = rng.getstate()
+        engine, deliveries = prepare(20, optimal_batch_size=0)
+        greedy = [engine.dispatch(deliveries)]
+        rng.setstate(state)  # Mesmo lote nos dois modos
+        engine, deliveries = prepare(20, optimal_batch_size=20)
+        optimal = [engine.dispatch(deliveries)]
+    report("Sem limite de tempo", unlimited)
+    report("Limite de 50 ms", limited)
+    report("Lote de 20, guloso", greedy)
+    report("Lote de 20, ótimo", optimal)
+
+def benchmark_eta(count=20000, history=5000, seed=42):
+    """Mede o aprendizado das velocidades e o recálculo em lote das estimativas de entrega."""
+    from users import Customer, Owner
+    from restaurant import Restaurant
+    from order import Order
+    from delivery import Delivery
+    from eta import EtaEngine
+
+    rng = random.Random(seed)
+    center_lat, center_lon = -9.6498, -35.7089  # Maceió
+    owner = Owner("owner", "Proprietário", "owner@example.com", "0", "senha")
+    customer = Customer("c0", "Cliente", "c0@example.com", "0", "senha")
+    restaurants = [Restaurant(f"Restaurante {i}", "Endereço", owner,
+                              center_lat + rng.uniform(-0.1, 0.1), center_lon + rng.uniform(-0.1, 0.1))
+                   for i in range(200)]
+
+    def make_delivery():
+        delivery = Delivery(Order(customer, rng.choice(restaurants)))
+        delivery.set_destination(center_lat + rng.uniform(-0.12, 0.12), center_lon + rng.uniform(-0.12, 0.12))
+        return delivery
+
+    engine = EtaEngine()
+    print(f"Estimativas de entrega: {history} entregas concluídas, {count} em andamento")
+    completed = []
+    start_of_day = datetime.datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    for _ in range(history):
+        delivery = make_delivery()
+        picked_up = start_of_day + datetime.timedelta(minutes=rng.uniform(0, 24 * 60))
+        delivery.add_status_update(Delivery.STATUS_PICKED_UP, moment=picked_up)
+        delivery.add_status_update(Delivery.STATUS_DELIVERED, moment=picked_up + datetime.timedelta(minutes=rng.uniform(8, 45)))
+        completed.append(delivery)
+    start = time.perf_counter()
+    engine.learn(completed)
+    learn_time = time.perf_counter() - start
+
+    in_flight = []
+    for _ in range(count):
+        delivery = make_delivery()
+        delivery.add_status_update(Delivery.STATUS_ON_THE_WAY)
+        delivery.location.update_location(center_lat + rng.uniform(-0.1, 0.1), center_lon + rng.uniform(-0.1, 0.1))
+        in_flight.append(delivery)
+    now = datetime.datetime.now()
+    start = time.perf_counter()
+    for delivery in in_flight:
+        engine.estimate(delivery, now)
+    one_by_one = time.perf_counter() - start
+    start = time.perf_counter()
+    engine.recompute(in_flight, now)
+    bulk = time.perf_counter() - start
+    print(f"  Aprendizado:        {learn_time / history * 1e6:8.2f} µs/entrega")
+    print(f"  Uma a uma:          {one_by_one * 1000:8.1f} ms")
+    print(f"  recompute:          {bulk * 1000:8.1f} ms  ({one_by_one / bulk:.1f}x)")
+
+
+def benchmark_gps_ingest(count=20000, pings_per_delivery=5, seed=42):
+    """Compara a ingestão de leituras de GPS uma a uma (update_location) com Delivery.ingest_locations."""
+    from users import Customer, Owner
+    from restaurant import Restaurant
+    from order import Order
+    from delivery import Delivery
+    from order_index import DeliveryIndex
+
+    rng = random.Random(seed)
+    center_lat, center_lon = -9.6498, -35.7089  # Maceió
+    owner = Owner("owner", "Proprietário", "owner@example.com", "0", "senha")
+    customer = Customer("c0", "Cliente", "c0@example.com", "0", "senha")
+    restaurant = Restaurant("Restaurante", "Endereço", owner)
+    total = count * pings_per_delivery
+    print(f"Leituras de GPS: {count} entregas a caminho, {total} leituras")
+
+    def prepare():
+        deliveries = DeliveryIndex()
+        in_flight = []
+        for _ in range(count):
+            delivery = Delivery(Order(customer, restaurant))
+            delivery.set_destination(center_lat + rng.uniform(-0.1, 0.1), center_lon + rng.uniform(-0.1, 0.1))
+            delivery.delivery_person = "Entregador"
+            deliveries.add(delivery)
+            in_flight.append(delivery)
+        Delivery.advance_all(in_flight, steps=4)  # Até "A caminho"
+        # Leituras em torno do destino: parte das entregas cruza os limites de proximidade
+        now = time.time()
+        pings = []
+        for step in range(pings_per_delivery):
+            for delivery in in_flight:
+                latitude, longitude = delivery.destination
+                spread = 0.03 / (step + 1)
+                pings.append((delivery.order.id, latitude + rng.uniform(-spread, spread),
+                              longitude + rng.uniform(-spread, spread), now + step))
+        return deliveries, pings
+
+    # update_status só registra mensagens de depuração com o nível DEBUG
+    with _quiet():
+        deliveries, pings = prepare()
+        start = time.perf_counter()
+        for order_id, latitude, longitude, moment in pings:
+            deliveries.get(order_id).update_location(latitude, longitude, datetime.datetime.fromtimestamp(moment))
+        one_by_one = time.perf_counter() - start
+
+        deliveries, pings = prepare()
+        order_ids, latitudes, longitudes, timestamps = (list(column) for column in zip(*pings))
+        start = time.perf_counter()
+        result = Delivery.ingest_locations(deliveries, order_ids, latitudes, longitudes, timestamps)
+        bulk = time.perf_counter() - start
+    print(f"  Uma a uma:           {total / one_by_one:10,.0f} leituras/s")
+    print(f"  ingest_locations:    {total / bulk:10,.0f} leituras/s  ({one_by_one / bulk:.1f}x; "
+          f"{result['near']} próximas, {result['arrived']} chegaram)")
+
+
+def _check_compacted_trail(pings=200):
+    """Confere que compact_trail não altera as estatísticas do trajeto (zigue-zague a cada 15 m)."""
+    from users import Customer, Owner
+    from restaurant import Restaurant
+    from order import Order
+    from delivery import Delivery
+
+    owner = Owner("owner", "Proprietário", "owner@example.com", "0", "senha")
+    customer = Customer("c0", "Cliente", "c0@example.com", "0", "senha")
+    delivery = Delivery(Order(customer, Restaurant("Restaurante", "Endereço", owner)))
+    start = datetime.datetime.now()
+    for step in range(pings):
+        delivery.update_location(-9.6498 + step * 0.0001, -35.7089 + (step % 2) * 0.00005,
+                                 start + datetime.timedelta(seconds=step * 5))
+    before = delivery.trail.get_stats()
+    delivery.compact_trail(0.01)
+    after = delivery.trail.get_stats()
+    for key in ("distance_km", "duration_seconds", "average_speed_kmh", "max_speed_kmh"):
+        if after[key] != before[key]:
+            raise RuntimeError(f"compact_trail alterou {key}: {before[key]} -> {after[key]}.")
+    if after["points"] >= before["points"]:
+        raise RuntimeError("compact_trail não removeu leituras do zigue-zague.")
+
+
+def benchmark_location_trail(count=500, pings=600, seed=42):
+    """Compara a memória de um LocationTrail com a lista de leituras, e mede a decodificação e a simplificação."""
+    from location_trail import LocationTrail
+
+    rng = random.Random(seed)
+    start_time = time.time()
+    routes = []
+    for _ in range(count):
+        latitude, longitude = -9.6498 + rng.uniform(-0.05, 0.05), -35.7089 + rng.uniform(-0.05, 0.05)
+        heading_lat, heading_lon = rng.uniform(-1, 1), rng.uniform(-1, 1)
+        route = []
+        for step in range(pings):
+            # Leituras a cada 2 s, seguindo uma direção que muda aos poucos
+            heading_lat += rng.uniform(-0.2, 0.2)
+            heading_lon += rng.uniform(-0.2, 0.2)
+            latitude += heading_lat * 0.00005
+            longitude += heading_lon * 0.00005
+            route.append((latitude, longitude, start_time + step * 2))
+        routes.append(route)
+    print(f"Trajetos de entrega: {count} entregas com {pings} leituras cada")
+
+    def as_tuples(i):
+        return [(latitude, longitude, datetime.datetime.fromtimestamp(moment)) for latitude, longitude, moment in routes[i]]
+
+    def as_trail(i):
+        trail = LocationTrail()
+        trail.extend(*zip(*routes[i]))
+        return trail
+
+    tuples_bytes = _bytes_per_object(as_tuples, count) / pings
+    trail_bytes = _bytes_per_object(as_trail, count) / pings
+    trails = [as_trail(i) for i in range(count)]
+    start = time.perf_counter()
+    for trail in trails:
+        for _ in trail:
+            pass
+    decode = time.perf_counter() - start
+    start = time.perf_counter()
+    simplified = [trail.simplified(0.01) for trail in trails]
+    simplify = time.perf_counter() - start
+    kept = sum(len(trail) for trail in simplified) / (count * pings)
+    simplified_bytes = sum(trail.nbytes for trail in simplified) / (count * pings)
+    print(f"  Lista de tuplas:      {tuples_bytes:8.1f} bytes/leitura")
+    print(f"  LocationTrail:        {trail_bytes:8.1f} bytes/leitura")
+    print(f"  Simplificado (10 m):  {simplified_bytes:8.1f} bytes/leitura ({kept:.0%} das leituras mantidas)")
+    print(f"  Decodificação:        {decode / (count * pings) * 1e6:8.2f} µs/leitura")
+    print(f"  Simplificação:        {simplify / count * 1000:8.2f} ms/trajeto")
+    _check_compacted_trail()
+    print("  Estatísticas conferidas após compact_trail")
+
+
+BENCHMARKS = {
+    "platform": benchmark_platform_analytics,
+    "memory": benchmark_memory,
+    "transitions": benchmark_delivery_transitions,
+    "dispatch": benchmark_async_dispatch,
+    "instrumentation": benchmark_instrumentation,
+    "geo": benchmark_geo_index,
+    "couriers": benchmark_courier_dispatch,
+    "eta": benchmark_eta,
+    "gps": benchmark_gps_ingest,
+    "trail": benchmark_location_trail,
+}
+
+
+if __name__ == "__main__":
+    names = sys.argv[1:] or list(BENCHMARKS)
+    for name in names:
+        BENCHMARKS[name]()
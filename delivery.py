@@ -1,21 +1,30 @@
 import datetime
+import time
 import random  # Para simular coordenadas de localização na demonstração
-from observer import DeliverySubject
+from observer import DeliverySubject, DeliveryEvent
+from event_bus import event_bus, DELIVERY_STATUS_CHANGED, DELIVERY_LOCATION_UPDATED
+from instrumentation import instrumentation
+from ids import format_id
+from status_history import StatusHistory
+from geo import haversine_km, haversine_many
+from location_trail import LocationTrail
 
 
 class DeliveryLocation:
     """Classe para armazenar e gerenciar a localização do entregador."""
+
+    __slots__ = ("latitude", "longitude", "timestamp")
     
     def __init__(self, latitude=0.0, longitude=0.0):
         self.latitude = latitude
         self.longitude = longitude
         self.timestamp = datetime.datetime.now()
     
-    def update_location(self, latitude, longitude):
-        """Atualiza a localização atual."""
+    def update_location(self, latitude, longitude, timestamp=None):
+        """Atualiza a localização atual (timestamp é o horário da leitura; padrão: agora)."""
         self.latitude = latitude
         self.longitude = longitude
-        self.timestamp = datetime.datetime.now()
+        self.timestamp = timestamp or datetime.datetime.now()
         
     def get_location_info(self):
         """Retorna informações de localização formatadas."""
@@ -27,8 +36,47 @@ class DeliveryLocation:
         }
 
 
+class Transition:
+    """Transição da máquina de estados da entrega: próximo status, nota padrão e efeitos."""
+
+    __slots__ = ("event", "next_status", "notes", "effects")
+
+    def __init__(self, event, next_status, notes="", effects=()):
+        self.event = event
+        self.next_status = next_status
+        self.notes = notes
+        self.effects = effects  # Funções (delivery, agora) executadas ao entrar no status
+
+
+def _start_eta(delivery, now):
+    # Estima a chegada pelo motor de ETA (sem ele, entre 20 e 40 minutos a partir de agora)
+    # e guarda essa estimativa como o horário prometido ao cliente
+    if not delivery.promised_delivery_time:
+        if delivery.eta_engine is not None:
+            delivery.estimated_delivery_time = delivery.eta_engine.estimate(delivery, now)
+        elif not delivery.estimated_delivery_time:
+            minutes = random.randint(20, 40)
+            delivery.estimated_delivery_time = now + datetime.timedelta(minutes=minutes)
+        delivery.promised_delivery_time = delivery.estimated_delivery_time
+
+
+def _record_delivery_time(delivery, now):
+    # Registra o horário real quando o pedido é entregue
+    if not delivery.delivery_time:
+        delivery.delivery_time = now
+
+
 class Delivery(DeliverySubject):
     """Classe para gerenciar a entrega de um pedido."""
+
+    __slots__ = ("order", "status", "status_history", "_indexes", "delivery_person", "estimated_delivery_time",
+                 "promised_delivery_time", "delivery_time", "location", "destination", "trail", "delivery_notes")
+
+    NEAR_DISTANCE_KM = 0.5  # Distância do destino em que a entrega fica "Próximo ao destino"
+    ARRIVAL_DISTANCE_KM = 0.05  # Distância do destino em que a entrega "Chegou ao destino"
+
+    record_trails = True  # Guarda todas as leituras de localização em um LocationTrail por entrega
+    eta_engine = None  # EtaEngine usado para estimar a chegada; None usa uma estimativa aleatória
     
     # Status possíveis para uma entrega
     STATUS_PREPARING = "Em preparo"
@@ -40,74 +88,295 @@ class Delivery(DeliverySubject):
     STATUS_ARRIVED = "Chegou ao destino"
     STATUS_DELIVERED = "Entregue"
     STATUS_CANCELLED = "Cancelado"
+
+    STATUSES = (STATUS_PREPARING, STATUS_READY, STATUS_ASSIGNED, STATUS_PICKED_UP, STATUS_ON_THE_WAY,
+                STATUS_NEAR, STATUS_ARRIVED, STATUS_DELIVERED, STATUS_CANCELLED)
+    TRACKED_STATUSES = (STATUS_ON_THE_WAY, STATUS_NEAR)  # Status em que a proximidade do destino é verificada
+
+    # Eventos que movem a entrega entre os status
+    EVENT_READY = "ready"
+    EVENT_ASSIGN = "assign"
+    EVENT_PICK_UP = "pick_up"
+    EVENT_DEPART = "depart"
+    EVENT_APPROACH = "approach"
+    EVENT_ARRIVE = "arrive"
+    EVENT_DELIVER = "deliver"
+    EVENT_CANCEL = "cancel"
+
+    # Tabelas de transição, montadas uma única vez por _compile_transitions (abaixo da classe):
+    # TRANSITIONS[status][evento] e TRANSITIONS_BY_TARGET[status][próximo status] -> Transition
+    TRANSITIONS = {}
+    TRANSITIONS_BY_TARGET = {}
+    NEXT_EVENT = {}  # status -> evento do fluxo normal
     
     def __init__(self, order):
         DeliverySubject.__init__(self)
         self.order = order
         self.status = self.STATUS_PREPARING
-        self.status_history = []
+        self.status_history = StatusHistory()  # Histórico compacto; cada entrada é lida como dicionário
+        self._indexes = []  # Índices mantidos atualizados a cada mudança de status
         self.add_status_update(self.status)
         
         self.delivery_person = None  # Nome do entregador
-        self.estimated_delivery_time = None  # Tempo estimado de entrega
+        self.estimated_delivery_time = None  # Tempo estimado de entrega (atualizado pelo motor de ETA)
+        self.promised_delivery_time = None  # Estimativa feita na saída do entregador, usada para medir atrasos
+        self.delivery_time = None  # Horário real da entrega
         self.location = DeliveryLocation()  # Localização atual
+        self.destination = None  # (latitude, longitude) do endereço de entrega, se conhecido
+        self.trail = None  # LocationTrail com as leituras de localização, criado na primeira leitura
         self.delivery_notes = ""  # Notas adicionais sobre a entrega
         
-    def add_status_update(self, status, notes=""):
+    def add_status_update(self, status, notes="", moment=None):
         """Adiciona uma atualização de status ao histórico."""
-        update = {
-            "status": status,
-            "timestamp": datetime.datetime.now(),
-            "notes": notes
-        }
-        self.status_history.append(update)
+        self.status_history.append(status, notes, moment)
+        old_status = self.status
         self.status = status
-        
+        for index in self._indexes:
+            index.on_status_change(self, old_status, status)
+
+    def _apply_transition(self, transition, notes, now):
+        # Aplica a transição (já validada) e seus efeitos, sem notificar os observadores
+        self.add_status_update(transition.next_status, notes, now)
+        for effect in transition.effects:
+            effect(self, now)
+
+    def _transition_to(self, new_status):
+        transitions = self.TRANSITIONS_BY_TARGET.get(self.status, {})
+        transition = transitions.get(new_status)
+        if transition is None:
+            if new_status not in self.STATUSES:
+                raise ValueError(f"Status '{new_status}' inválido.")
+            raise ValueError(f"Não é possível passar de '{self.status}' para '{new_status}'.")
+        return transition
+
+    def notify(self):
+        """Notifica os observadores da entrega e publica a mudança de status no barramento de eventos."""
+        DeliverySubject.notify(self)
+        self._publish(DELIVERY_STATUS_CHANGED)
+
+    def _publish(self, topic):
+        if event_bus.has_subscribers(topic):
+            order = self.order
+            event_bus.publish(topic, DeliveryEvent(self), restaurant_id=order.restaurant.id, customer_id=order.customer.id)
+
+    def can_transition_to(self, new_status):
+        """Indica se a entrega pode passar do status atual para new_status."""
+        return new_status in self.TRANSITIONS_BY_TARGET.get(self.status, {})
+
     def update_status(self, new_status, notes=""):
-        """Atualiza o status da entrega."""
-        valid_statuses = [
-            self.STATUS_PREPARING,
-            self.STATUS_READY,
-            self.STATUS_ASSIGNED,
-            self.STATUS_PICKED_UP,
-            self.STATUS_ON_THE_WAY,
-            self.STATUS_NEAR,
-            self.STATUS_ARRIVED,
-            self.STATUS_DELIVERED,
-            self.STATUS_CANCELLED
-        ]
+        """
+        Atualiza o status da entrega. Só são aceitas as transições da tabela
+        TRANSITIONS; qualquer outra gera ValueError.
+        """
+        metrics = instrumentation.metrics_enabled
+        if metrics:
+            start = time.perf_counter()
+        transition = self._transition_to(new_status)
+        self._apply_transition(transition, notes, datetime.datetime.now())
+
+        instrumentation.debug("Atualizando status para %s. Preparando para notificar observadores.", new_status)
+
+        self.notify()
+        if metrics:
+            instrumentation.observe("delivery.update_status", time.perf_counter() - start)
+            instrumentation.increment("delivery.status_updates")
         
-        if new_status in valid_statuses:
-            self.add_status_update(new_status, notes)
-            
-            # Configurar tempo estimado de entrega quando o status mudar para "A caminho"
-            if new_status == self.STATUS_ON_THE_WAY and not self.estimated_delivery_time:
-                # Estima entre 20 e 40 minutos a partir de agora
-                minutes = random.randint(20, 40)
-                self.estimated_delivery_time = datetime.datetime.now() + datetime.timedelta(minutes=minutes)
-
-            print(f"[DEBUG] Atualizando status para {new_status}. Preparando para notificar observadores.")
-
-            self.notify()
-            
-            return True
-        else:
-            raise ValueError(f"Status '{new_status}' inválido.")
+        return True
+
+    def fire(self, event, notes=None):
+        """
+        Dispara um evento (EVENT_*) e avança a entrega conforme a tabela de transições.
+        Sem notes, usa a nota padrão da transição.
+        """
+        transition = self.TRANSITIONS.get(self.status, {}).get(event)
+        if transition is None:
+            raise ValueError(f"Evento '{event}' não é válido no status '{self.status}'.")
+        return self.update_status(transition.next_status, transition.notes if notes is None else notes)
+
+    @classmethod
+    def advance_all(cls, deliveries, event=None, steps=1, notes=None):
+        """
+        Avança várias entregas de uma vez.
+
+        Com event, dispara o mesmo evento em todas as entregas; sem ele, cada uma
+        segue o próximo passo do fluxo normal (NEXT_EVENT). steps permite avançar
+        mais de um passo. Cada entrega que mudou de status notifica seus
+        observadores uma única vez, no final; entregas em que o evento não se
+        aplica são ignoradas. A designação (EVENT_ASSIGN) só é aplicada a
+        entregas que já têm delivery_person; as demais param em "Pronto para
+        entrega" até que assign_delivery_person seja chamado. Retorna a lista
+        de entregas que avançaram.
+        """
+        metrics = instrumentation.metrics_enabled
+        if metrics:
+            start = time.perf_counter()
+        now = datetime.datetime.now()
+        table = cls.TRANSITIONS
+        next_event = cls.NEXT_EVENT
+        assign = cls.EVENT_ASSIGN
+        advanced = []
+        for delivery in deliveries:
+            moved = False
+            for _ in range(steps):
+                step_event = event or next_event.get(delivery.status)
+                if step_event == assign and delivery.delivery_person is None:
+                    break  # Sem entregador, a entrega não pode ser designada
+                transition = table.get(delivery.status, {}).get(step_event)
+                if transition is None:
+                    break
+                delivery._apply_transition(transition, transition.notes if notes is None else notes, now)
+                moved = True
+            if moved:
+                advanced.append(delivery)
+        for delivery in advanced:
+            delivery.notify()
+        if metrics:
+            instrumentation.observe("delivery.advance_all", time.perf_counter() - start)
+            instrumentation.increment("delivery.bulk_status_updates", len(advanced))
+        return advanced
     
     def assign_delivery_person(self, name):
         """Designa um entregador para o pedido."""
+        transition = self._transition_to(self.STATUS_ASSIGNED)
         self.delivery_person = name
-        self.update_status(self.STATUS_ASSIGNED, f"Entregador {name} designado")
-        
-    def update_location(self, latitude, longitude):
-        """Atualiza a localização atual do entregador."""
-        self.location.update_location(latitude, longitude)
-        
-        # Quando a localização é atualizada, podemos atualizar o status com base na proximidade
-        # Para fins de demonstração, vamos usar valores aleatórios
-        if self.status == self.STATUS_ON_THE_WAY and random.random() > 0.7:
-            self.update_status(self.STATUS_NEAR, "Entregador está próximo ao seu endereço")
+        self.update_status(transition.next_status, f"Entregador {name} designado")
         
+    def update_location(self, latitude, longitude, timestamp=None):
+        """
+        Atualiza a localização atual do entregador. Com o destino conhecido, a
+        entrega passa a "Próximo ao destino" ou "Chegou ao destino" quando cruza
+        NEAR_DISTANCE_KM ou ARRIVAL_DISTANCE_KM.
+        """
+        self.location.update_location(latitude, longitude, timestamp)
+        if self.record_trails:
+            if self.trail is None:
+                self.trail = LocationTrail()
+            self.trail.append(latitude, longitude, self.location.timestamp)
+        self._publish(DELIVERY_LOCATION_UPDATED)
+
+        if self.destination is not None and self.status in self.TRACKED_STATUSES:
+            event = self._proximity_event(haversine_km(latitude, longitude, *self.destination))
+            if event is not None:
+                self.fire(event)
+
+    def compact_trail(self, tolerance_km=0.01):
+        """
+        Simplifica o trajeto registrado (Douglas–Peucker), mantendo o desvio abaixo
+        de tolerance_km. As estatísticas do trajeto (get_stats) não mudam.
+        """
+        if self.trail is not None:
+            self.trail = self.trail.simplified(tolerance_km)
+
+    def _proximity_event(self, distance):
+        # Evento disparado pela distância (em km) até o destino, ou None
+        if distance <= self.ARRIVAL_DISTANCE_KM:
+            return self.EVENT_ARRIVE
+        if distance <= self.NEAR_DISTANCE_KM and self.status == self.STATUS_ON_THE_WAY:
+            return self.EVENT_APPROACH
+        return None
+
+    @classmethod
+    def ingest_locations(cls, deliveries, order_ids, latitudes, longitudes, timestamps=None):
+        """
+        Aplica um lote de leituras de GPS: sequências paralelas de ids de pedido,
+        latitudes, longitudes e, opcionalmente, horários (segundos desde a época,
+        como time.time()). deliveries é qualquer objeto com get(id do pedido),
+        como um DeliveryIndex.
+
+        Todas as leituras vão para o trajeto (trail) de cada entrega, mas a
+        localização recebe só a mais recente (leituras mais antigas que a
+        localização atual são descartadas) e cada entrega publica uma única
+        atualização de localização. As distâncias até o destino são calculadas em um único
+        lote, e só as entregas que cruzaram NEAR_DISTANCE_KM ou
+        ARRIVAL_DISTANCE_KM mudam de status (com advance_all).
+
+        Retorna um dicionário com as contagens: leituras, entregas atualizadas,
+        ignoradas (desconhecidas ou encerradas), leituras antigas e as que
+        ficaram próximas ou chegaram.
+        """
+        metrics = instrumentation.metrics_enabled
+        if metrics:
+            start = time.perf_counter()
+        by_order = {}  # id do pedido -> posições das suas leituras no lote
+        for position, order_id in enumerate(order_ids):
+            positions = by_order.get(order_id)
+            if positions is None:
+                by_order[order_id] = [position]
+            else:
+                positions.append(position)
+
+        now = datetime.datetime.now()
+        from_timestamp = datetime.datetime.fromtimestamp
+        final_statuses = (cls.STATUS_DELIVERED, cls.STATUS_CANCELLED)
+        tracked_statuses = cls.TRACKED_STATUSES
+        record_trails = cls.record_trails
+        updated = []
+        tracked = []  # Entregas com destino que podem cruzar um limite
+        latitudes1, longitudes1, latitudes2, longitudes2 = [], [], [], []
+        ignored = stale = 0
+        for order_id, positions in by_order.items():
+            delivery = deliveries.get(order_id)
+            if delivery is None or delivery.status in final_statuses:
+                ignored += 1
+                continue
+            if timestamps is not None and len(positions) > 1:
+                positions.sort(key=timestamps.__getitem__)
+            position = positions[-1]  # Leitura mais recente
+            moment = now if timestamps is None else from_timestamp(timestamps[position])
+            location = delivery.location
+            if moment < location.timestamp:
+                stale += 1
+                continue
+            latitude = latitudes[position]
+            longitude = longitudes[position]
+            location.update_location(latitude, longitude, moment)
+            if record_trails:
+                if delivery.trail is None:
+                    delivery.trail = LocationTrail()
+                delivery.trail.extend([latitudes[index] for index in positions],
+                                      [longitudes[index] for index in positions],
+                                      [timestamps[index] for index in positions] if timestamps is not None
+                                      else [moment.timestamp()] * len(positions))
+            updated.append(delivery)
+            destination = delivery.destination
+            if destination is not None and delivery.status in tracked_statuses:
+                tracked.append(delivery)
+                latitudes1.append(latitude)
+                longitudes1.append(longitude)
+                latitudes2.append(destination[0])
+                longitudes2.append(destination[1])
+
+        approaching = []
+        arriving = []
+        for delivery, distance in zip(tracked, haversine_many(latitudes1, longitudes1, latitudes2, longitudes2)):
+            event = delivery._proximity_event(distance)
+            if event == cls.EVENT_ARRIVE:
+                arriving.append(delivery)
+            elif event is not None:
+                approaching.append(delivery)
+
+        if event_bus.has_subscribers(DELIVERY_LOCATION_UPDATED):
+            for delivery in updated:
+                delivery._publish(DELIVERY_LOCATION_UPDATED)
+        cls.advance_all(approaching, event=cls.EVENT_APPROACH)
+        cls.advance_all(arriving, event=cls.EVENT_ARRIVE)
+
+        if metrics:
+            instrumentation.observe("delivery.ingest_locations", time.perf_counter() - start)
+            instrumentation.increment("delivery.location_pings", len(order_ids))
+        return {
+            "pings": len(order_ids),
+            "updated": len(updated),
+            "ignored": ignored,
+            "stale": stale,
+            "near": len(approaching),
+            "arrived": len(arriving),
+        }
+
+    def set_destination(self, latitude, longitude):
+        """Define as coordenadas do endereço de entrega."""
+        self.destination = (latitude, longitude)
+
     def update_estimated_time(self, minutes):
         """Atualiza o tempo estimado de entrega."""
         self.estimated_delivery_time = datetime.datetime.now() + datetime.timedelta(minutes=minutes)
@@ -118,9 +387,7 @@ class Delivery(DeliverySubject):
     
     def get_tracking_link(self):
         """Retorna um link fictício para rastreamento (em uma aplicação real, isso seria um link real)."""
-        # Em uma implementação real, isso geraria um link único para rastreamento
-        order_id = id(self.order)  # Usando o ID do objeto como exemplo
-        return f"https://fooddelivery.example.com/track/{order_id}"
+        return f"https://fooddelivery.example.com/track/{format_id(self.order.id)}"
     
     def simulate_delivery_progress(self):
         """
@@ -128,36 +395,41 @@ class Delivery(DeliverySubject):
         Em uma aplicação real, isso seria atualizado com base em dados reais do entregador.
         """
         current_status = self.status
-        
-        # Simula a progressão do status
-        if current_status == self.STATUS_PREPARING:
-            self.update_status(self.STATUS_READY, "Seu pedido está pronto para ser coletado")
-        elif current_status == self.STATUS_READY:
+        event = self.NEXT_EVENT.get(current_status)
+        if event is None:
+            return
+
+        if event == self.EVENT_ASSIGN:
             self.assign_delivery_person(f"Entregador #{random.randint(1000, 9999)}")
-        elif current_status == self.STATUS_ASSIGNED:
-            self.update_status(self.STATUS_PICKED_UP, "Entregador pegou seu pedido no restaurante")
-            # Simula coordenadas iniciais (em uma aplicação real, seriam as coordenadas do restaurante)
-            self.update_location(-9.6498 + random.uniform(-0.01, 0.01), -35.7089 + random.uniform(-0.01, 0.01))
-        elif current_status == self.STATUS_PICKED_UP:
-            self.update_status(self.STATUS_ON_THE_WAY, "Entregador está a caminho do seu endereço")
-            # Simula movimento do entregador
+        elif event == self.EVENT_APPROACH and self.destination is not None:
+            # Aproxima o entregador do destino; a distância decide quando ele fica próximo ou chega
+            latitude, longitude = self.destination
+            self.update_location(
+                self.location.latitude + (latitude - self.location.latitude) * 0.6,
+                self.location.longitude + (longitude - self.location.longitude) * 0.6
+            )
+        elif event == self.EVENT_APPROACH:
+            # Sem destino conhecido, simula movimento e, às vezes, a aproximação
             self.update_location(
                 self.location.latitude + random.uniform(-0.005, 0.005),
                 self.location.longitude + random.uniform(-0.005, 0.005)
             )
-        elif current_status == self.STATUS_ON_THE_WAY:
-            # Atualiza a localização para simular movimento
+            if random.random() > 0.7:
+                self.fire(event)
+        else:
+            self.fire(event)
+
+        if current_status == self.STATUS_ASSIGNED:
+            # Coordenadas iniciais: o entregador acabou de coletar o pedido no restaurante
+            restaurant = self.order.restaurant
+            self.update_location(restaurant.latitude + random.uniform(-0.001, 0.001),
+                                 restaurant.longitude + random.uniform(-0.001, 0.001))
+        elif current_status == self.STATUS_PICKED_UP:
+            # Simula movimento do entregador
             self.update_location(
                 self.location.latitude + random.uniform(-0.005, 0.005),
                 self.location.longitude + random.uniform(-0.005, 0.005)
             )
-            # Às vezes atualiza para "próximo"
-            if random.random() > 0.7:
-                self.update_status(self.STATUS_NEAR, "Entregador está próximo ao seu endereço")
-        elif current_status == self.STATUS_NEAR:
-            self.update_status(self.STATUS_ARRIVED, "Entregador chegou ao seu endereço")
-        elif current_status == self.STATUS_ARRIVED:
-            self.update_status(self.STATUS_DELIVERED, "Pedido entregue com sucesso!")
     
     def display_status(self):
         """Exibe o status atual e informações de rastreamento."""
@@ -184,6 +456,8 @@ class Delivery(DeliverySubject):
         if self.status in [self.STATUS_ON_THE_WAY, self.STATUS_NEAR, self.STATUS_ARRIVED]:
             loc_info = self.location.get_location_info()
             result += f"Localização atual: {loc_info['formatted']}\n"
+            if self.trail is not None and len(self.trail) > 1:
+                result += f"Distância percorrida: {self.trail.distance_km:.2f} km\n"
         
         # Adiciona histórico de status
         result += "\nHistórico de status:\n"
@@ -194,4 +468,44 @@ class Delivery(DeliverySubject):
                 status_text += f": {update['notes']}"
             result += status_text + "\n"
         
-        return result
\ No newline at end of file
+        return result
+
+
+def _compile_transitions():
+    """Monta as tabelas de transição da classe Delivery."""
+    D = Delivery
+    rules = [
+        # (status de origem, evento, próximo status, nota padrão, efeitos)
+        (D.STATUS_PREPARING, D.EVENT_READY, D.STATUS_READY, "Seu pedido está pronto para ser coletado", ()),
+        (D.STATUS_READY, D.EVENT_ASSIGN, D.STATUS_ASSIGNED, "Entregador designado", ()),
+        (D.STATUS_ASSIGNED, D.EVENT_ASSIGN, D.STATUS_ASSIGNED, "Entregador designado", ()),
+        (D.STATUS_ASSIGNED, D.EVENT_PICK_UP, D.STATUS_PICKED_UP, "Entregador pegou seu pedido no restaurante", ()),
+        (D.STATUS_PICKED_UP, D.EVENT_DEPART, D.STATUS_ON_THE_WAY, "Entregador está a caminho do seu endereço", (_start_eta,)),
+        (D.STATUS_ON_THE_WAY, D.EVENT_APPROACH, D.STATUS_NEAR, "Entregador está próximo ao seu endereço", ()),
+        (D.STATUS_ON_THE_WAY, D.EVENT_ARRIVE, D.STATUS_ARRIVED, "Entregador chegou ao seu endereço", ()),
+        (D.STATUS_NEAR, D.EVENT_ARRIVE, D.STATUS_ARRIVED, "Entregador chegou ao seu endereço", ()),
+        (D.STATUS_ARRIVED, D.EVENT_DELIVER, D.STATUS_DELIVERED, "Pedido entregue com sucesso!", (_record_delivery_time,)),
+    ]
+    # Qualquer entrega ainda não concluída pode ser cancelada
+    for status in D.STATUSES:
+        if status not in (D.STATUS_DELIVERED, D.STATUS_CANCELLED):
+            rules.append((status, D.EVENT_CANCEL, D.STATUS_CANCELLED, "Entrega cancelada", ()))
+
+    StatusHistory.register_notes(notes for _, _, _, notes, _ in rules)
+    for status, event, next_status, notes, effects in rules:
+        transition = Transition(event, next_status, notes, effects)
+        D.TRANSITIONS.setdefault(status, {})[event] = transition
+        D.TRANSITIONS_BY_TARGET.setdefault(status, {})[next_status] = transition
+
+    D.NEXT_EVENT.update({
+        D.STATUS_PREPARING: D.EVENT_READY,
+        D.STATUS_READY: D.EVENT_ASSIGN,
+        D.STATUS_ASSIGNED: D.EVENT_PICK_UP,
+        D.STATUS_PICKED_UP: D.EVENT_DEPART,
+        D.STATUS_ON_THE_WAY: D.EVENT_APPROACH,
+        D.STATUS_NEAR: D.EVENT_ARRIVE,
+        D.STATUS_ARRIVED: D.EVENT_DELIVER,
+    })
+
+
+_compile_transitions()
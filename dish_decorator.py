@@ -2,6 +2,8 @@ from abc import ABC, abstractmethod
 
 class Dish(ABC):
     """Interface base para todos os pratos."""
+
+    __slots__ = ()
     
     @abstractmethod
     def get_description(self):
@@ -16,6 +18,8 @@ class Dish(ABC):
 
 class BasicDish(Dish):
     """Implementação básica de um prato do menu."""
+
+    __slots__ = ("name", "price", "description")
     
     def __init__(self, name, price, description=""):
         self.name = name
@@ -31,6 +35,8 @@ class BasicDish(Dish):
 
 class DishDecorator(Dish):
     """Classe base para todos os decoradores de pratos."""
+
+    __slots__ = ("dish",)
     
     def __init__(self, dish):
         self.dish = dish
@@ -46,6 +52,8 @@ class DishDecorator(Dish):
 
 class ExtraCheese(DishDecorator):
     """Decorador para adicionar queijo extra."""
+
+    __slots__ = ()
     
     def get_description(self):
         return f"{self.dish.get_description()} + queijo extra"
@@ -56,6 +64,8 @@ class ExtraCheese(DishDecorator):
 
 class ExtraBacon(DishDecorator):
     """Decorador para adicionar bacon."""
+
+    __slots__ = ()
     
     def get_description(self):
         return f"{self.dish.get_description()} + bacon"
@@ -66,6 +76,8 @@ class ExtraBacon(DishDecorator):
 
 class SpecialSauce(DishDecorator):
     """Decorador para adicionar molho especial."""
+
+    __slots__ = ()
     
     def get_description(self):
         return f"{self.dish.get_description()} + molho especial"
@@ -76,6 +88,8 @@ class SpecialSauce(DishDecorator):
 
 class WithoutIngredient(DishDecorator):
     """Decorador para remover um ingrediente."""
+
+    __slots__ = ("ingredient",)
     
     def __init__(self, dish, ingredient):
         super().__init__(dish)
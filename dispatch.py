@@ -0,0 +1,377 @@
+import time
+import uuid
+from delivery import Delivery
+from event_bus import DELIVERY_LOCATION_UPDATED, DELIVERY_STATUS_CHANGED
+from geo_index import GridIndex
+from observer import CallbackObserver
+from instrumentation import instrumentation
+
+
+class Courier:
+    """Entregador com sua posição atual e, quando ocupado, a entrega que está fazendo."""
+
+    __slots__ = ("id", "name", "latitude", "longitude", "delivery")
+
+    def __init__(self, name, latitude, longitude):
+        self.id = str(uuid.uuid4())
+        self.name = name
+        self.latitude = latitude
+        self.longitude = longitude
+        self.delivery = None  # Entrega em andamento; None quando disponível
+
+    def is_available(self):
+        """Indica se o entregador está livre para uma nova entrega."""
+        return self.delivery is None
+
+
+class CourierPool:
+    """
+    Entregadores cadastrados. Os disponíveis ficam em um GridIndex pela sua
+    posição, então encontrar os mais próximos de um restaurante só examina as
+    células vizinhas.
+
+    Inscrito no barramento de eventos, o conjunto acompanha as entregas: a
+    posição da entrega é a do entregador, e quando ela é concluída ou
+    cancelada o entregador volta a ficar disponível onde está.
+    """
+
+    FINAL_STATUSES = (Delivery.STATUS_DELIVERED, Delivery.STATUS_CANCELLED)
+
+    def __init__(self, cell_size_km=1.0):
+        self._couriers = {}  # id -> Courier
+        self._available = GridIndex(cell_size_km)
+        self._by_order = {}  # id do pedido -> Courier
+        self._subscriptions = []
+
+    def add(self, courier):
+        """Cadastra um entregador."""
+        if courier.id in self._couriers:
+            raise ValueError(f"O entregador {courier.name} já está cadastrado.")
+        self._couriers[courier.id] = courier
+        if courier.is_available():
+            self._available.update(courier.id, courier.latitude, courier.longitude)
+
+    def remove(self, courier):
+        """Remove um entregador disponível do cadastro."""
+        if not courier.is_available():
+            raise ValueError(f"O entregador {courier.name} está em uma entrega.")
+        self._couriers.pop(courier.id, None)
+        self._available.remove(courier.id)
+
+    def get(self, courier_id):
+        """Retorna o entregador com o id informado, ou None."""
+        return self._couriers.get(courier_id)
+
+    def move(self, courier, latitude, longitude):
+        """Atualiza a posição do entregador."""
+        courier.latitude = latitude
+        courier.longitude = longitude
+        if courier.is_available():
+            self._available.update(courier.id, latitude, longitude)
+
+    def reserve(self, courier):
+        """Tira o entregador da busca por disponíveis enquanto um despacho decide as designações."""
+        self._available.remove(courier.id)
+
+    def assign(self, courier, delivery):
+        """Marca o entregador como ocupado com a entrega."""
+        if not courier.is_available():
+            raise ValueError(f"O entregador {courier.name} já está em uma entrega.")
+        courier.delivery = delivery
+        self._available.remove(courier.id)
+        self._by_order[delivery.order.id] = courier
+
+    def release(self, courier):
+        """Libera o entregador para uma nova entrega, na posição em que está."""
+        if courier.delivery is not None:
+            self._by_order.pop(courier.delivery.order.id, None)
+            courier.delivery = None
+        if courier.id in self._couriers:
+            self._available.update(courier.id, courier.latitude, courier.longitude)
+
+    def courier_for(self, delivery):
+        """Retorna o entregador designado para a entrega, ou None."""
+        return self._by_order.get(delivery.order.id)
+
+    def nearest_available(self, latitude, longitude, k=1, max_radius_km=None):
+        """Retorna [(entregador, distância em km)] dos k entregadores disponíveis mais próximos do ponto."""
+        couriers = self._couriers
+        return [(couriers[key], distance)
+                for key, distance in self._available.nearest(latitude, longitude, k, max_radius_km)]
+
+    def available_count(self):
+        """Retorna quantos entregadores estão disponíveis."""
+        return len(self._available)
+
+    def subscribe(self, bus):
+        """Passa a acompanhar a localização e o status das entregas publicados no barramento."""
+        self._subscriptions.append(bus.subscribe(DELIVERY_LOCATION_UPDATED, CallbackObserver(self.on_location_updated)))
+        self._subscriptions.append(bus.subscribe(DELIVERY_STATUS_CHANGED, CallbackObserver(self.on_status_changed)))
+
+    def unsubscribe(self, bus):
+        """Deixa de acompanhar o barramento."""
+        for subscription in self._subscriptions:
+            bus.unsubscribe(subscription)
+        self._subscriptions = []
+
+    def on_location_updated(self, event):
+        """Move o entregador da entrega para a posição do evento."""
+        courier = self._by_order.get(event.order.id)
+        if courier is not None:
+            self.move(courier, event.latitude, event.longitude)
+
+    def on_status_changed(self, event):
+        """Libera o entregador quando a entrega é concluída ou cancelada."""
+        if event.status in self.FINAL_STATUSES:
+            courier = self._by_order.get(event.order.id)
+            if courier is not None:
+                self.release(courier)
+
+    def __len__(self):
+        return len(self._couriers)
+
+    def __iter__(self):
+        return iter(list(self._couriers.values()))
+
+    def __contains__(self, courier):
+        return self._couriers.get(courier.id) is courier
+
+
+class DispatchResult:
+    """Resultado de um ciclo de despacho."""
+
+    __slots__ = ("assignments", "pending", "mode", "elapsed", "budget_exhausted")
+
+    def __init__(self, assignments, pending, mode, elapsed, budget_exhausted):
+        self.assignments = assignments  # [(entrega, entregador, distância até o restaurante em km)]
+        self.pending = pending  # Entregas que continuam sem entregador
+        self.mode = mode
+        self.elapsed = elapsed  # Segundos
+        self.budget_exhausted = budget_exhausted  # O tempo acabou antes de examinar todas as entregas
+
+
+class DispatchEngine:
+    """
+    Designa entregadores para as entregas prontas, em lotes.
+
+    Cada ciclo (dispatch) recebe as entregas "Pronto para entrega", da mais
+    antiga à mais recente, e as divide em lotes de cerca de batch_size,
+    mantendo juntas as entregas de um mesmo restaurante. Em cada lote,
+    procura para cada entrega apenas os entregadores disponíveis mais próximos
+    do restaurante (no máximo 'candidates' deles, a até max_pickup_km), usando
+    o índice espacial do CourierPool, e designa os pares candidatos do mais
+    próximo ao mais distante (guloso). Entregas que perderam todos os seus
+    candidatos para entregas mais próximas voltam a buscar entre os
+    entregadores que sobraram. Os pares do lote são aplicados com
+    Delivery.assign_delivery_person antes de passar ao próximo lote.
+
+    Ciclos com até optimal_batch_size entregas são resolvidos de forma ótima
+    (menor distância total, com o maior número possível de entregas
+    designadas) pelo algoritmo húngaro; 0 desativa esse modo.
+
+    O ciclo respeita time_budget (segundos): quando o tempo acaba, os lotes
+    restantes ficam pendentes para o próximo ciclo. O tempo pode ser excedido
+    em no máximo um lote.
+    """
+
+    GREEDY = "guloso"
+    OPTIMAL = "ótimo"
+
+    _UNREACHABLE = 1e9  # Custo de deixar uma entrega sem entregador no modo ótimo
+
+    def __init__(self, couriers, max_pickup_km=5.0, candidates=4, batch_size=200, optimal_batch_size=20,
+                 time_budget=0.05):
+        if candidates < 1 or batch_size < 1:
+            raise ValueError("O número de candidatos e o tamanho do lote devem ser pelo menos 1.")
+        self.couriers = couriers
+        self.max_pickup_km = max_pickup_km
+        self.candidates = candidates
+        self.batch_size = batch_size
+        self.optimal_batch_size = optimal_batch_size
+        self.time_budget = time_budget
+
+    def tick(self, deliveries):
+        """Executa um ciclo de despacho para as entregas prontas de um DeliveryIndex."""
+        return self.dispatch(deliveries.get_by_status(Delivery.STATUS_READY))
+
+    def dispatch(self, deliveries):
+        """
+        Designa entregadores para as entregas informadas que estão prontas.
+        Retorna um DispatchResult.
+        """
+        start = time.perf_counter()
+        deadline = start + self.time_budget
+        # Ids de pedido crescem com o tempo: os pedidos mais antigos são atendidos primeiro
+        ready = sorted((delivery for delivery in deliveries if delivery.status == Delivery.STATUS_READY),
+                       key=lambda delivery: delivery.order.id)
+
+        applied = []
+        budget_exhausted = False
+        if 0 < len(ready) <= self.optimal_batch_size:
+            mode = self.OPTIMAL
+            applied.extend(self._apply(self._match_optimal(ready)))
+        else:
+            mode = self.GREEDY
+            for batch in self._batches(ready):
+                if time.perf_counter() > deadline:
+                    budget_exhausted = True
+                    break
+                applied.extend(self._apply(self._match_greedy(batch)))
+
+        assigned = {delivery.order.id for delivery, _, _ in applied}
+        pending = [delivery for delivery in ready if delivery.order.id not in assigned]
+        elapsed = time.perf_counter() - start
+        if instrumentation.metrics_enabled:
+            instrumentation.observe("dispatch.tick", elapsed)
+            instrumentation.increment("dispatch.assignments", len(applied))
+        instrumentation.info("Despacho (%s): %d entregas designadas, %d pendentes em %.1f ms",
+                             mode, len(applied), len(pending), elapsed * 1000)
+        return DispatchResult(applied, pending, mode, elapsed, budget_exhausted)
+
+    def _batches(self, ready):
+        # Lotes com cerca de batch_size entregas, sem separar as de um mesmo
+        # restaurante (que compartilham a busca por entregadores); o restaurante
+        # com o pedido mais antigo vem primeiro
+        groups = {}
+        for delivery in ready:
+            groups.setdefault(delivery.order.restaurant.id, []).append(delivery)
+        batch = []
+        for group in groups.values():
+            batch.extend(group)
+            if len(batch) >= self.batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    def _apply(self, pairs):
+        # Designa os entregadores escolhidos; retorna os pares que foram aplicados
+        applied = []
+        for delivery, courier, distance in pairs:
+            try:
+                delivery.assign_delivery_person(courier.name)
+            except ValueError:
+                # A entrega mudou de status durante o ciclo (por exemplo, foi cancelada)
+                self.couriers.release(courier)
+                continue
+            self.couriers.assign(courier, delivery)
+            applied.append((delivery, courier, distance))
+        return applied
+
+    def _match_greedy(self, batch):
+        # Os entregadores escolhidos saem do índice de disponíveis na hora, então
+        # as rodadas seguintes só encontram os que ainda estão livres.
+        pairs = []
+        remaining = batch
+        while remaining:
+            groups = {}  # id do restaurante -> entregas, da mais antiga à mais recente
+            for delivery in remaining:
+                groups.setdefault(delivery.order.restaurant.id, []).append(delivery)
+            edges = []
+            reachable = []  # Entregas com algum entregador ao alcance
+            for group in groups.values():
+                # Uma única busca por restaurante: a i-ésima entrega mais antiga
+                # concorre pelos entregadores i, i + 1, ..., i + candidates - 1
+                restaurant = group[0].order.restaurant
+                found = self.couriers.nearest_available(restaurant.latitude, restaurant.longitude,
+                                                        len(group) + self.candidates - 1, self.max_pickup_km)
+                if not found:
+                    continue
+                reachable.extend(group)
+                for position, delivery in enumerate(group):
+                    for courier, distance in found[position:position + self.candidates]:
+                        edges.append((distance, delivery.order.id, delivery, courier))
+            assigned_before = len(pairs)
+            self._take_greedy(edges, pairs)
+            if len(pairs) == assigned_before:
+                break
+            assigned = {delivery.order.id for delivery, _, _ in pairs}
+            remaining = [delivery for delivery in reachable if delivery.order.id not in assigned]
+        return pairs
+
+    def _take_greedy(self, edges, pairs):
+        # Designa os pares candidatos do mais próximo ao mais distante
+        edges.sort(key=lambda edge: (edge[0], edge[1]))
+        assigned = set()
+        taken = set()
+        for distance, order_id, delivery, courier in edges:
+            if order_id in assigned or courier.id in taken:
+                continue
+            assigned.add(order_id)
+            taken.add(courier.id)
+            self.couriers.reserve(courier)
+            pairs.append((delivery, courier, distance))
+
+    def _match_optimal(self, ready):
+        # Em uma solução ótima para n entregas, cada uma recebe um dos seus n
+        # entregadores mais próximos; basta considerar esses candidatos.
+        count = len(ready)
+        couriers = {}
+        distances = {}  # (índice da entrega, id do entregador) -> km
+        for row, delivery in enumerate(ready):
+            restaurant = delivery.order.restaurant
+            for courier, distance in self.couriers.nearest_available(restaurant.latitude, restaurant.longitude,
+                                                                     count, self.max_pickup_km):
+                couriers[courier.id] = courier
+                distances[row, courier.id] = distance
+        columns = list(couriers.values())
+        # Uma coluna extra por entrega representa "sem entregador", com custo alto
+        cost = [[distances.get((row, courier.id), self._UNREACHABLE) for courier in columns]
+                + [self._UNREACHABLE] * count for row in range(count)]
+        pairs = []
+        for row, column in enumerate(_hungarian(cost)):
+            if column < len(columns) and (row, columns[column].id) in distances:
+                pairs.append((ready[row], columns[column], distances[row, columns[column].id]))
+        return pairs
+
+
+def _hungarian(cost):
+    """
+    Algoritmo húngaro para a matriz de custos n x m (n <= m), em O(n² m).
+    Retorna, para cada linha, a coluna designada.
+    """
+    rows, columns = len(cost), len(cost[0])
+    inf = float("inf")
+    u = [0.0] * (rows + 1)
+    v = [0.0] * (columns + 1)
+    match = [0] * (columns + 1)  # coluna -> linha (1-indexadas; 0 = livre)
+    way = [0] * (columns + 1)
+    for row in range(1, rows + 1):
+        match[0] = row
+        current = 0
+        min_value = [inf] * (columns + 1)
+        used = [False] * (columns + 1)
+        while True:
+            used[current] = True
+            matched_row = match[current]
+            costs = cost[matched_row - 1]
+            offset = u[matched_row]
+            delta = inf
+            next_column = 0
+            for column in range(1, columns + 1):
+                if not used[column]:
+                    reduced = costs[column - 1] - offset - v[column]
+                    if reduced < min_value[column]:
+                        min_value[column] = reduced
+                        way[column] = current
+                    if min_value[column] < delta:
+                        delta = min_value[column]
+                        next_column = column
+            for column in range(columns + 1):
+                if used[column]:
+                    u[match[column]] += delta
+                    v[column] -= delta
+                else:
+                    min_value[column] -= delta
+            current = next_column
+            if match[current] == 0:
+                break
+        while current:
+            previous = way[current]
+            match[current] = match[previous]
+            current = previous
+    assignment = [0] * rows
+    for column in range(1, columns + 1):
+        if match[column]:
+            assignment[match[column] - 1] = column - 1
+    return assignment
@@ -0,0 +1,244 @@
+import datetime
+from delivery import Delivery
+from event_bus import DELIVERY_STATUS_CHANGED
+from geo import haversine_km, haversine_many, zone_of
+from observer import CallbackObserver
+
+
+class SpeedTable:
+    """
+    Velocidades históricas dos trajetos de entrega, por zona e hora do dia.
+
+    Para cada (zona, hora) guarda somas de distância e de tempo, e também os
+    agregados só por zona, só por hora e gerais. Quando uma combinação tem
+    menos de min_samples trajetos, a consulta usa o próximo nível (zona, hora,
+    geral) e, sem nenhum histórico, os valores padrão.
+
+    Cada trajeto novo atualiza as somas em O(1). As velocidades resolvidas
+    ficam em cache; a cada atualização, só saem do cache as entradas que
+    consultaram algum dos agregados alterados.
+    """
+
+    def __init__(self, default_speed_kmh=20.0, default_minutes=30.0, min_samples=5):
+        self.default_speed_kmh = default_speed_kmh
+        self.default_minutes = default_minutes  # Duração usada quando o destino não é conhecido
+        self.min_samples = min_samples
+        # (zona, hora) -> [km, segundos dos trajetos com distância, trajetos com distância, segundos, trajetos];
+        # zona ou hora None são os agregados
+        self._stats = {}
+        self._cache = {}  # (zona, hora) -> (km/h, segundos por trajeto, nível mais geral consultado)
+        self._dirty = set()  # Agregados alterados desde a última limpeza do cache
+
+    @staticmethod
+    def _levels(zone, hour):
+        return (zone, hour), (zone, None), (None, hour), (None, None)
+
+    def add(self, zone, hour, seconds, km=None):
+        """Registra um trajeto de seconds segundos (e km quilômetros, se a distância for conhecida)."""
+        for key in self._levels(zone, hour):
+            stats = self._stats.get(key)
+            if stats is None:
+                stats = self._stats[key] = [0.0, 0.0, 0, 0.0, 0]
+            if km is not None:
+                stats[0] += km
+                stats[1] += seconds
+                stats[2] += 1
+            stats[3] += seconds
+            stats[4] += 1
+            self._dirty.add(key)
+
+    def _refresh(self):
+        dirty = self._dirty
+        self._cache = {
+            key: value for key, value in self._cache.items()
+            if not any(level in dirty for level in self._levels(*key)[:value[2] + 1])
+        }
+        dirty.clear()
+
+    def lookup(self, zone, hour):
+        """Retorna (velocidade em km/h, duração média do trajeto em segundos) para a zona e a hora."""
+        if self._dirty:
+            self._refresh()
+        cached = self._cache.get((zone, hour))
+        if cached is None:
+            speed = duration = None
+            depth = 0
+            for depth, key in enumerate(self._levels(zone, hour)):
+                stats = self._stats.get(key)
+                if stats is not None:
+                    if speed is None and stats[2] >= self.min_samples and stats[1] > 0:
+                        speed = stats[0] / stats[1] * 3600
+                    if duration is None and stats[4] >= self.min_samples:
+                        duration = stats[3] / stats[4]
+                if speed is not None and duration is not None:
+                    break
+            cached = self._cache[zone, hour] = (
+                speed or self.default_speed_kmh,
+                self.default_minutes * 60 if duration is None else duration,
+                depth,
+            )
+        return cached[0], cached[1]
+
+    def speed(self, zone, hour):
+        """Retorna a velocidade histórica, em km/h, para a zona e a hora."""
+        return self.lookup(zone, hour)[0]
+
+    def __len__(self):
+        # Número de trajetos registrados
+        stats = self._stats.get((None, None))
+        return 0 if stats is None else stats[4]
+
+
+class EtaEngine:
+    """
+    Estima o horário de chegada das entregas pela distância e pelas
+    velocidades históricas.
+
+    A distância é a haversine entre o entregador, o restaurante e o destino
+    (Delivery.destination). A velocidade vem de uma SpeedTable aprendida com os
+    históricos de status das entregas concluídas: o tempo entre "Pedido
+    coletado" e a chegada, na zona do restaurante e na hora da coleta. Sem
+    destino conhecido, usa a duração média dos trajetos da zona.
+
+    Inscrito no barramento de eventos, o motor aprende com cada entrega
+    concluída. Com Delivery.eta_engine apontando para ele, a estimativa feita
+    na saída do entregador substitui a aleatória; recompute atualiza de uma
+    vez as estimativas de todas as entregas em andamento.
+    """
+
+    PRE_PICKUP = (Delivery.STATUS_PREPARING, Delivery.STATUS_READY, Delivery.STATUS_ASSIGNED)
+    EN_ROUTE = (Delivery.STATUS_PICKED_UP, Delivery.STATUS_ON_THE_WAY, Delivery.STATUS_NEAR)
+
+    def __init__(self, zone_size_km=2.0, default_speed_kmh=20.0, default_minutes=30.0, min_samples=5):
+        self.zone_size_km = zone_size_km
+        self.speeds = SpeedTable(default_speed_kmh, default_minutes, min_samples)
+        self._subscriptions = []
+
+    def zone(self, latitude, longitude):
+        """Retorna a zona do ponto."""
+        return zone_of(latitude, longitude, self.zone_size_km)
+
+    def observe(self, delivery):
+        """
+        Aprende com uma entrega concluída. Retorna False se o histórico dela não
+        tem a coleta e a chegada.
+        """
+        history = delivery.status_history
+        picked_up = history.entered_at(Delivery.STATUS_PICKED_UP)
+        arrived = history.entered_at(Delivery.STATUS_ARRIVED) or history.entered_at(Delivery.STATUS_DELIVERED)
+        if picked_up is None or arrived is None or arrived <= picked_up:
+            return False
+        restaurant = delivery.order.restaurant
+        km = None
+        if delivery.destination is not None:
+            km = haversine_km(restaurant.latitude, restaurant.longitude, *delivery.destination)
+        self.speeds.add(self.zone(restaurant.latitude, restaurant.longitude), picked_up.hour,
+                        (arrived - picked_up).total_seconds(), km)
+        return True
+
+    def learn(self, deliveries):
+        """Aprende com as entregas concluídas de uma coleção. Retorna quantas foram usadas."""
+        return sum(1 for delivery in deliveries
+                   if delivery.status == Delivery.STATUS_DELIVERED and self.observe(delivery))
+
+    def subscribe(self, bus):
+        """Passa a aprender com as entregas concluídas publicadas no barramento."""
+        self._subscriptions.append(bus.subscribe(DELIVERY_STATUS_CHANGED, CallbackObserver(self.on_status_changed)))
+
+    def unsubscribe(self, bus):
+        """Deixa de acompanhar o barramento."""
+        for subscription in self._subscriptions:
+            bus.unsubscribe(subscription)
+        self._subscriptions = []
+
+    def on_status_changed(self, event):
+        """Registra o trajeto de cada entrega concluída."""
+        if event.status == Delivery.STATUS_DELIVERED:
+            self.observe(event.delivery)
+
+    def estimate(self, delivery, now=None):
+        """Retorna o horário estimado de chegada da entrega, ou None se ela já terminou."""
+        estimates = self._estimate_many([delivery], now or datetime.datetime.now())
+        return estimates[0][1] if estimates else None
+
+    def recompute(self, deliveries, now=None):
+        """
+        Atualiza estimated_delivery_time de todas as entregas em andamento
+        informadas, sem notificar observadores. Retorna quantas foram atualizadas.
+        """
+        now = now or datetime.datetime.now()
+        estimates = self._estimate_many(deliveries, now)
+        for delivery, estimate in estimates:
+            delivery.estimated_delivery_time = estimate
+        return len(estimates)
+
+    def _estimate_many(self, deliveries, now):
+        # Monta os trechos de todas as entregas, calcula as distâncias em um único
+        # lote e resolve zona e velocidade uma vez por restaurante. Retorna [(entrega, horário)].
+        hour = now.hour
+        pre_pickup, en_route = self.PRE_PICKUP, self.EN_ROUTE
+        assigned, arrived = Delivery.STATUS_ASSIGNED, Delivery.STATUS_ARRIVED
+        zones = {}  # id do restaurante -> zona
+        plans = []  # (entrega, zona, segundos fixos, quantidade de trechos)
+        latitudes1, longitudes1, latitudes2, longitudes2 = [], [], [], []
+
+        for delivery in deliveries:
+            status = delivery.status
+            restaurant = delivery.order.restaurant
+            zone = zones.get(restaurant.id)
+            if zone is None:
+                zone = zones[restaurant.id] = self.zone(restaurant.latitude, restaurant.longitude)
+            location = delivery.location
+            # A localização começa em (0, 0) até a primeira atualização do entregador
+            has_fix = location.latitude != 0.0 or location.longitude != 0.0
+            destination = delivery.destination
+            legs = 0
+            fixed = 0.0
+            if status in pre_pickup:
+                if status == assigned and has_fix:
+                    # Trecho do entregador até o restaurante
+                    latitudes1.append(location.latitude)
+                    longitudes1.append(location.longitude)
+                    latitudes2.append(restaurant.latitude)
+                    longitudes2.append(restaurant.longitude)
+                    legs += 1
+                if destination is not None:
+                    latitudes1.append(restaurant.latitude)
+                    longitudes1.append(restaurant.longitude)
+                    latitudes2.append(destination[0])
+                    longitudes2.append(destination[1])
+                    legs += 1
+                else:
+                    fixed = self.speeds.lookup(zone, hour)[1]
+            elif status in en_route:
+                if destination is not None:
+                    origin = location if has_fix else restaurant
+                    latitudes1.append(origin.latitude)
+                    longitudes1.append(origin.longitude)
+                    latitudes2.append(destination[0])
+                    longitudes2.append(destination[1])
+                    legs += 1
+                else:
+                    picked_up = delivery.status_history.entered_at(Delivery.STATUS_PICKED_UP) or now
+                    elapsed = (now - picked_up).total_seconds()
+                    fixed = max(0.0, self.speeds.lookup(zone, hour)[1] - elapsed)
+            elif status != arrived:
+                continue  # Entrega concluída ou cancelada
+            plans.append((delivery, zone, fixed, legs))
+
+        distances = haversine_many(latitudes1, longitudes1, latitudes2, longitudes2)
+        seconds_per_km = {}  # zona -> segundos por km
+        timedelta = datetime.timedelta
+        estimates = []
+        position = 0
+        for delivery, zone, seconds, legs in plans:
+            if legs:
+                pace = seconds_per_km.get(zone)
+                if pace is None:
+                    pace = seconds_per_km[zone] = 3600 / self.speeds.speed(zone, hour)
+                seconds += distances[position] * pace
+                if legs == 2:
+                    seconds += distances[position + 1] * pace
+                position += legs
+            estimates.append((delivery, now + timedelta(seconds=seconds)))
+        return estimates
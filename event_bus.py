@@ -0,0 +1,120 @@
+DELIVERY_STATUS_CHANGED = "delivery.status_changed"
+DELIVERY_LOCATION_UPDATED = "delivery.location_updated"
+
+
+class Subscription:
+    """Inscrição de um observador em um tópico, com filtros opcionais por restaurante ou cliente."""
+
+    __slots__ = ("topic", "observer", "restaurant_id", "customer_id")
+
+    def __init__(self, topic, observer, restaurant_id=None, customer_id=None):
+        self.topic = topic
+        self.observer = observer
+        self.restaurant_id = restaurant_id
+        self.customer_id = customer_id
+
+
+class EventBus:
+    """
+    Barramento de eventos compartilhado pelo processo inteiro.
+
+    Em vez de cada entrega manter sua própria lista de observadores, os
+    observadores se inscrevem uma única vez por tópico (por exemplo, mudança de
+    status ou de localização), opcionalmente filtrando por restaurante ou por
+    cliente, e as entregas apenas publicam. As inscrições ficam em dicionários
+    por tópico e por id, então publicar custa algumas consultas hash,
+    independentemente de quantas entregas existem.
+
+    Os observadores recebem o evento em update(evento), como no padrão
+    Observer. Com um AsyncDispatcher em dispatcher, a entrega é feita em
+    segundo plano.
+    """
+
+    def __init__(self, dispatcher=None):
+        self.dispatcher = dispatcher
+        self._all = {}  # tópico -> [Subscription]
+        self._by_restaurant = {}  # tópico -> {id do restaurante: [Subscription]}
+        self._by_customer = {}  # tópico -> {id do cliente: [Subscription]}
+
+    def subscribe(self, topic, observer, restaurant_id=None, customer_id=None):
+        """
+        Inscreve o observador no tópico. Com restaurant_id ou customer_id, ele só
+        recebe os eventos daquele restaurante ou cliente. Retorna a inscrição,
+        que pode ser passada para unsubscribe.
+        """
+        if restaurant_id is not None and customer_id is not None:
+            raise ValueError("Informe no máximo um filtro: restaurante ou cliente.")
+        subscription = Subscription(topic, observer, restaurant_id, customer_id)
+        self._bucket(subscription, create=True).append(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        """Cancela uma inscrição feita com subscribe."""
+        bucket = self._bucket(subscription, create=False)
+        if bucket is None or subscription not in bucket:
+            raise ValueError("Inscrição não encontrada.")
+        bucket.remove(subscription)
+        if not bucket:
+            # Remove os baldes vazios, para que has_subscribers volte a ser False
+            topic = subscription.topic
+            if subscription.restaurant_id is not None:
+                self._discard(self._by_restaurant, topic, subscription.restaurant_id)
+            elif subscription.customer_id is not None:
+                self._discard(self._by_customer, topic, subscription.customer_id)
+            else:
+                del self._all[topic]
+
+    @staticmethod
+    def _discard(index, topic, key):
+        by_key = index[topic]
+        del by_key[key]
+        if not by_key:
+            del index[topic]
+
+    def _bucket(self, subscription, create):
+        topic = subscription.topic
+        if subscription.restaurant_id is not None:
+            index, key = self._by_restaurant, subscription.restaurant_id
+        elif subscription.customer_id is not None:
+            index, key = self._by_customer, subscription.customer_id
+        else:
+            if create:
+                return self._all.setdefault(topic, [])
+            return self._all.get(topic)
+        if create:
+            return index.setdefault(topic, {}).setdefault(key, [])
+        return index.get(topic, {}).get(key)
+
+    def has_subscribers(self, topic):
+        """Indica se há alguma inscrição no tópico (para evitar montar eventos sem destino)."""
+        return bool(self._all.get(topic) or self._by_restaurant.get(topic) or self._by_customer.get(topic))
+
+    def subscribers(self, topic, restaurant_id=None, customer_id=None):
+        """Retorna os observadores que devem receber um evento do tópico."""
+        subscriptions = list(self._all.get(topic, ()))
+        if restaurant_id is not None:
+            subscriptions.extend(self._by_restaurant.get(topic, {}).get(restaurant_id, ()))
+        if customer_id is not None:
+            subscriptions.extend(self._by_customer.get(topic, {}).get(customer_id, ()))
+        return [subscription.observer for subscription in subscriptions]
+
+    def publish(self, topic, event, restaurant_id=None, customer_id=None):
+        """Entrega o evento aos observadores inscritos no tópico. Retorna quantos foram notificados."""
+        observers = self.subscribers(topic, restaurant_id, customer_id)
+        if not observers:
+            return 0
+        if self.dispatcher is not None:
+            self.dispatcher.dispatch(observers, event)
+        else:
+            for observer in observers:
+                observer.update(event)
+        return len(observers)
+
+    def clear(self):
+        """Remove todas as inscrições."""
+        self._all.clear()
+        self._by_restaurant.clear()
+        self._by_customer.clear()
+
+
+event_bus = EventBus()  # Barramento usado pelas entregas
@@ -0,0 +1,57 @@
+import math
+
+EARTH_RADIUS_KM = 6371.0088  # Raio médio da Terra
+KM_PER_DEGREE_LAT = math.pi * EARTH_RADIUS_KM / 180  # Distância de um grau de latitude
+DEFAULT_LATITUDE, DEFAULT_LONGITUDE = -9.6498, -35.7089  # Centro de Maceió, usado quando não há coordenadas
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    """Distância, em km, entre dois pontos (em graus) ao longo da superfície da Terra."""
+    phi1 = math.radians(lat1)
+    phi2 = math.radians(lat2)
+    dphi = phi2 - phi1
+    dlambda = math.radians(lon2 - lon1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def km_per_degree_lon(latitude):
+    """Distância, em km, de um grau de longitude na latitude informada."""
+    return KM_PER_DEGREE_LAT * max(math.cos(math.radians(latitude)), 1e-12)
+
+
+def bounding_box(latitude, longitude, radius_km):
+    """
+    Retorna (lat_min, lon_min, lat_max, lon_max), o retângulo que contém o
+    círculo de raio radius_km em torno do ponto.
+    """
+    dlat = radius_km / KM_PER_DEGREE_LAT
+    # Usa a latitude mais distante do equador dentro do círculo, onde o grau de longitude é menor
+    far_latitude = min(90.0, abs(latitude) + dlat)
+    dlon = min(180.0, radius_km / km_per_degree_lon(far_latitude))
+    return latitude - dlat, longitude - dlon, latitude + dlat, longitude + dlon
+
+
+def haversine_many(latitudes1, longitudes1, latitudes2, longitudes2):
+    """
+    Distâncias, em km, entre os pares de pontos de quatro sequências paralelas.
+
+    Equivale a chamar haversine_km para cada par, mas converte para radianos
+    e resolve as funções do módulo math uma única vez por lote.
+    """
+    radians, sin, cos, asin, sqrt = math.radians, math.sin, math.cos, math.asin, math.sqrt
+    diameter = 2 * EARTH_RADIUS_KM
+    distances = []
+    append = distances.append
+    for lat1, lon1, lat2, lon2 in zip(latitudes1, longitudes1, latitudes2, longitudes2):
+        phi1 = radians(lat1)
+        phi2 = radians(lat2)
+        a = sin((phi2 - phi1) / 2) ** 2 + cos(phi1) * cos(phi2) * sin(radians(lon2 - lon1) / 2) ** 2
+        append(diameter * asin(min(1.0, sqrt(a))))
+    return distances
+
+
+def zone_of(latitude, longitude, zone_size_km):
+    """Retorna a zona (linha, coluna) de uma grade de zone_size_km de lado que contém o ponto."""
+    size = zone_size_km / KM_PER_DEGREE_LAT
+    return math.floor(latitude / size), math.floor(longitude / size)
@@ -0,0 +1,228 @@
+import heapq
+import itertools
+import math
+from delivery import Delivery
+from event_bus import DELIVERY_LOCATION_UPDATED, DELIVERY_STATUS_CHANGED
+from geo import KM_PER_DEGREE_LAT, haversine_km, km_per_degree_lon, bounding_box
+from observer import CallbackObserver
+
+
+class GridIndex:
+    """
+    Índice espacial em grade para pontos que se movem (entregas, entregadores).
+
+    O mapa é dividido em células de cell_size_km de lado (em graus de
+    latitude; a mesma medida em graus é usada para a longitude). Cada célula
+    guarda os pontos que estão nela, então mover um ponto custa O(1) e as
+    consultas por raio, retângulo e vizinhos mais próximos só examinam as
+    células que podem conter respostas.
+    """
+
+    def __init__(self, cell_size_km=1.0):
+        if cell_size_km <= 0:
+            raise ValueError("O tamanho da célula deve ser positivo.")
+        self.cell_size_km = cell_size_km
+        self._cell_degrees = cell_size_km / KM_PER_DEGREE_LAT
+        self._positions = {}  # chave -> (lat, lon, célula)
+        self._cells = {}  # célula -> {chave: (lat, lon)}
+
+    def _cell(self, latitude, longitude):
+        size = self._cell_degrees
+        return math.floor(latitude / size), math.floor(longitude / size)
+
+    def update(self, key, latitude, longitude):
+        """Insere o ponto ou move-o para a nova posição."""
+        cell = self._cell(latitude, longitude)
+        previous = self._positions.get(key)
+        if previous is not None and previous[2] != cell:
+            self._remove_from_cell(key, previous[2])
+        self._positions[key] = (latitude, longitude, cell)
+        self._cells.setdefault(cell, {})[key] = (latitude, longitude)
+
+    def remove(self, key):
+        """Remove o ponto do índice (se estiver nele)."""
+        previous = self._positions.pop(key, None)
+        if previous is not None:
+            self._remove_from_cell(key, previous[2])
+
+    def _remove_from_cell(self, key, cell):
+        points = self._cells[cell]
+        del points[key]
+        if not points:
+            del self._cells[cell]
+
+    def get(self, key):
+        """Retorna (lat, lon) do ponto, ou None."""
+        position = self._positions.get(key)
+        return None if position is None else position[:2]
+
+    def within_bbox(self, lat_min, lon_min, lat_max, lon_max):
+        """Retorna as chaves dos pontos dentro do retângulo."""
+        row_min, col_min = self._cell(lat_min, lon_min)
+        row_max, col_max = self._cell(lat_max, lon_max)
+        result = []
+        for points in self._cells_in_range(row_min, col_min, row_max, col_max):
+            for key, (latitude, longitude) in points.items():
+                if lat_min <= latitude <= lat_max and lon_min <= longitude <= lon_max:
+                    result.append(key)
+        return result
+
+    def _cells_in_range(self, row_min, col_min, row_max, col_max):
+        if (row_max - row_min + 1) * (col_max - col_min + 1) > len(self._cells):
+            # O retângulo cobre mais células do que as ocupadas: percorre só as ocupadas
+            for (row, col), points in self._cells.items():
+                if row_min <= row <= row_max and col_min <= col <= col_max:
+                    yield points
+            return
+        for row in range(row_min, row_max + 1):
+            for col in range(col_min, col_max + 1):
+                points = self._cells.get((row, col))
+                if points:
+                    yield points
+
+    def within_radius(self, latitude, longitude, radius_km):
+        """Retorna [(chave, distância em km)] dos pontos a até radius_km, do mais próximo ao mais distante."""
+        lat_min, lon_min, lat_max, lon_max = bounding_box(latitude, longitude, radius_km)
+        row_min, col_min = self._cell(lat_min, lon_min)
+        row_max, col_max = self._cell(lat_max, lon_max)
+        result = []
+        for points in self._cells_in_range(row_min, col_min, row_max, col_max):
+            for key, (point_lat, point_lon) in points.items():
+                distance = haversine_km(latitude, longitude, point_lat, point_lon)
+                if distance <= radius_km:
+                    result.append((key, distance))
+        result.sort(key=lambda item: item[1])
+        return result
+
+    def nearest(self, latitude, longitude, k=1, max_radius_km=None):
+        """
+        Retorna [(chave, distância em km)] dos k pontos mais próximos (opcionalmente
+        só até max_radius_km), do mais próximo ao mais distante.
+
+        Examina anéis de células cada vez maiores em torno do ponto e para quando
+        nenhuma célula ainda não examinada pode ter um ponto mais próximo que o
+        k-ésimo encontrado.
+        """
+        if k < 1 or not self._positions:
+            return []
+        center_row, center_col = self._cell(latitude, longitude)
+        best = []  # heap de (-distância, desempate, chave) com os k melhores
+        tiebreak = itertools.count()
+
+        def consider(points):
+            for key, (point_lat, point_lon) in points.items():
+                distance = haversine_km(latitude, longitude, point_lat, point_lon)
+                if max_radius_km is not None and distance > max_radius_km:
+                    continue
+                if len(best) < k:
+                    heapq.heappush(best, (-distance, next(tiebreak), key))
+                elif distance < -best[0][0]:
+                    heapq.heapreplace(best, (-distance, next(tiebreak), key))
+
+        ring = 0
+        while True:
+            if (2 * ring + 1) ** 2 > 2 * len(self._cells):
+                # Os anéis já são maiores que a área ocupada: examina de uma vez as células restantes
+                for (row, col), points in self._cells.items():
+                    if max(abs(row - center_row), abs(col - center_col)) >= ring:
+                        consider(points)
+                break
+            for cell in self._ring(center_row, center_col, ring):
+                points = self._cells.get(cell)
+                if points:
+                    consider(points)
+            # Distância mínima até qualquer célula fora dos anéis já examinados
+            far_latitude = min(90.0, abs(latitude) + (ring + 1) * self._cell_degrees)
+            reach = ring * self._cell_degrees * min(KM_PER_DEGREE_LAT, km_per_degree_lon(far_latitude))
+            if len(best) == k and -best[0][0] <= reach:
+                break
+            if max_radius_km is not None and reach >= max_radius_km:
+                break
+            ring += 1
+        return [(key, -negative) for negative, _, key in sorted(best, reverse=True)]
+
+    @staticmethod
+    def _ring(center_row, center_col, ring):
+        if ring == 0:
+            yield center_row, center_col
+            return
+        for col in range(center_col - ring, center_col + ring + 1):
+            yield center_row - ring, col
+            yield center_row + ring, col
+        for row in range(center_row - ring + 1, center_row + ring):
+            yield row, center_col - ring
+            yield row, center_col + ring
+
+    def __len__(self):
+        return len(self._positions)
+
+    def __contains__(self, key):
+        return key in self._positions
+
+
+class DeliveryLocationIndex:
+    """
+    Índice espacial das entregas em andamento.
+
+    Inscreve-se no barramento de eventos: cada Delivery.update_location move a
+    entrega no índice, e entregas concluídas ou canceladas saem dele. As
+    consultas retornam as entregas (Delivery) com a distância em km.
+    """
+
+    FINAL_STATUSES = (Delivery.STATUS_DELIVERED, Delivery.STATUS_CANCELLED)
+
+    def __init__(self, cell_size_km=1.0):
+        self._grid = GridIndex(cell_size_km)
+        self._deliveries = {}  # id do pedido -> Delivery
+        self._subscriptions = []
+
+    def subscribe(self, bus):
+        """Passa a acompanhar as mudanças de localização e de status publicadas no barramento."""
+        self._subscriptions.append(bus.subscribe(DELIVERY_LOCATION_UPDATED, CallbackObserver(self.on_location_updated)))
+        self._subscriptions.append(bus.subscribe(DELIVERY_STATUS_CHANGED, CallbackObserver(self.on_status_changed)))
+
+    def unsubscribe(self, bus):
+        """Deixa de acompanhar o barramento."""
+        for subscription in self._subscriptions:
+            bus.unsubscribe(subscription)
+        self._subscriptions = []
+
+    def on_location_updated(self, event):
+        """Move a entrega para a posição do evento."""
+        if event.status in self.FINAL_STATUSES:
+            return
+        self._deliveries[event.order.id] = event.delivery
+        self._grid.update(event.order.id, event.latitude, event.longitude)
+
+    def on_status_changed(self, event):
+        """Remove a entrega do índice quando ela é concluída ou cancelada."""
+        if event.status in self.FINAL_STATUSES:
+            self.remove(event.delivery)
+
+    def update(self, delivery):
+        """Indexa (ou move) a entrega pela sua localização atual."""
+        self._deliveries[delivery.order.id] = delivery
+        self._grid.update(delivery.order.id, delivery.location.latitude, delivery.location.longitude)
+
+    def remove(self, delivery):
+        """Remove a entrega do índice."""
+        self._deliveries.pop(delivery.order.id, None)
+        self._grid.remove(delivery.order.id)
+
+    def within_radius(self, latitude, longitude, radius_km):
+        """Retorna [(entrega, distância em km)] das entregas a até radius_km do ponto."""
+        return [(self._deliveries[key], distance) for key, distance in self._grid.within_radius(latitude, longitude, radius_km)]
+
+    def within_bbox(self, lat_min, lon_min, lat_max, lon_max):
+        """Retorna as entregas dentro do retângulo."""
+        return [self._deliveries[key] for key in self._grid.within_bbox(lat_min, lon_min, lat_max, lon_max)]
+
+    def nearest(self, latitude, longitude, k=1, max_radius_km=None):
+        """Retorna [(entrega, distância em km)] das k entregas mais próximas do ponto."""
+        return [(self._deliveries[key], distance) for key, distance in self._grid.nearest(latitude, longitude, k, max_radius_km)]
+
+    def __len__(self):
+        return len(self._grid)
+
+    def __contains__(self, delivery):
+        return delivery.order.id in self._grid
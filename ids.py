@@ -0,0 +1,65 @@
+import datetime
+import threading
+import time
+
+# Base32 de Crockford (sem I, L, O e U) para representar ids de forma compacta
+_ALPHABET = "0123456789ABCDEFGHJKMNPQRSTVWXYZ"
+
+
+class IdGenerator:
+    """
+    Gerador de ids inteiros monotônicos e ordenáveis por tempo (estilo snowflake).
+
+    Cada id é composto pelos milissegundos decorridos desde a época do gerador,
+    deslocados à esquerda, mais um contador de sequência para ids gerados no
+    mesmo milissegundo. Assim, ids maiores sempre foram gerados depois, e o
+    instante de criação pode ser recuperado a partir do próprio id.
+    """
+
+    SEQUENCE_BITS = 22
+    EPOCH = datetime.datetime(2024, 1, 1, tzinfo=datetime.timezone.utc)
+
+    def __init__(self):
+        self._epoch_ms = int(self.EPOCH.timestamp() * 1000)
+        self._max_sequence = (1 << self.SEQUENCE_BITS) - 1
+        self._last_ms = -1
+        self._sequence = 0
+        self._lock = threading.Lock()
+
+    def next_id(self):
+        """Gera um novo id, sempre maior que todos os anteriores."""
+        with self._lock:
+            now_ms = time.time_ns() // 1_000_000 - self._epoch_ms
+            if now_ms <= self._last_ms:
+                # Mesmo milissegundo (ou relógio voltou): incrementa a sequência
+                now_ms = self._last_ms
+                self._sequence += 1
+                if self._sequence > self._max_sequence:
+                    now_ms += 1
+                    self._sequence = 0
+            else:
+                self._sequence = 0
+            self._last_ms = now_ms
+            return (now_ms << self.SEQUENCE_BITS) | self._sequence
+
+    def lower_bound(self, moment):
+        """Retorna o menor id que pode ter sido gerado no instante informado."""
+        moment_ms = int(moment.timestamp() * 1000) - self._epoch_ms
+        return max(moment_ms, 0) << self.SEQUENCE_BITS
+
+    def timestamp_of(self, generated_id):
+        """Retorna o instante (horário local) em que o id foi gerado."""
+        moment_ms = (generated_id >> self.SEQUENCE_BITS) + self._epoch_ms
+        return datetime.datetime.fromtimestamp(moment_ms / 1000)
+
+
+def format_id(generated_id):
+    """Representa um id em base32 de Crockford, com 13 caracteres."""
+    chars = []
+    for _ in range(13):
+        chars.append(_ALPHABET[generated_id & 31])
+        generated_id >>= 5
+    return "".join(reversed(chars))
+
+
+order_ids = IdGenerator()  # Gerador compartilhado pelos pedidos
@@ -0,0 +1,124 @@
+import sys
+from sketches import QuantileSketch
+
+DEBUG = 10
+INFO = 20
+WARNING = 30
+ERROR = 40
+OFF = 100
+
+_LEVEL_NAMES = {DEBUG: "DEBUG", INFO: "INFO", WARNING: "WARNING", ERROR: "ERROR"}
+
+
+class Instrumentation:
+    """
+    Camada de instrumentação: mensagens com níveis, contadores e histogramas de latência.
+
+    As mensagens são formatadas só quando o nível está habilitado (os argumentos
+    são aplicados com %, como no módulo logging). Contadores e latências só são
+    registrados com metrics_enabled; o código instrumentado testa esse atributo
+    antes de medir o tempo, então, desligada, a instrumentação custa apenas
+    uma comparação por chamada.
+
+    As latências ficam em sketches de quantis (em milissegundos), que ocupam
+    memória constante independentemente do número de medições.
+    """
+
+    def __init__(self, level=WARNING, metrics_enabled=False, stream=None):
+        self.level = level
+        self.metrics_enabled = metrics_enabled
+        self.stream = stream  # Destino das mensagens; None usa sys.stdout
+        self._counters = {}
+        self._latencies = {}
+
+    def set_level(self, level):
+        """Define o nível mínimo das mensagens exibidas (OFF desliga todas)."""
+        self.level = level
+
+    def enable_metrics(self, enabled=True):
+        """Liga ou desliga o registro de contadores e latências."""
+        self.metrics_enabled = enabled
+
+    def is_enabled_for(self, level):
+        """Indica se mensagens do nível informado serão exibidas."""
+        return level >= self.level
+
+    def log(self, level, message, *args):
+        """Exibe a mensagem se o nível estiver habilitado, formatando-a só nesse caso."""
+        if level < self.level:
+            return
+        if args:
+            message = message % args
+        print(f"[{_LEVEL_NAMES.get(level, level)}] {message}", file=self.stream or sys.stdout)
+
+    def debug(self, message, *args):
+        if DEBUG >= self.level:
+            self.log(DEBUG, message, *args)
+
+    def info(self, message, *args):
+        if INFO >= self.level:
+            self.log(INFO, message, *args)
+
+    def warning(self, message, *args):
+        if WARNING >= self.level:
+            self.log(WARNING, message, *args)
+
+    def error(self, message, *args):
+        if ERROR >= self.level:
+            self.log(ERROR, message, *args)
+
+    def increment(self, name, value=1):
+        """Soma value ao contador name (se as métricas estiverem ligadas)."""
+        if self.metrics_enabled:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def observe(self, name, seconds):
+        """Registra uma latência, em segundos, no histograma name (se as métricas estiverem ligadas)."""
+        if self.metrics_enabled:
+            sketch = self._latencies.get(name)
+            if sketch is None:
+                sketch = self._latencies[name] = QuantileSketch()
+            sketch.add(seconds * 1000)
+
+    def get_counter(self, name):
+        """Retorna o valor de um contador."""
+        return self._counters.get(name, 0)
+
+    def get_counters(self):
+        """Retorna uma cópia de todos os contadores."""
+        return dict(self._counters)
+
+    def get_latency(self, name, percentiles=(50, 90, 99)):
+        """
+        Retorna as estatísticas de latência (em milissegundos) de name:
+        número de medições, média e percentis. Retorna None se não houver medições.
+        """
+        sketch = self._latencies.get(name)
+        if sketch is None:
+            return None
+        return {
+            "count": sketch.count,
+            "mean_ms": sketch.mean(),
+            "percentiles_ms": sketch.percentiles(percentiles),
+        }
+
+    def reset(self):
+        """Zera contadores e histogramas."""
+        self._counters.clear()
+        self._latencies.clear()
+
+    def report(self):
+        """Retorna um resumo em texto dos contadores e latências."""
+        lines = ["Contadores:"]
+        for name in sorted(self._counters):
+            lines.append(f"  {name}: {self._counters[name]}")
+        lines.append("Latências (ms):")
+        for name in sorted(self._latencies):
+            stats = self.get_latency(name)
+            p = stats["percentiles_ms"]
+            lines.append(f"  {name}: n={stats['count']} média={stats['mean_ms']:.3f} "
+                         f"p50={p[50]:.3f} p90={p[90]:.3f} p99={p[99]:.3f}")
+        return "\n".join(lines)
+
+
+instrumentation = Instrumentation()  # Instância usada pelo sistema
@@ -0,0 +1,211 @@
+import datetime
+import math
+from geo import KM_PER_DEGREE_LAT, km_per_degree_lon
+
+SCALE = 1_000_000  # Coordenadas em micrograus (cerca de 11 cm no equador)
+_KM_PER_UNIT = KM_PER_DEGREE_LAT / SCALE
+
+
+class LocationTrail:
+    """
+    Trajeto de uma entrega: todas as leituras de localização, compactadas.
+
+    Cada leitura é guardada como a diferença para a anterior (latitude e
+    longitude em micrograus, horário em milissegundos), codificada como
+    inteiros de tamanho variável em um bytearray. Leituras próximas no tempo
+    e no espaço ocupam poucos bytes, em vez dos mais de 100 bytes de uma
+    tupla de floats e datetime.
+
+    A iteração decodifica as leituras uma a uma. A distância percorrida, a
+    duração e a velocidade máxima são atualizadas a cada leitura, então as
+    estatísticas não precisam decodificar o trajeto.
+    """
+
+    __slots__ = ("_data", "_count", "_last", "_first_ms", "distance_km", "max_speed_kmh")
+
+    def __init__(self):
+        self._data = bytearray()
+        self._count = 0
+        self._last = (0, 0, 0)  # Última leitura (latitude, longitude, ms), em ponto fixo
+        self._first_ms = None
+        self.distance_km = 0.0
+        self.max_speed_kmh = 0.0
+
+    def append(self, latitude, longitude, timestamp=None):
+        """
+        Registra uma leitura (timestamp é um datetime; padrão: agora). Leituras
+        anteriores à última registrada são ignoradas. Retorna se a leitura foi registrada.
+        """
+        moment = (timestamp or datetime.datetime.now()).timestamp()
+        return self.extend((latitude,), (longitude,), (moment,)) == 1
+
+    def extend(self, latitudes, longitudes, timestamps):
+        """
+        Registra várias leituras, em ordem de horário (timestamps em segundos
+        desde a época, como time.time()). Retorna quantas foram registradas.
+        """
+        append = self._data.append
+        cos, radians, sqrt = math.cos, math.radians, math.sqrt
+        last_latitude, last_longitude, last_moment = self._last
+        count = self._count
+        distance_km = self.distance_km
+        max_speed_kmh = self.max_speed_kmh
+        added = 0
+        for latitude, longitude, moment in zip(latitudes, longitudes, timestamps):
+            latitude = round(latitude * SCALE)
+            longitude = round(longitude * SCALE)
+            moment = round(moment * 1000)
+            if count:
+                if moment < last_moment:
+                    continue
+                # Aproximação equiretangular: o erro é desprezível entre leituras consecutivas
+                north = (latitude - last_latitude) * _KM_PER_UNIT
+                east = (longitude - last_longitude) * _KM_PER_UNIT * cos(radians(latitude / SCALE))
+                distance = sqrt(north * north + east * east)
+                distance_km += distance
+                if moment > last_moment:
+                    speed = distance / (moment - last_moment) * 3_600_000
+                    if speed > max_speed_kmh:
+                        max_speed_kmh = speed
+            else:
+                self._first_ms = moment
+            # Diferenças em zigzag + LEB128: valores pequenos ocupam 1 ou 2 bytes
+            for value in (latitude - last_latitude, longitude - last_longitude, moment - last_moment):
+                value = value << 1 if value >= 0 else (-value << 1) - 1
+                while value > 0x7F:
+                    append((value & 0x7F) | 0x80)
+                    value >>= 7
+                append(value)
+            last_latitude, last_longitude, last_moment = latitude, longitude, moment
+            count += 1
+            added += 1
+        self._last = (last_latitude, last_longitude, last_moment)
+        self._count = count
+        self.distance_km = distance_km
+        self.max_speed_kmh = max_speed_kmh
+        return added
+
+    def _iter_fixed(self):
+        # Decodifica as leituras em ponto fixo, uma a uma
+        data = self._data
+        size = len(data)
+        position = 0
+        values = [0, 0, 0]
+        while position < size:
+            for field in range(3):
+                shift = 0
+                raw = 0
+                while True:
+                    byte = data[position]
+                    position += 1
+                    raw |= (byte & 0x7F) << shift
+                    if byte < 0x80:
+                        break
+                    shift += 7
+                values[field] += (raw >> 1) if not raw & 1 else -((raw + 1) >> 1)
+            yield values[0], values[1], values[2]
+
+    def __iter__(self):
+        """Percorre as leituras como (latitude, longitude, datetime), decodificando sob demanda."""
+        from_timestamp = datetime.datetime.fromtimestamp
+        for latitude, longitude, moment in self._iter_fixed():
+            yield latitude / SCALE, longitude / SCALE, from_timestamp(moment / 1000)
+
+    def __len__(self):
+        return self._count
+
+    @property
+    def nbytes(self):
+        """Bytes ocupados pelas leituras codificadas."""
+        return len(self._data)
+
+    def last(self):
+        """Retorna a última leitura (latitude, longitude, datetime), ou None se o trajeto está vazio."""
+        if not self._count:
+            return None
+        latitude, longitude, moment = self._last
+        return latitude / SCALE, longitude / SCALE, datetime.datetime.fromtimestamp(moment / 1000)
+
+    def duration_seconds(self):
+        """Segundos entre a primeira e a última leitura."""
+        if not self._count:
+            return 0.0
+        return (self._last[2] - self._first_ms) / 1000
+
+    def average_speed_kmh(self):
+        """Velocidade média, em km/h, entre a primeira e a última leitura (0 se não houver intervalo)."""
+        duration = self.duration_seconds()
+        return self.distance_km / duration * 3600 if duration > 0 else 0.0
+
+    def get_stats(self):
+        """Retorna as estatísticas do trajeto."""
+        return {
+            "points": self._count,
+            "distance_km": self.distance_km,
+            "duration_seconds": self.duration_seconds(),
+            "average_speed_kmh": self.average_speed_kmh(),
+            "max_speed_kmh": self.max_speed_kmh,
+            "bytes": self.nbytes,
+        }
+
+    def simplified(self, tolerance_km):
+        """
+        Retorna um novo trajeto simplificado por Douglas–Peucker: ficam só as
+        leituras necessárias para que nenhuma removida esteja a mais de
+        tolerance_km da linha entre as mantidas. A primeira e a última
+        leitura são sempre mantidas.
+
+        As estatísticas (distância percorrida, duração e velocidades) continuam
+        sendo as do trajeto completo, e não as da geometria simplificada.
+        """
+        points = list(self._iter_fixed())
+        if len(points) < 3:
+            return self._with_stats(self._from_fixed(points))
+
+        keep = [False] * len(points)
+        keep[0] = keep[-1] = True
+        stack = [(0, len(points) - 1)]
+        while stack:
+            first, last = stack.pop()
+            if last - first < 2:
+                continue
+            # Projeção plana local em km, suficiente para distâncias de um trajeto urbano
+            origin_latitude = points[first][0] / SCALE
+            lon_scale = km_per_degree_lon(origin_latitude) / SCALE
+            lat_scale = KM_PER_DEGREE_LAT / SCALE
+            end_x = (points[last][1] - points[first][1]) * lon_scale
+            end_y = (points[last][0] - points[first][0]) * lat_scale
+            length_squared = end_x * end_x + end_y * end_y
+            farthest, farthest_distance = first, -1.0
+            for index in range(first + 1, last):
+                x = (points[index][1] - points[first][1]) * lon_scale
+                y = (points[index][0] - points[first][0]) * lat_scale
+                if length_squared:
+                    # Distância ao segmento (não à reta infinita)
+                    t = max(0.0, min(1.0, (x * end_x + y * end_y) / length_squared))
+                    dx, dy = x - t * end_x, y - t * end_y
+                else:
+                    dx, dy = x, y
+                distance = dx * dx + dy * dy
+                if distance > farthest_distance:
+                    farthest, farthest_distance = index, distance
+            if farthest_distance > tolerance_km * tolerance_km:
+                keep[farthest] = True
+                stack.append((first, farthest))
+                stack.append((farthest, last))
+
+        return self._with_stats(self._from_fixed([point for point, kept in zip(points, keep) if kept]))
+
+    def _with_stats(self, trail):
+        # Copia para o trajeto simplificado os totais medidos com todas as leituras
+        trail._first_ms = self._first_ms
+        trail.distance_km = self.distance_km
+        trail.max_speed_kmh = self.max_speed_kmh
+        return trail
+
+    @staticmethod
+    def _from_fixed(points):
+        trail = LocationTrail()
+        trail.extend([point[0] / SCALE for point in points], [point[1] / SCALE for point in points],
+                     [point[2] / 1000 for point in points])
+        return trail
@@ -6,6 +6,12 @@ class Menu:
     def __init__(self, restaurant):
         self._dishes = {}  # Agora armazena objetos BasicDish em vez de apenas preços
         self._restaurant = restaurant
+        self._version = 0  # Incrementado a cada mudança de pratos ou preços
+
+    @property
+    def version(self):
+        """Versão dos preços do menu; pedidos a usam para saber se o total em cache ainda vale."""
+        return self._version
 
     def _check_owner_permission(self, user):
         PermissionManager.check_restaurant_owner_permission(user, self._restaurant)
@@ -13,6 +19,7 @@ class Menu:
     def add_dish(self, user, dish_name, price, description=""):
         self._check_owner_permission(user)
         self._dishes[dish_name] = BasicDish(dish_name, price, description)
+        self._version += 1
 
     def update_dish_price(self, user, dish_name, new_price):
         self._check_owner_permission(user)
@@ -20,6 +27,7 @@ class Menu:
             dish = self._dishes[dish_name]
             description = dish.get_description()
             self._dishes[dish_name] = BasicDish(dish_name, new_price, description)
+            self._version += 1
         else:
             raise ValueError(f"Prato '{dish_name}' não encontrado no menu.")
 
@@ -27,6 +35,7 @@ class Menu:
         self._check_owner_permission(user)
         if dish_name in self._dishes:
             del self._dishes[dish_name]
+            self._version += 1
         else:
             raise ValueError(f"Prato '{dish_name}' não encontrado no menu.")
 
@@ -0,0 +1,170 @@
+import datetime
+import json
+
+
+class Notification:
+    """
+    Notificação de um cliente. Também pode ser lida como dicionário
+    (notification["timestamp"], notification["message"]), como as antigas entradas.
+    """
+
+    __slots__ = ("id", "timestamp", "message", "read")
+
+    def __init__(self, id, timestamp, message, read=False):
+        self.id = id  # Sequencial dentro da caixa de entrada do cliente
+        self.timestamp = timestamp
+        self.message = message
+        self.read = read
+
+    def __getitem__(self, key):
+        if key not in self.__slots__:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def to_dict(self):
+        return {"id": self.id, "timestamp": self.timestamp.isoformat(), "message": self.message, "read": self.read}
+
+
+class JsonLinesArchive:
+    """
+    Arquivo de notificações antigas em disco, uma notificação JSON por linha.
+    Recebe as notificações que não cabem mais na caixa de entrada.
+    """
+
+    def __init__(self, path):
+        self.path = path
+
+    def store(self, owner_id, notification):
+        """Grava uma notificação do cliente owner_id no arquivo."""
+        record = notification.to_dict()
+        record["owner"] = owner_id
+        with open(self.path, "a", encoding="utf-8") as archive:
+            archive.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+    def load(self, owner_id):
+        """Lê as notificações arquivadas de um cliente, da mais antiga à mais recente."""
+        notifications = []
+        try:
+            with open(self.path, encoding="utf-8") as archive:
+                for line in archive:
+                    record = json.loads(line)
+                    if record["owner"] == owner_id:
+                        timestamp = datetime.datetime.fromisoformat(record["timestamp"])
+                        notifications.append(Notification(record["id"], timestamp, record["message"], record["read"]))
+        except FileNotFoundError:
+            pass
+        return notifications
+
+
+class NotificationInbox:
+    """
+    Caixa de entrada de notificações de um cliente, com tamanho limitado.
+
+    As notificações ficam em um buffer circular com no máximo 'capacity'
+    entradas: quando ele está cheio, a mais antiga sai para o arquivo (archive),
+    se houver um, ou é descartada. Como as notificações chegam em ordem de
+    horário, as consultas por horário usam busca binária e só leem a página
+    pedida. A contagem de não lidas é mantida a cada mudança.
+    """
+
+    DEFAULT_CAPACITY = 100
+
+    __slots__ = ("owner_id", "capacity", "archive", "_buffer", "_start", "_next_id", "_unread", "archived")
+
+    def __init__(self, owner_id=None, capacity=None, archive=None):
+        capacity = self.DEFAULT_CAPACITY if capacity is None else capacity
+        if capacity < 1:
+            raise ValueError("A capacidade deve ser pelo menos 1.")
+        self.owner_id = owner_id
+        self.capacity = capacity
+        self.archive = archive
+        self._buffer = []  # Cresce até capacity; depois as entradas são sobrescritas
+        self._start = 0  # Posição da notificação mais antiga no buffer
+        self._next_id = 1
+        self._unread = 0
+        self.archived = 0  # Notificações que saíram da caixa (arquivadas ou descartadas)
+
+    def add(self, timestamp, message):
+        """Adiciona uma notificação não lida e a retorna."""
+        notification = Notification(self._next_id, timestamp, message)
+        self._next_id += 1
+        if len(self._buffer) < self.capacity:
+            self._buffer.append(notification)
+        else:
+            oldest = self._buffer[self._start]
+            if not oldest.read:
+                self._unread -= 1
+            if self.archive is not None:
+                self.archive.store(self.owner_id, oldest)
+            self.archived += 1
+            self._buffer[self._start] = notification
+            self._start = (self._start + 1) % self.capacity
+        self._unread += 1
+        return notification
+
+    def _at(self, index):
+        # index 0 é a notificação mais antiga ainda na caixa
+        return self._buffer[(self._start + index) % len(self._buffer)]
+
+    def get(self, notification_id):
+        """Retorna a notificação com o id informado, ou None se ela não está mais na caixa."""
+        index = notification_id - (self._next_id - len(self._buffer))
+        if 0 <= index < len(self._buffer):
+            return self._at(index)
+        return None
+
+    def last(self, count=10):
+        """Retorna as últimas count notificações, da mais antiga à mais recente."""
+        size = len(self._buffer)
+        return [self._at(index) for index in range(max(0, size - count), size)]
+
+    def since(self, timestamp, limit=None):
+        """
+        Retorna as notificações a partir do horário informado (inclusive), da
+        mais antiga à mais recente, no máximo limit delas.
+        """
+        low, high = 0, len(self._buffer)
+        while low < high:
+            middle = (low + high) // 2
+            if self._at(middle).timestamp < timestamp:
+                low = middle + 1
+            else:
+                high = middle
+        end = len(self._buffer) if limit is None else min(len(self._buffer), low + limit)
+        return [self._at(index) for index in range(low, end)]
+
+    def unread(self, limit=None):
+        """Retorna as notificações não lidas, da mais antiga à mais recente."""
+        result = []
+        for notification in self:
+            if not notification.read:
+                result.append(notification)
+                if limit is not None and len(result) >= limit:
+                    break
+        return result
+
+    def unread_count(self):
+        """Retorna quantas notificações não lidas estão na caixa."""
+        return self._unread
+
+    def mark_read(self, notifications):
+        """
+        Marca as notificações informadas como lidas. Só as que ainda estão na
+        caixa contam para unread_count; as que já saíram dela foram descontadas em add.
+        """
+        for notification in notifications:
+            if not notification.read:
+                notification.read = True
+                if self.get(notification.id) is notification:
+                    self._unread -= 1
+
+    def mark_all_read(self):
+        """Marca todas as notificações da caixa como lidas."""
+        self.mark_read(self)
+
+    def __len__(self):
+        return len(self._buffer)
+
+    def __iter__(self):
+        for index in range(len(self._buffer)):
+            yield self._at(index)
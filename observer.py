@@ -1,4 +1,9 @@
+import queue
+import threading
+import time
 from abc import ABC, abstractmethod
+from ids import format_id
+from instrumentation import instrumentation, DEBUG, INFO
 
 class DeliveryObserver(ABC):
     """
@@ -12,42 +17,49 @@ class DeliveryObserver(ABC):
         """
         pass
 
+    def update_batch(self, deliveries):
+        """
+        Update the observer with several delivery events at once.
+        Called by AsyncDispatcher; observers can override it to process a batch more cheaply.
+        """
+        for delivery in deliveries:
+            self.update(delivery)
+
 class CustomerNotifier(DeliveryObserver):
     """
     Concrete observer that notifies the customer of delivery status changes.
+    Without a customer, it notifies the customer of each delivery's order, so a
+    single instance can serve every delivery (see event_bus.EventBus).
     """
-    def __init__(self, customer):
+    def __init__(self, customer=None):
         self.customer = customer
 
     def update(self, delivery):
         """
         Notify the customer of the delivery status change.
         """
-        message = f"Olá {self.customer}, seu pedido está agora em status: {delivery.status}."
+        customer = self.customer or delivery.order.customer
+        message = f"Olá {customer.name}, seu pedido está agora em status: {delivery.status}."
 
         # In a real-world scenario, this would send an SMS or email.
         print(f"[Notificação SMS] {message}")
 
-        # Store the notification in the customer's record
-        if not hasattr(self.customer, 'notifications'):
-            self.customer.notifications = []
-        self.customer.notifications.append({
-            'timestamp': delivery.status_history[-1]['timestamp'],
-            'message': message
-        })
+        # Store the notification in the customer's (bounded) inbox
+        customer.notifications.add(delivery.timestamp, message)
 
 class RestaurantNotifier(DeliveryObserver):
     """
     Concrete observer that notifies the restaurant of delivery status changes.
+    Without a restaurant, it notifies the restaurant of each delivery's order.
     """
-    def __init__(self, restaurant):
+    def __init__(self, restaurant=None):
         self.restaurant = restaurant
 
     def update(self, delivery):
         """
         Notify the restaurant of the delivery status change.
         """
-        message = f"Status do pedido #{id(delivery.order)} atualizado para: {delivery.status}."
+        message = f"Status do pedido #{format_id(delivery.order.id)} atualizado para: {delivery.status}."
 
         # In a real-world scenario, this would send an notification for the restaurant's dashboard.
         print(f"[Notificação Restaurante] {message}")
@@ -62,10 +74,166 @@ class AnalyticsTracker(DeliveryObserver):
         Register the change of status in the analytics system.
         """
         delivery.order.restaurant.analytics.add_order_data(delivery.order, delivery)
-        print(f"[Analytics] Dados do pedido #{id(delivery.order)} registrados com status: {delivery.status}.")
+        if instrumentation.is_enabled_for(INFO):
+            instrumentation.info("[Analytics] Dados do pedido #%s registrados com status: %s.",
+                                 format_id(delivery.order.id), delivery.status)
+
+    def update_batch(self, deliveries):
+        """
+        Register a batch of status changes. Analytics ingestion is an upsert per
+        order, so only the latest event of each order needs to be applied.
+        """
+        latest = {}
+        for delivery in deliveries:
+            latest[delivery.order.id] = delivery
+        for delivery in latest.values():
+            delivery.order.restaurant.analytics.add_order_data(delivery.order, delivery)
+        instrumentation.info("[Analytics] %d pedido(s) registrados a partir de %d evento(s).", len(latest), len(deliveries))
+
+
+class CallbackObserver(DeliveryObserver):
+    """
+    Observer that forwards each event to a callable, such as a bound method.
+    Lets a component subscribe its methods to the event bus (see event_bus.EventBus)
+    without implementing DeliveryObserver itself.
+    """
+
+    def __init__(self, callback):
+        self.callback = callback
+
+    def update(self, delivery):
+        """
+        Forward the event to the callback.
+        """
+        self.callback(delivery)
+
+
+class DeliveryEvent:
+    """
+    Snapshot of a delivery taken when its observers are notified.
+
+    Observers receive this snapshot instead of the live Delivery, so that a
+    notification processed later (see AsyncDispatcher) still reports the status
+    the delivery had when the change happened. It exposes the attributes that
+    observers read from a delivery.
+    """
+    __slots__ = ("delivery", "order", "status", "timestamp", "estimated_delivery_time", "promised_delivery_time",
+                 "delivery_time", "latitude", "longitude")
+
+    def __init__(self, delivery):
+        self.delivery = delivery
+        self.order = delivery.order
+        self.status = delivery.status
+        self.timestamp = delivery.status_history[-1]["timestamp"]
+        self.estimated_delivery_time = delivery.estimated_delivery_time
+        self.promised_delivery_time = delivery.promised_delivery_time
+        self.delivery_time = delivery.delivery_time
+        self.latitude = delivery.location.latitude
+        self.longitude = delivery.location.longitude
+
+    @property
+    def status_history(self):
+        return self.delivery.status_history
+
+
+class AsyncDispatcher:
+    """
+    Delivers observer notifications on a background worker thread.
+
+    notify() only puts (observer, event) pairs in a bounded queue, so a slow
+    observer no longer blocks the status change. When the queue is full the
+    publisher waits (backpressure) instead of letting the queue grow without
+    limit. The worker takes up to batch_size events at a time, groups them by
+    observer and calls update_batch once per observer.
+
+    Observers run one at a time, on the worker thread. Exceptions raised by
+    observers are collected in errors instead of stopping the worker.
+    """
+
+    _STOP = object()
+
+    def __init__(self, max_queue_size=10000, batch_size=500):
+        if batch_size < 1:
+            raise ValueError("batch_size must be at least 1.")
+        self.batch_size = batch_size
+        self.errors = []  # (observer, exception)
+        self._queue = queue.Queue(maxsize=max_queue_size)
+        self._worker = threading.Thread(target=self._run, name="delivery-dispatcher", daemon=True)
+        self._closed = False
+        self._worker.start()
+
+    def dispatch(self, observers, event, timeout=None):
+        """
+        Queue the event for each observer. Blocks while the queue is full;
+        raises queue.Full if timeout (in seconds) expires first.
+        """
+        if self._closed:
+            raise RuntimeError("The dispatcher is closed.")
+        for observer in observers:
+            self._queue.put((observer, event), timeout=timeout)
+
+    def pending(self):
+        """Return the (approximate) number of queued notifications."""
+        return self._queue.qsize()
+
+    def flush(self):
+        """Block until every queued notification has been delivered."""
+        self._queue.join()
+
+    def close(self):
+        """Deliver the pending notifications and stop the worker thread."""
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(self._STOP)
+        self._worker.join()
+        if DeliverySubject.dispatcher is self:
+            # Back to synchronous notifications instead of failing on a closed dispatcher
+            DeliverySubject.dispatcher = None
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            batch = [item]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            stop = self._deliver(batch)
+            for _ in batch:
+                self._queue.task_done()
+            if stop:
+                return
+
+    def _deliver(self, batch):
+        stop = False
+        by_observer = {}  # observer id -> (observer, events), in arrival order
+        for item in batch:
+            if item is self._STOP:
+                stop = True
+                continue
+            observer, event = item
+            by_observer.setdefault(id(observer), (observer, []))[1].append(event)
+        for observer, events in by_observer.values():
+            try:
+                if hasattr(observer, "update_batch"):
+                    observer.update_batch(events)
+                else:
+                    for event in events:
+                        observer.update(event)
+            except Exception as error:
+                self.errors.append((observer, error))
+        return stop
 
 class DeliverySubject:
     # Class for objects that can be observed by delivery observers.
+    __slots__ = ("_observers",)
+
+    # Process-wide AsyncDispatcher; when None, observers are notified synchronously.
+    # AsyncDispatcher.close() resets it to None if it is the installed dispatcher.
+    dispatcher = None
+
     def __init__(self):
         self._observers = []
 
@@ -89,7 +257,23 @@ class DeliverySubject:
         """
         Notify all observers of a change in the subject's state.
         """
-        print(f"[DEBUG] Notificando {len(self._observers)} observadores")
-        for observer in self._observers:
-            print(f"[DEBUG] Notificando observador: {type(observer).__name__}")
-            observer.update(self)
\ No newline at end of file
+        if not self._observers:
+            return
+        metrics = instrumentation.metrics_enabled
+        if metrics:
+            start = time.perf_counter()
+        event = DeliveryEvent(self)
+        if self.dispatcher is not None:
+            self.dispatcher.dispatch(self._observers, event)
+        else:
+            debug = instrumentation.is_enabled_for(DEBUG)
+            if debug:
+                instrumentation.debug("Notificando %d observadores", len(self._observers))
+            for observer in self._observers:
+                if debug:
+                    instrumentation.debug("Notificando observador: %s", type(observer).__name__)
+                observer.update(event)
+        if metrics:
+            instrumentation.observe("observer.notify", time.perf_counter() - start)
+            instrumentation.increment("observer.notify")
+            instrumentation.increment("observer.notifications", len(self._observers))
\ No newline at end of file
@@ -1,41 +1,99 @@
+from ids import order_ids
+from order_line import OrderLine
+
+
 class Order:
+    # Sem __dict__ por instância: os atributos do pedido são fixos
+    __slots__ = ("id", "customer", "restaurant", "_lines", "status", "payment_method",
+                 "delivery_instructions", "delivery_time_preference", "_indexes",
+                 "_subtotal", "_subtotal_version", "total_with_discount", "applied_promo_code")
+
     def __init__(self, customer, restaurant):
+        self.id = order_ids.next_id()  # Id monotônico e ordenável por tempo
         self.customer = customer
         self.restaurant = restaurant
-        self.items = {}
+        self._lines = {}  # chave do item -> OrderLine, na ordem em que foram adicionados
         self.status = "Em preparo"
         self.payment_method = None
         self.delivery_instructions = ""
         self.delivery_time_preference = None  # Horário preferido para entrega
+        self._indexes = []  # Índices que precisam saber quando o pedido é finalizado
+        self._subtotal = 0  # Total em cache, atualizado a cada item adicionado ou removido
+        self._subtotal_version = restaurant.menu.version  # Versão do menu usada nos preços das linhas
+
+    @property
+    def items(self):
+        """Dicionário {item: quantidade} do pedido (cópia; use add_item/remove_item para alterar)."""
+        return {key: line.quantity for key, line in self._lines.items()}
+
+    @property
+    def custom_dishes(self):
+        """Dicionário {chave: prato} dos pratos personalizados do pedido."""
+        return {key: line.dish for key, line in self._lines.items() if line.is_custom()}
+
+    def get_lines(self):
+        """Retorna as linhas do pedido, na ordem em que foram adicionadas."""
+        return list(self._lines.values())
 
     def add_item(self, item, quantity):
-        if self.restaurant.menu.has_dish(item):
-            if item in self.items:
-                self.items[item] += quantity
-            else:
-                self.items[item] = quantity
+        menu = self.restaurant.menu
+        if menu.has_dish(item):
+            self.add_line(OrderLine(item, menu.get_dish(item), quantity))
         else:
             raise ValueError(f"Item '{item}' não encontrado no menu.")
 
+    def add_custom_item(self, key, dish, quantity):
+        """Adiciona um prato personalizado (decorado) ao pedido, identificado por key."""
+        self.add_line(OrderLine(key, dish, quantity, customization=dish.get_description()))
+
+    def add_line(self, line):
+        """
+        Adiciona uma linha ao pedido, somando a quantidade se o item já estiver nele.
+        O pedido guarda uma cópia: a linha recebida nunca é alterada, e alterações
+        posteriores nela não afetam o pedido.
+        """
+        self._refresh_prices()
+        existing = self._lines.get(line.key)
+        if existing is None:
+            stored = line.with_quantity(line.quantity)
+        else:
+            self._subtotal -= existing.get_subtotal()
+            stored = line.with_quantity(line.quantity + existing.quantity)
+        self._lines[line.key] = stored
+        self._subtotal += stored.get_subtotal()
+
     def remove_item(self, item):
-        if item in self.items:
-            del self.items[item]
+        if item in self._lines:
+            line = self._lines.pop(item)
+            self._subtotal -= line.get_subtotal()
+            if not self._lines:
+                self._subtotal = 0  # Evita resíduos de arredondamento no pedido vazio
         else:
             raise ValueError(f"Item '{item}' não encontrado no pedido.")
 
+    def _refresh_prices(self):
+        # Atualiza os preços das linhas se o menu mudou desde o último cálculo
+        menu = self.restaurant.menu
+        if self._subtotal_version != menu.version:
+            total = 0
+            for line in self._lines.values():
+                line.refresh_price(menu)
+                total += line.get_subtotal()
+            self._subtotal = total
+            self._subtotal_version = menu.version
+
     def calculate_total(self):
-        total = 0
-        for item, quantity in self.items.items():
-            # Verifica se é um prato personalizado
-            if hasattr(self, 'custom_dishes') and item in self.custom_dishes:
-                total += self.custom_dishes[item].get_price() * quantity
-            else:
-                # Prato normal do menu
-                total += self.restaurant.menu.get_dish_price(item) * quantity
-        return total
+        """
+        Retorna o total do pedido. O valor fica em cache e só é recalculado
+        quando algum preço do menu muda (a versão do menu é diferente da do cache).
+        """
+        self._refresh_prices()
+        return self._subtotal
     
     def end_order(self, delivery=None):
         self.status = "Finalizado"
+        for index in self._indexes:
+            index.on_order_finalized(self)
         self.restaurant.analytics.add_order_data(self, delivery)
         self.customer.add_order_to_history(self)
         return 'Pedido finalizado com sucesso!'
@@ -61,19 +119,12 @@ class Order:
         self.delivery_time_preference = time_preference
 
     def display_order(self):
+        total = self.calculate_total()
         order_details = []
-        for item, quantity in self.items.items():
-            # Verifica se é um prato personalizado
-            if hasattr(self, 'custom_dishes') and item in self.custom_dishes:
-                dish = self.custom_dishes[item]
-                order_details.append(f"{dish.get_description()}: {quantity}x - R${dish.get_price():.2f}/unidade")
-            else:
-                # Prato normal do menu
-                price = self.restaurant.menu.get_dish_price(item)
-                order_details.append(f"{item}: {quantity}x - R${price:.2f}/unidade")
+        for line in self._lines.values():
+            order_details.append(f"{line.get_description()}: {line.quantity}x - R${line.unit_price:.2f}/unidade")
         
         order_text = "\n".join(order_details)
-        total = self.calculate_total()
         
         result = f"Pedido de {self.customer.name}:\n{order_text}\nTotal: R${total:.2f}"
 
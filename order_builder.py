@@ -1,30 +1,33 @@
 from payment import Payment
+from order_line import OrderLine
 
 class OrderBuilder:
     def __init__(self, customer, restaurant):
         from order import Order
 
         self._order = Order(customer, restaurant)
-        self._items = {}
+        self._lines = {}  # item -> OrderLine
         self._delivery_instructions = ""
         self._delivery_time_preference = None
         self._payment_method = None
         self._promo_code = None
 
     def add_item(self, item, quantity = 1):
-        if not self._order.restaurant.menu.has_dish(item):
+        menu = self._order.restaurant.menu
+        if not menu.has_dish(item):
             raise ValueError(f"Item '{item}' não encontrado no menu do restaurante.")
 
-        if item in self._items:
-            self._items[item] += quantity
+        line = self._lines.get(item)
+        if line is not None:
+            self._lines[item] = line.with_quantity(line.quantity + quantity)
         else:
-            self._items[item] = quantity
+            self._lines[item] = OrderLine(item, menu.get_dish(item), quantity)
 
         return self
     
     def remove_item(self, item):
-        if item in self._items:
-            del self._items[item]
+        if item in self._lines:
+            del self._lines[item]
         else:
             raise ValueError(f"Item '{item}' não encontrado no pedido.")
 
@@ -50,8 +53,8 @@ class OrderBuilder:
         return self
     
     def build(self):
-        for item, quantity in self._items.items():
-            self._order.add_item(item, quantity)
+        for line in self._lines.values():
+            self._order.add_line(line)
 
         if self._delivery_instructions:
             self._order.set_delivery_instructions(self._delivery_instructions)
@@ -71,7 +74,7 @@ class OrderBuilder:
         from order import Order
 
         self._order = Order(self._order.customer, self._order.restaurant)
-        self._items = {}
+        self._lines = {}  # item -> OrderLine
         self._delivery_instructions = ""
         self._delivery_time_preference = None
         self._payment_method = None
@@ -0,0 +1,176 @@
+from bisect import bisect_left, insort
+from delivery import Delivery
+from ids import format_id, order_ids
+
+
+def _ids_between(sorted_ids, start, end):
+    """Fatia de ids ordenados gerados no intervalo [start, end)."""
+    first = bisect_left(sorted_ids, order_ids.lower_bound(start))
+    last = bisect_left(sorted_ids, order_ids.lower_bound(end))
+    return sorted_ids[first:last]
+
+
+class OrderIndex:
+    """
+    Índices secundários de pedidos: id do pedido -> pedido e
+    id do cliente -> pedidos em aberto (ainda não finalizados).
+    """
+
+    def __init__(self):
+        self._orders = {}  # id do pedido -> Order
+        self._sorted_ids = []  # ids dos pedidos em ordem crescente (ou seja, de criação)
+        self._active_orders = {}  # id do cliente -> {id do pedido: Order}
+
+    def add(self, order):
+        """Adiciona um pedido aos índices."""
+        if order.id in self._orders:
+            raise ValueError(f"Pedido #{format_id(order.id)} já cadastrado.")
+        self._orders[order.id] = order
+        insort(self._sorted_ids, order.id)
+        if order.status != "Finalizado":
+            self._active_orders.setdefault(order.customer.id, {})[order.id] = order
+        order._indexes.append(self)
+
+    def on_order_finalized(self, order):
+        """Remove o pedido dos pedidos em aberto do cliente."""
+        active = self._active_orders.get(order.customer.id)
+        if active is not None:
+            active.pop(order.id, None)
+            if not active:
+                del self._active_orders[order.customer.id]
+
+    def get(self, order_id):
+        """Retorna o pedido com o id informado, ou None."""
+        return self._orders.get(order_id)
+
+    def get_orders_between(self, start, end):
+        """Retorna os pedidos criados no intervalo [start, end), em ordem de criação."""
+        ids = _ids_between(self._sorted_ids, start, end)
+        return [self._orders[order_id] for order_id in ids]
+
+    def get_active_orders(self, customer_id):
+        """Retorna os pedidos em aberto de um cliente, do mais antigo ao mais recente."""
+        return list(self._active_orders.get(customer_id, {}).values())
+
+    def get_active_order(self, customer_id):
+        """Retorna o pedido em aberto mais antigo de um cliente, ou None."""
+        active = self._active_orders.get(customer_id)
+        if not active:
+            return None
+        return next(iter(active.values()))
+
+    def __len__(self):
+        return len(self._orders)
+
+    def __iter__(self):
+        return iter(list(self._orders.values()))
+
+    def __contains__(self, order):
+        return self._orders.get(order.id) is order
+
+
+class DeliveryIndex:
+    """
+    Índices secundários de entregas: id do pedido -> entrega,
+    id do cliente -> entregas (todas e ativas) e status -> entregas.
+
+    Os índices são mantidos atualizados por Delivery.add_status_update, de modo
+    que consultas como "todas as entregas A caminho" ou "a entrega ativa deste
+    cliente" não precisam percorrer todas as entregas.
+    """
+
+    FINAL_STATUSES = (Delivery.STATUS_DELIVERED, Delivery.STATUS_CANCELLED)
+
+    def __init__(self):
+        self._by_order = {}  # id do pedido -> Delivery
+        self._sorted_ids = []  # ids dos pedidos com entrega, em ordem crescente
+        self._by_customer = {}  # id do cliente -> {id do pedido: Delivery}
+        self._active_by_customer = {}  # id do cliente -> {id do pedido: Delivery}
+        self._by_status = {}  # status -> {id do pedido: Delivery}
+
+    def add(self, delivery):
+        """Adiciona uma entrega aos índices."""
+        order = delivery.order
+        if order.id in self._by_order:
+            raise ValueError(f"O pedido #{format_id(order.id)} já possui uma entrega.")
+        self._by_order[order.id] = delivery
+        insort(self._sorted_ids, order.id)
+        self._by_customer.setdefault(order.customer.id, {})[order.id] = delivery
+        self._index_status(delivery, delivery.status)
+        if delivery.status not in self.FINAL_STATUSES:
+            self._active_by_customer.setdefault(order.customer.id, {})[order.id] = delivery
+        delivery._indexes.append(self)
+
+    def on_status_change(self, delivery, old_status, new_status):
+        """Move a entrega entre os índices de status."""
+        self._unindex_status(delivery, old_status)
+        self._index_status(delivery, new_status)
+        # As entregas ativas só mudam quando a entrega termina (ou volta a andar), para
+        # que cada uma mantenha a sua posição e a mais antiga continue sendo a primeira
+        was_active = old_status not in self.FINAL_STATUSES
+        is_active = new_status not in self.FINAL_STATUSES
+        if was_active and not is_active:
+            self._deactivate(delivery)
+        elif is_active and not was_active:
+            self._active_by_customer.setdefault(delivery.order.customer.id, {})[delivery.order.id] = delivery
+
+    def _index_status(self, delivery, status):
+        self._by_status.setdefault(status, {})[delivery.order.id] = delivery
+
+    def _unindex_status(self, delivery, status):
+        bucket = self._by_status.get(status)
+        if bucket is not None:
+            bucket.pop(delivery.order.id, None)
+            if not bucket:
+                del self._by_status[status]
+
+    def _deactivate(self, delivery):
+        order = delivery.order
+        active = self._active_by_customer.get(order.customer.id)
+        if active is not None:
+            active.pop(order.id, None)
+            if not active:
+                del self._active_by_customer[order.customer.id]
+
+    def get(self, order_id):
+        """Retorna a entrega do pedido com o id informado, ou None."""
+        return self._by_order.get(order_id)
+
+    def get_between(self, start, end):
+        """Retorna as entregas de pedidos criados no intervalo [start, end)."""
+        ids = _ids_between(self._sorted_ids, start, end)
+        return [self._by_order[order_id] for order_id in ids]
+
+    def get_by_status(self, status):
+        """Retorna as entregas que estão atualmente no status informado."""
+        return set(self._by_status.get(status, {}).values())
+
+    def count_by_status(self, status):
+        """Retorna quantas entregas estão atualmente no status informado."""
+        return len(self._by_status.get(status, ()))
+
+    def get_active_deliveries(self, customer_id):
+        """Retorna as entregas em andamento de um cliente."""
+        return list(self._active_by_customer.get(customer_id, {}).values())
+
+    def get_customer_delivery(self, customer_id):
+        """
+        Retorna a entrega em andamento mais antiga do cliente ou, se não houver
+        nenhuma, a entrega mais recente dele. Retorna None se o cliente não tem entregas.
+        """
+        active = self._active_by_customer.get(customer_id)
+        if active:
+            return next(iter(active.values()))
+        deliveries = self._by_customer.get(customer_id)
+        if deliveries:
+            return next(reversed(deliveries.values()))
+        return None
+
+    def __len__(self):
+        return len(self._by_order)
+
+    def __iter__(self):
+        return iter(list(self._by_order.values()))
+
+    def __contains__(self, delivery):
+        return self._by_order.get(delivery.order.id) is delivery
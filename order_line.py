@@ -0,0 +1,58 @@
+class OrderLine:
+    """
+    Linha de um pedido: o prato, a quantidade, o preço unitário registrado
+    quando o prato foi adicionado e, para pratos personalizados, a descrição
+    da personalização.
+
+    Usa __slots__ para não alocar um __dict__ por linha, e guarda o preço
+    para que totais e exibição não precisem consultar o menu a cada chamada.
+    A quantidade não pode ser alterada depois de criada (use with_quantity):
+    o subtotal em cache do pedido só é recalculado quando o menu muda.
+    """
+
+    __slots__ = ("key", "dish", "_quantity", "unit_price", "customization")
+
+    def __init__(self, key, dish, quantity, customization=None):
+        self.key = key  # Nome do prato no menu, ou chave do prato personalizado
+        self.dish = dish
+        self._quantity = quantity
+        self.unit_price = dish.get_price()
+        self.customization = customization
+
+    def with_quantity(self, quantity):
+        """Retorna uma nova linha com o mesmo prato e preço, mas com outra quantidade."""
+        line = OrderLine.__new__(OrderLine)
+        line.key = self.key
+        line.dish = self.dish
+        line._quantity = quantity
+        line.unit_price = self.unit_price
+        line.customization = self.customization
+        return line
+
+    @property
+    def quantity(self):
+        return self._quantity
+
+    def is_custom(self):
+        """Indica se a linha é de um prato personalizado."""
+        return self.customization is not None
+
+    def get_subtotal(self):
+        """Retorna o preço unitário vezes a quantidade."""
+        return self.unit_price * self.quantity
+
+    def get_description(self):
+        """Retorna o nome exibido da linha."""
+        if self.customization is not None:
+            return self.customization
+        return self.key
+
+    def refresh_price(self, menu):
+        """
+        Atualiza o prato e o preço de acordo com o menu atual. Pratos
+        personalizados mantêm o prato base com que foram montados.
+        """
+        if self.customization is None:
+            self.dish = menu.get_dish(self.key)
+        self.unit_price = self.dish.get_price()
+
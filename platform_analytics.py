@@ -0,0 +1,141 @@
+import calendar
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from analytics import retention_stats, delivery_stats, delivery_percentiles
+from analytics_store import Rollup, CustomerActivity
+
+
+class AnalyticsPartial(Rollup):
+    """
+    Agregado parcial do analytics de um ou mais restaurantes.
+
+    Além dos campos de um Rollup, conta os pedidos por cliente, para que a
+    retenção seja calculada na plataforma inteira: um cliente que pediu uma vez
+    em cada um de dois restaurantes conta como cliente recorrente.
+
+    As contagens por cliente vêm das contagens exatas de cada restaurante
+    (OrderAggregates.customer_orders), e não das linhas e dos resumos: os
+    resumos compactados só guardam os clientes distintos de cada intervalo.
+    Assim o parcial de um restaurante reproduz exatamente a retenção do
+    próprio restaurante. Essas contagens têm uma entrada por cliente distinto
+    e, ao contrário do resto do agregado, crescem com a base de clientes.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.customer_orders = Counter()  # id do cliente -> pedidos
+
+    def add_rollup(self, rollup):
+        """Soma um resumo compactado (as contagens por cliente vêm de add_customer_orders)."""
+        Rollup.merge(self, rollup)
+
+    def add_customer_orders(self, customer_orders):
+        """Soma as contagens exatas de pedidos por cliente de um restaurante."""
+        self.customer_orders.update(customer_orders)
+
+    def merge(self, other):
+        super().merge(other)
+        self.customer_orders.update(other.customer_orders)
+
+
+def compute_partial(state):
+    """
+    Etapa de map: calcula o agregado parcial de um restaurante a partir do seu
+    estado exportado (RestaurantAnalytics.export_state).
+    """
+    columns, rollups, customer_orders = state
+    partial = AnalyticsPartial()
+    for rollup in rollups:
+        partial.add_rollup(rollup)
+    for row in range(len(columns)):
+        partial.add_row(columns, row)
+    partial.add_customer_orders(customer_orders)
+    return partial
+
+
+class PlatformAnalytics:
+    """
+    Métricas da plataforma inteira, calculadas como map-reduce sobre os restaurantes.
+
+    Os agregados parciais de cada restaurante são calculados em paralelo em um
+    ProcessPoolExecutor e depois somados. Com max_workers=1 o cálculo é feito no
+    próprio processo, sem o custo de criar o pool.
+    """
+
+    def __init__(self, restaurants, max_workers=None):
+        self.restaurants = restaurants
+        self.max_workers = max_workers
+        self._summary = None
+
+    def compute(self):
+        """Recalcula e retorna o agregado da plataforma."""
+        states = [restaurant.analytics.export_state() for restaurant in self.restaurants]
+        summary = AnalyticsPartial()
+        if self.max_workers == 1:
+            for partial in map(compute_partial, states):
+                summary.merge(partial)
+        else:
+            with ProcessPoolExecutor(max_workers=self.max_workers) as executor:
+                for partial in executor.map(compute_partial, states, chunksize=_chunksize(len(states))):
+                    summary.merge(partial)
+        self._summary = summary
+        return summary
+
+    def _get_summary(self):
+        if self._summary is None:
+            self.compute()
+        return self._summary
+
+    def get_total_orders(self):
+        """Retorna o número total de pedidos da plataforma."""
+        return self._get_summary().order_count
+
+    def get_total_revenue(self):
+        """Retorna a receita total da plataforma."""
+        return self._get_summary().revenue
+
+    def get_most_popular_items(self, limit=5):
+        """Retorna os itens mais vendidos na plataforma."""
+        return self._get_summary().item_quantities.most_common(limit)
+
+    def get_peak_hours(self):
+        """Retorna o número de pedidos por hora do dia na plataforma."""
+        return Counter(self._get_summary().hour_counts)
+
+    def get_orders_by_day(self):
+        """Retorna o número de pedidos por dia da semana na plataforma."""
+        weekdays = self._get_summary().weekday_counts
+        return Counter({calendar.day_name[weekday]: count for weekday, count in weekdays.items()})
+
+    def get_customer_retention(self):
+        """Retorna a retenção de clientes considerando todos os restaurantes."""
+        customer_orders = self._get_summary().customer_orders
+        returning_customers = sum(1 for count in customer_orders.values() if count > 1)
+        return retention_stats(len(customer_orders), returning_customers)
+
+    def get_unique_customers(self):
+        """Retorna o número (estimado) de clientes distintos na plataforma, incluindo o histórico compactado."""
+        return self._get_summary().customers.estimate()
+
+    def get_customer_activity(self):
+        """
+        Retorna a atividade de clientes por semana e por mês de todos os restaurantes
+        (os sketches são mesclados, então cada cliente conta uma vez por intervalo).
+        """
+        activity = CustomerActivity()
+        for restaurant in self.restaurants:
+            activity.merge(restaurant.analytics.get_customer_activity())
+        return activity
+
+    def get_delivery_performance(self):
+        """Retorna o desempenho de entrega da plataforma."""
+        return delivery_stats(self._get_summary().delivery)
+
+    def get_delivery_percentiles(self, percentiles=(50, 90, 99)):
+        """Retorna os percentis de atraso e de duração das entregas na plataforma."""
+        return delivery_percentiles(self._get_summary().delivery, percentiles)
+
+
+def _chunksize(count):
+    # Agrupa restaurantes por tarefa para diluir o custo de comunicação entre processos
+    return max(1, count // 32)
@@ -0,0 +1,147 @@
+import heapq
+import itertools
+from operator import itemgetter
+
+
+class ExactTopK:
+    """
+    Contagem exata e ponderada de itens vendidos.
+
+    Cada venda soma a quantidade diretamente ao contador do item (sem expandir
+    uma lista com uma entrada por unidade). O ranking é calculado com um heap
+    de tamanho k e fica em cache até a próxima atualização.
+    """
+
+    def __init__(self):
+        self._counts = {}  # item -> unidades vendidas
+        self._cache = None  # (k, ranking) da última consulta
+
+    def add(self, item, quantity=1):
+        """Soma (ou subtrai, se negativa) uma quantidade ao contador do item."""
+        count = self._counts.get(item, 0) + quantity
+        if count > 0:
+            self._counts[item] = count
+        else:
+            self._counts.pop(item, None)
+        self._cache = None
+
+    def update(self, items):
+        """Soma as quantidades de um dicionário {item: quantidade}."""
+        for item, quantity in items.items():
+            self.add(item, quantity)
+
+    def count(self, item):
+        """Retorna as unidades vendidas de um item."""
+        return self._counts.get(item, 0)
+
+    def top(self, k):
+        """Retorna os k itens mais vendidos como lista de (item, quantidade)."""
+        if self._cache is not None and self._cache[0] == k:
+            return list(self._cache[1])
+        # nlargest é estável: empates ficam na ordem em que os itens apareceram
+        ranking = heapq.nlargest(k, self._counts.items(), key=itemgetter(1))
+        self._cache = (k, ranking)
+        return list(ranking)
+
+    def merge(self, other):
+        """Soma as contagens de outro contador neste."""
+        for item, quantity in other.items():
+            self.add(item, quantity)
+
+    def items(self):
+        """Retorna os pares (item, quantidade) contados."""
+        return self._counts.items()
+
+    def __len__(self):
+        return len(self._counts)
+
+
+class SpaceSavingTopK:
+    """
+    Contagem aproximada e ponderada dos itens mais vendidos com memória limitada
+    (algoritmo Space-Saving).
+
+    Mantém no máximo 'capacity' contadores. Quando um item novo chega e não há
+    espaço, ele substitui o item de menor contagem e herda essa contagem como
+    erro máximo. Itens cujas vendas superam total / capacity sempre aparecem no
+    ranking, e a contagem informada nunca é menor que a real.
+    """
+
+    def __init__(self, capacity=1000):
+        if capacity < 1:
+            raise ValueError("A capacidade deve ser pelo menos 1.")
+        self.capacity = capacity
+        self._counts = {}  # item -> contagem estimada
+        self._errors = {}  # item -> superestimação máxima da contagem
+        self._heap = []  # (contagem, ordem, item), com entradas obsoletas removidas sob demanda
+        self._order = itertools.count()
+
+    def add(self, item, quantity=1):
+        """Soma (ou subtrai, se negativa) uma quantidade ao contador do item."""
+        if item in self._counts:
+            count = self._counts[item] + quantity
+            if count <= 0:
+                del self._counts[item]
+                del self._errors[item]
+                return
+        elif quantity <= 0:
+            return
+        elif len(self._counts) < self.capacity:
+            count = quantity
+            self._errors[item] = 0
+        else:
+            minimum, evicted = self._pop_minimum()
+            del self._counts[evicted]
+            del self._errors[evicted]
+            count = minimum + quantity
+            self._errors[item] = minimum
+        self._counts[item] = count
+        heapq.heappush(self._heap, (count, next(self._order), item))
+        if len(self._heap) > 4 * self.capacity:
+            self._rebuild_heap()
+
+    def _pop_minimum(self):
+        while True:
+            count, _, item = heapq.heappop(self._heap)
+            if self._counts.get(item) == count:
+                return count, item
+
+    def _rebuild_heap(self):
+        self._heap = [(count, next(self._order), item) for item, count in self._counts.items()]
+        heapq.heapify(self._heap)
+
+    def update(self, items):
+        """Soma as quantidades de um dicionário {item: quantidade}."""
+        for item, quantity in items.items():
+            self.add(item, quantity)
+
+    def count(self, item):
+        """Retorna a contagem estimada de um item (0 se ele não está sendo monitorado)."""
+        return self._counts.get(item, 0)
+
+    def error(self, item):
+        """Retorna a superestimação máxima da contagem de um item."""
+        return self._errors.get(item, 0)
+
+    def top(self, k):
+        """Retorna os k itens mais vendidos (estimados) como lista de (item, quantidade)."""
+        return heapq.nlargest(k, self._counts.items(), key=itemgetter(1))
+
+    def merge(self, other):
+        """Soma as contagens de outro contador neste, mantendo a capacidade."""
+        for item, quantity in other.items():
+            self.add(item, quantity)
+
+    def items(self):
+        """Retorna os pares (item, contagem estimada) monitorados."""
+        return self._counts.items()
+
+    def __len__(self):
+        return len(self._counts)
+
+
+def make_popular_items(capacity=None):
+    """Cria o contador de itens: exato quando capacity é None, aproximado caso contrário."""
+    if capacity is None:
+        return ExactTopK()
+    return SpaceSavingTopK(capacity)
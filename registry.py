@@ -0,0 +1,99 @@
+class IndexedEntity:
+    """Mixin para entidades cujos campos indexados (nome, email) podem mudar."""
+
+    __slots__ = ()
+
+    def _attach_registry(self, registry):
+        """Associa a entidade a um registro que mantém índices sobre ela."""
+        if registry not in self._registries:
+            self._registries.append(registry)
+
+    def _detach_registry(self, registry):
+        """Remove a associação da entidade com um registro."""
+        if registry in self._registries:
+            self._registries.remove(registry)
+
+    def _notify_registries(self, field, old_value, new_value):
+        """Avisa os registros associados de que um campo indexado mudou."""
+        for registry in self._registries:
+            registry.reindex(self, field, old_value, new_value)
+
+
+class EntityRegistry:
+    """
+    Repositório de entidades com índices hash por id e por campos (nome, email).
+
+    Substitui as buscas lineares do tipo next(c for c in customers if c.name == ...)
+    por consultas O(1). Vários registros podem compartilhar o mesmo valor de campo
+    (por exemplo, dois clientes com o mesmo nome); nesse caso a busca retorna o
+    primeiro cadastrado, preservando o comportamento das buscas lineares.
+    """
+
+    def __init__(self, fields=("name", "email")):
+        self._by_id = {}
+        self._indexes = {field: {} for field in fields}
+
+    def add(self, entity):
+        """Adiciona uma entidade ao registro e aos índices."""
+        if entity.id in self._by_id:
+            raise ValueError(f"Entidade com id '{entity.id}' já cadastrada.")
+        self._by_id[entity.id] = entity
+        for field, index in self._indexes.items():
+            index.setdefault(getattr(entity, field), {})[entity.id] = entity
+        entity._attach_registry(self)
+
+    def remove(self, entity):
+        """Remove uma entidade do registro e dos índices."""
+        if entity.id not in self._by_id:
+            raise ValueError(f"Entidade com id '{entity.id}' não encontrada.")
+        del self._by_id[entity.id]
+        for field, index in self._indexes.items():
+            self._discard(index, getattr(entity, field), entity)
+        entity._detach_registry(self)
+
+    def reindex(self, entity, field, old_value, new_value):
+        """Atualiza o índice de um campo após uma alteração (renomear, trocar email)."""
+        index = self._indexes.get(field)
+        if index is None or self._by_id.get(entity.id) is not entity:
+            return
+        self._discard(index, old_value, entity)
+        index.setdefault(new_value, {})[entity.id] = entity
+
+    def _discard(self, index, value, entity):
+        bucket = index.get(value)
+        if bucket is not None:
+            bucket.pop(entity.id, None)
+            if not bucket:
+                del index[value]
+
+    def get(self, entity_id):
+        """Retorna a entidade com o id informado, ou None."""
+        return self._by_id.get(entity_id)
+
+    def find_by(self, field, value):
+        """Retorna a primeira entidade cujo campo tem o valor informado, ou None."""
+        bucket = self._indexes[field].get(value)
+        if not bucket:
+            return None
+        return next(iter(bucket.values()))
+
+    def find_all_by(self, field, value):
+        """Retorna todas as entidades cujo campo tem o valor informado."""
+        return list(self._indexes[field].get(value, {}).values())
+
+    def get_by_name(self, name):
+        """Retorna a primeira entidade com o nome informado, ou None."""
+        return self.find_by("name", name)
+
+    def get_by_email(self, email):
+        """Retorna a primeira entidade com o email informado, ou None."""
+        return self.find_by("email", email)
+
+    def __len__(self):
+        return len(self._by_id)
+
+    def __iter__(self):
+        return iter(list(self._by_id.values()))
+
+    def __contains__(self, entity):
+        return self._by_id.get(entity.id) is entity
@@ -2,17 +2,34 @@ from menu import Menu
 from review import Review
 from promotion import Promotion
 from analytics import RestaurantAnalytics
+from registry import IndexedEntity
+from geo import DEFAULT_LATITUDE, DEFAULT_LONGITUDE
+import uuid
 
-class Restaurant:
-    def __init__(self, name, address, owner):
-        self.name = name
+class Restaurant(IndexedEntity):
+    def __init__(self, name, address, owner, latitude=DEFAULT_LATITUDE, longitude=DEFAULT_LONGITUDE):
+        self.id = str(uuid.uuid4())
+        self._registries = []  # Registros que indexam este restaurante
+        self._name = name
         self.address = address
+        self.latitude = latitude  # Local de coleta dos pedidos
+        self.longitude = longitude
         self.owner = owner
         self.menu = Menu(self)
         self.reviews = Review()
         self.promotions = Promotion(self)
         self.analytics = RestaurantAnalytics(self)
 
+    @property
+    def name(self):
+        return self._name
+
+    @name.setter
+    def name(self, value):
+        old_value = self._name
+        self._name = value
+        self._notify_registries("name", old_value, value)
+
     def add_review(self, user, review_text, rating):
         """Adiciona uma avaliação."""
         if user.id == self.owner.id:
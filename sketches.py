@@ -0,0 +1,213 @@
+import hashlib
+import math
+
+
+class QuantileSketch:
+    """
+    Sketch de quantis mesclável com erro relativo garantido (estilo DDSketch).
+
+    Cada valor é contado em um balde logarítmico: o balde i cobre os valores
+    entre gamma^(i-1) e gamma^i, com gamma = (1 + a) / (1 - a). Qualquer quantil
+    é então respondido com erro relativo de no máximo a (relative_accuracy).
+    A memória depende apenas da faixa de valores (e não do número de valores),
+    e dois sketches com a mesma precisão se mesclam somando os baldes.
+    Valores negativos (por exemplo, entregas adiantadas) ficam em baldes próprios.
+    """
+
+    MIN_MAGNITUDE = 1e-9  # Valores menores que isso, em módulo, contam como zero
+
+    def __init__(self, relative_accuracy=0.01):
+        if not 0 < relative_accuracy < 1:
+            raise ValueError("A precisão relativa deve estar entre 0 e 1.")
+        self.relative_accuracy = relative_accuracy
+        self._gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self._gamma)
+        self._positive = {}  # índice do balde -> contagem
+        self._negative = {}
+        self._zero = 0
+        self._ordered = None  # Baldes em ordem crescente de valor, recalculados sob demanda
+        self.count = 0
+        self.sum = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def add(self, value, weight=1):
+        """Adiciona um valor ao sketch."""
+        if value > self.MIN_MAGNITUDE:
+            self._add_to(self._positive, self._index(value), weight)
+        elif value < -self.MIN_MAGNITUDE:
+            self._add_to(self._negative, self._index(-value), weight)
+        else:
+            self._zero += weight
+        self.count += weight
+        self.sum += value * weight
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+
+    def _add_to(self, buckets, index, weight):
+        if index not in buckets:
+            self._ordered = None
+            buckets[index] = weight
+        else:
+            buckets[index] += weight
+
+    def _index(self, magnitude):
+        return math.ceil(math.log(magnitude) / self._log_gamma)
+
+    def _value(self, index):
+        # Ponto do balde com o menor erro relativo em relação às suas bordas
+        return 2 * self._gamma ** index / (self._gamma + 1)
+
+    def _buckets(self):
+        if self._ordered is None:
+            ordered = [(-self._value(i), i, self._negative) for i in sorted(self._negative, reverse=True)]
+            ordered.append((0.0, None, None))
+            ordered.extend((self._value(i), i, self._positive) for i in sorted(self._positive))
+            self._ordered = ordered
+        return self._ordered
+
+    def quantile(self, q):
+        """Retorna o quantil q (entre 0 e 1), ou None se o sketch está vazio."""
+        if not self.count:
+            return None
+        if not 0 <= q <= 1:
+            raise ValueError("O quantil deve estar entre 0 e 1.")
+        rank = q * (self.count - 1)
+        seen = 0
+        for value, index, buckets in self._buckets():
+            seen += self._zero if buckets is None else buckets[index]
+            if seen > rank:
+                # Os valores extremos são conhecidos exatamente
+                return min(max(value, self.min), self.max)
+        return self.max
+
+    def percentiles(self, percentiles=(50, 90, 99)):
+        """Retorna um dicionário {percentil: valor}."""
+        return {p: self.quantile(p / 100) for p in percentiles}
+
+    def mean(self):
+        """Retorna a média exata dos valores, ou None se o sketch está vazio."""
+        return self.sum / self.count if self.count else None
+
+    def merge(self, other):
+        """Soma outro sketch (com a mesma precisão) a este."""
+        if other.relative_accuracy != self.relative_accuracy:
+            raise ValueError("Só é possível mesclar sketches com a mesma precisão relativa.")
+        for index, weight in other._positive.items():
+            self._add_to(self._positive, index, weight)
+        for index, weight in other._negative.items():
+            self._add_to(self._negative, index, weight)
+        self._zero += other._zero
+        self.count += other.count
+        self.sum += other.sum
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    def __len__(self):
+        return self.count
+
+
+class CardinalitySketch:
+    """
+    Contador de valores distintos mesclável (estilo HyperLogLog) com modo exato.
+
+    Enquanto há poucos valores (até exact_limit), eles são guardados em um
+    conjunto e a contagem é exata. Acima disso, o sketch passa a usar
+    2^precision registradores de um byte: cada valor é espalhado por um hash
+    estável, e o registrador escolhido guarda o maior número de zeros à esquerda
+    observado. A memória fica constante e o erro padrão é de cerca de
+    1.04 / sqrt(2^precision) (1,6% com a precisão padrão).
+    """
+
+    def __init__(self, precision=12, exact_limit=256):
+        if not 4 <= precision <= 16:
+            raise ValueError("A precisão deve estar entre 4 e 16.")
+        self.precision = precision
+        self.exact_limit = exact_limit
+        self._values = set()  # Modo exato; None depois da conversão para registradores
+        self._registers = None
+
+    def add(self, value):
+        """Adiciona um valor ao sketch."""
+        if self._values is not None:
+            self._values.add(value)
+            if len(self._values) > self.exact_limit:
+                self._to_registers()
+        else:
+            self._add_hash(self._hash(value))
+
+    def _hash(self, value):
+        # Hash estável entre processos (o hash() do Python muda a cada execução)
+        digest = hashlib.blake2b(str(value).encode(), digest_size=8).digest()
+        return int.from_bytes(digest, "big")
+
+    def _add_hash(self, hashed):
+        remaining_bits = 64 - self.precision
+        index = hashed >> remaining_bits
+        rest = hashed & ((1 << remaining_bits) - 1)
+        rank = remaining_bits - rest.bit_length() + 1
+        if rank > self._registers[index]:
+            self._registers[index] = rank
+
+    def _to_registers(self):
+        self._registers = bytearray(1 << self.precision)
+        for value in self._values:
+            self._add_hash(self._hash(value))
+        self._values = None
+
+    def is_exact(self):
+        """Indica se o sketch ainda está no modo exato."""
+        return self._values is not None
+
+    def values(self):
+        """Retorna os valores guardados no modo exato (não disponível após a conversão)."""
+        if self._values is None:
+            raise ValueError("O sketch não guarda mais os valores individuais.")
+        return set(self._values)
+
+    def estimate(self):
+        """Retorna o número (estimado, fora do modo exato) de valores distintos."""
+        if self._values is not None:
+            return len(self._values)
+        m = len(self._registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / sum(2.0 ** -register for register in self._registers)
+        zeros = self._registers.count(0)
+        if estimate <= 2.5 * m and zeros:
+            # Correção para cardinalidades pequenas (contagem linear)
+            estimate = m * math.log(m / zeros)
+        return round(estimate)
+
+    def merge(self, other):
+        """Une outro sketch (com a mesma precisão) a este."""
+        if other.precision != self.precision:
+            raise ValueError("Só é possível mesclar sketches com a mesma precisão.")
+        if other._values is not None:
+            for value in other._values:
+                self.add(value)
+            return
+        if self._values is not None:
+            self._to_registers()
+        self._registers = bytearray(map(max, self._registers, other._registers))
+
+    def copy(self):
+        """Retorna uma cópia independente do sketch."""
+        sketch = CardinalitySketch(self.precision, self.exact_limit)
+        sketch.merge(self)
+        return sketch
+
+    def union(self, other):
+        """Retorna um novo sketch com a união deste e de outro."""
+        sketch = self.copy()
+        sketch.merge(other)
+        return sketch
+
+    def intersection_estimate(self, other):
+        """Estima quantos valores estão nos dois sketches (inclusão-exclusão)."""
+        if self._values is not None and other._values is not None:
+            return len(self._values & other._values)
+        both = self.estimate() + other.estimate() - self.union(other).estimate()
+        return max(0, min(both, self.estimate(), other.estimate()))
+
+    def __len__(self):
+        return self.estimate()
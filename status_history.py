@@ -0,0 +1,118 @@
+import datetime
+from array import array
+from analytics_store import Interner, to_micros, from_micros
+
+
+class StatusHistory:
+    """
+    Histórico compacto de status de uma entrega.
+
+    Cada atualização ocupa três posições em arrays de tipo fixo: o código do
+    status, o horário em milissegundos desde a época (horário local) e o código
+    da nota. Os status e as notas padrão das transições (register_notes) se
+    repetem muito entre entregas, então as suas tabelas de códigos são
+    compartilhadas por todos os históricos. Notas livres (digitadas na CLI,
+    nomes de entregadores) ficam em uma lista do próprio histórico, com códigos
+    negativos, e são liberadas junto com ele.
+
+    Para compatibilidade, o histórico se comporta como a antiga lista de
+    dicionários: history[-1]["timestamp"] e "for update in history" continuam
+    funcionando, e os dicionários só são montados quando acessados.
+    """
+
+    __slots__ = ("_statuses", "_timestamps", "_notes", "_custom_notes")
+
+    _status_table = Interner()
+    _notes_table = Interner()  # Só as notas registradas em register_notes
+    _notes_table.code("")
+
+    def __init__(self):
+        self._statuses = array("b")
+        self._timestamps = array("q")  # Milissegundos desde a época, horário local
+        self._notes = array("l")  # Código na tabela compartilhada, ou -(posição em _custom_notes + 1)
+        self._custom_notes = None  # Notas livres deste histórico, criada na primeira
+
+    @classmethod
+    def register_notes(cls, notes):
+        """Registra notas padrão, que passam a ser guardadas como códigos compartilhados."""
+        for note in notes:
+            cls._notes_table.code(note)
+
+    def append(self, status, notes="", moment=None):
+        """Registra uma atualização de status (no horário atual, se moment não for informado)."""
+        if moment is None:
+            moment = datetime.datetime.now()
+        self._statuses.append(self._status_table.code(status))
+        self._timestamps.append(to_micros(moment) // 1000)
+        code = self._notes_table.lookup(notes)
+        if code is None:
+            if self._custom_notes is None:
+                self._custom_notes = []
+            self._custom_notes.append(notes)
+            code = -len(self._custom_notes)
+        self._notes.append(code)
+
+    def _note(self, code):
+        return self._notes_table.value(code) if code >= 0 else self._custom_notes[-code - 1]
+
+    def _entry(self, index):
+        return {
+            "status": self._status_table.value(self._statuses[index]),
+            "timestamp": from_micros(self._timestamps[index] * 1000),
+            "notes": self._note(self._notes[index]),
+        }
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._entry(i) for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("Índice fora do histórico de status.")
+        return self._entry(index)
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self._entry(index)
+
+    def __len__(self):
+        return len(self._statuses)
+
+    def statuses(self):
+        """Retorna a sequência de status, sem montar os dicionários."""
+        return [self._status_table.value(code) for code in self._statuses]
+
+    def entered_at(self, status):
+        """Retorna quando a entrega entrou pela primeira vez no status, ou None."""
+        code = self._status_table.lookup(status)
+        if code is None or code not in self._statuses:
+            return None
+        return from_micros(self._timestamps[self._statuses.index(code)] * 1000)
+
+    def time_between(self, start_status, end_status):
+        """
+        Retorna os segundos entre a primeira entrada em start_status e a primeira
+        entrada em end_status, ou None se a entrega não passou pelos dois.
+        """
+        start = self.entered_at(start_status)
+        end = self.entered_at(end_status)
+        if start is None or end is None:
+            return None
+        return (end - start).total_seconds()
+
+    def time_in_status(self, until=None):
+        """
+        Retorna {status: segundos} com o tempo passado em cada status.
+
+        O status atual só é contabilizado se until (um datetime) for informado;
+        sem ele, conta apenas o tempo dos status já encerrados.
+        """
+        timestamps = self._timestamps
+        totals = {}
+        for index in range(len(timestamps) - 1):
+            code = self._statuses[index]
+            totals[code] = totals.get(code, 0) + timestamps[index + 1] - timestamps[index]
+        if until is not None and timestamps:
+            code = self._statuses[-1]
+            totals[code] = totals.get(code, 0) + max(0, to_micros(until) // 1000 - timestamps[-1])
+        return {self._status_table.value(code): millis / 1000 for code, millis in totals.items()}
@@ -1,8 +1,13 @@
 from abc import ABC, abstractmethod
 import datetime
+from registry import IndexedEntity
+from notification_inbox import NotificationInbox
 
 
-class User(ABC):
+class User(ABC, IndexedEntity):
+    __slots__ = ("_id", "_name", "_email", "_phone", "_password", "_address",
+                 "_registration_date", "_registries")
+
     def __init__(self, id, name, email, phone, password):
         self._id = id
         self._name = name
@@ -11,6 +16,7 @@ class User(ABC):
         self._password = password
         self._address = None
         self._registration_date = datetime.datetime.now()
+        self._registries = []  # Registros que indexam este usuário
 
     @property
     def id(self):
@@ -22,7 +28,9 @@ class User(ABC):
 
     @name.setter
     def name(self, value):
+        old_value = self._name
         self._name = value
+        self._notify_registries("name", old_value, value)
 
     @property
     def email(self):
@@ -30,7 +38,9 @@ class User(ABC):
 
     @email.setter
     def email(self, value):
+        old_value = self._email
         self._email = value
+        self._notify_registries("email", old_value, value)
 
     @property
     def phone(self):
@@ -54,11 +64,19 @@ class User(ABC):
 
 
 class Customer(User):
+    __slots__ = ("_order_history", "_favorite_restaurants", "_payment_methods", "_notifications")
+
     def __init__(self, id, name, email, phone, password):
         super().__init__(id, name, email, phone, password)
         self._order_history = []
         self._favorite_restaurants = []
         self._payment_methods = []
+        self._notifications = NotificationInbox(owner_id=id)
+
+    @property
+    def notifications(self):
+        """Caixa de entrada (limitada) de notificações do cliente."""
+        return self._notifications
 
     def add_order_to_history(self, order):
         self._order_history.append(order)
@@ -88,6 +106,8 @@ class Customer(User):
 
 
 class Owner(User):
+    __slots__ = ("_restaurants",)
+
     def __init__(self, id, name, email, phone, password):
         super().__init__(id, name, email, phone, password)
         self._restaurants = []